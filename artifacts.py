@@ -0,0 +1,333 @@
+"""
+Thumbnails and plain text for uploaded files, made in the background so
+uploads return straight away.
+
+save_file_metadata queues a job for every new file. A few worker threads
+take jobs off a bounded queue and retry failures with backoff. Results are
+written to a derived-artifacts store keyed by content hash, like the blobs
+(uploads/derived/ab/cd/<sha256>/), so identical uploads are only processed
+once. Each files doc then gets a small `preview` field the templates use.
+
+    python artifacts.py backfill   # process files that never got a preview
+"""
+import argparse
+import json
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+from xml.etree import ElementTree
+
+from blob_store import hash_path, is_sha256
+
+THUMBNAIL_SIZE = (320, 320)
+IMAGE_TYPES = {'png', 'jpg', 'jpeg', 'gif'}
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+A_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+
+# Most we'll inflate out of one docx/pptx. The upload limit only caps the
+# compressed size, and a zip bomb fits a few GB of XML in a few MB.
+MAX_UNZIPPED_BYTES = 20 * 1024 * 1024
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+
+
+# --- Text extraction ---
+
+def _read_member(archive, name, limit=None):
+    """A zip member's bytes, None if it inflates past the limit (MAX_UNZIPPED_BYTES)."""
+    limit = MAX_UNZIPPED_BYTES if limit is None else limit
+    if archive.getinfo(name).file_size > limit:
+        return None
+    # The size in the header can lie, so the read stops at the limit too
+    with archive.open(name) as member:
+        data = member.read(limit + 1)
+    return data if len(data) <= limit else None
+
+
+def _docx_text(path):
+    with zipfile.ZipFile(path) as docx:
+        data = _read_member(docx, 'word/document.xml')
+    if data is None:
+        return None  # too big to index
+    root = ElementTree.fromstring(data)
+    paragraphs = [''.join(t.text or '' for t in p.iter(W_NS + 't')) for p in root.iter(W_NS + 'p')]
+    return '\n'.join(p for p in paragraphs if p)
+
+
+def _pptx_text(path):
+    with zipfile.ZipFile(path) as pptx:
+        slides = [n for n in pptx.namelist() if re.fullmatch(r'ppt/slides/slide\d+\.xml', n)]
+        slides.sort(key=lambda n: int(re.search(r'\d+', n).group()))
+        texts = []
+        budget = MAX_UNZIPPED_BYTES
+        for name in slides:
+            data = _read_member(pptx, name, budget)
+            if data is None:
+                break  # index the slides that fit
+            budget -= len(data)
+            root = ElementTree.fromstring(data)
+            texts.append('\n'.join(t.text for t in root.iter(A_NS + 't') if t.text))
+    return '\n\n'.join(texts)
+
+
+def _pdf_text(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None  # optional, PDFs just don't get text without it
+    return '\n'.join(page.extract_text() or '' for page in PdfReader(path).pages)
+
+
+def _plain_text(path):
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8', errors='replace')
+
+
+TEXT_EXTRACTORS = {
+    'txt': _plain_text,
+    'docx': _docx_text,
+    'pptx': _pptx_text,
+    'pdf': _pdf_text,
+}
+
+
+# --- Thumbnails ---
+
+def _resize(source, destination):
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+    with Image.open(source) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        image.convert('RGB').save(destination, 'PNG')
+    return True
+
+
+def _office_thumbnail(path, destination):
+    # Word and PowerPoint usually save a preview of the first page in the zip
+    with zipfile.ZipFile(path) as office:
+        # Windows often saves an .emf/.wmf preview instead, browsers can't show those
+        names = [n for n in office.namelist()
+                 if n.lower() in ('docprops/thumbnail.jpeg', 'docprops/thumbnail.jpg', 'docprops/thumbnail.png')]
+        data = _read_member(office, names[0]) if names else None
+    if data is None:
+        return False
+    with open(destination, 'wb') as out:
+        out.write(data)
+    # Stored as-is if Pillow can't (or isn't there to) shrink it
+    try:
+        _resize(destination, destination)
+    except OSError:
+        pass
+    return True
+
+
+def _pdf_thumbnail(path, destination):
+    if not shutil.which('pdftoppm'):
+        return False  # poppler-utils isn't installed
+    prefix = destination[:-len('.png')]
+    subprocess.run(['pdftoppm', '-png', '-f', '1', '-l', '1', '-singlefile',
+                    '-scale-to', str(max(THUMBNAIL_SIZE)), path, prefix],
+                   check=True, capture_output=True, timeout=30)
+    return os.path.exists(destination)
+
+
+def _image_thumbnail(path, destination):
+    return _resize(path, destination)
+
+
+THUMBNAILERS = {
+    'pdf': _pdf_thumbnail,
+    'docx': _office_thumbnail,
+    'pptx': _office_thumbnail,
+    **{ext: _image_thumbnail for ext in IMAGE_TYPES},
+}
+
+
+class ArtifactStore:
+    """Derived files for each blob: thumbnail.png, text.txt and a manifest.json."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def directory(self, sha256):
+        return hash_path(self.root, sha256)
+
+    def thumbnail_path(self, sha256):
+        return os.path.join(self.directory(sha256), 'thumbnail.png')
+
+    def text_path(self, sha256):
+        return os.path.join(self.directory(sha256), 'text.txt')
+
+    def manifest(self, sha256):
+        try:
+            with open(os.path.join(self.directory(sha256), 'manifest.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def read_text(self, sha256):
+        try:
+            with open(self.text_path(sha256), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def build(self, sha256, blob_path, filename):
+        """Make the artifacts for one blob and return its manifest."""
+        extension = _extension(filename)
+        # Built in a temp dir and swapped in, so readers never see half of it
+        os.makedirs(self.root, exist_ok=True)
+        work = tempfile.mkdtemp(dir=self.root, prefix='.build-')
+        try:
+            manifest = {'thumbnail': False, 'text_chars': 0}
+
+            thumbnailer = THUMBNAILERS.get(extension)
+            if thumbnailer:
+                manifest['thumbnail'] = thumbnailer(blob_path, os.path.join(work, 'thumbnail.png'))
+
+            extractor = TEXT_EXTRACTORS.get(extension)
+            text = extractor(blob_path) if extractor else None
+            if text:
+                with open(os.path.join(work, 'text.txt'), 'w', encoding='utf-8') as f:
+                    f.write(text)
+                manifest['text_chars'] = len(text)
+
+            with open(os.path.join(work, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+
+            destination = self.directory(sha256)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            if os.path.exists(destination):
+                shutil.rmtree(destination)
+            os.replace(work, destination)
+            return manifest
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+    def delete(self, sha256):
+        shutil.rmtree(self.directory(sha256), ignore_errors=True)
+
+    def iter_hashes(self):
+        for top in os.scandir(self.root):
+            if not top.is_dir() or top.name.startswith('.'):
+                continue
+            for sub in os.scandir(top.path):
+                for entry in os.scandir(sub.path):
+                    if is_sha256(entry.name):
+                        yield entry.name
+
+
+class ArtifactPipeline:
+    """
+    Worker threads building artifacts off a bounded queue. submit() never
+    blocks an upload: when the queue is full the job is dropped and left for
+    `python artifacts.py backfill`.
+    """
+
+    def __init__(self, db, blob_store, artifacts, workers=2, queue_size=100, retries=3, backoff=1.0):
+        self.db = db
+        self.blob_store = blob_store
+        self.artifacts = artifacts
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        # Called with (sha256, manifest) after a blob is processed, e.g. to index its text
+        self.listeners = []
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, sha256, filename):
+        self._start()
+        try:
+            self.queue.put_nowait((sha256, filename))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"Artifact queue full, skipped {filename}")
+            return False
+
+    def join(self):
+        self.queue.join()
+
+    def _work(self):
+        while True:
+            sha256, filename = self.queue.get()
+            try:
+                self.process(sha256, filename)
+            except Exception as e:
+                print(f"Artifact job for {sha256} crashed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def process(self, sha256, filename):
+        # Same content uploaded before, reuse what was built then
+        manifest = self.artifacts.manifest(sha256)
+
+        attempt = 0
+        while manifest is None:
+            try:
+                manifest = self.artifacts.build(sha256, self.blob_store.path(sha256), filename)
+            except Exception as e:
+                if attempt >= self.retries:
+                    print(f"Could not build artifacts for {filename}: {e}")
+                    manifest = {'thumbnail': False, 'text_chars': 0, 'failed': True}
+                    break
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+
+        self.db.files.update_many({'sha256': sha256}, {'$set': {'preview': manifest}})
+        for listener in self.listeners:
+            listener(sha256, manifest)
+        return manifest
+
+
+def backfill(pipeline, batch_size=500):
+    """Run every blob-backed files doc without a preview through the pipeline, inline."""
+    done = set()
+    cursor = pipeline.db.files.find({'sha256': {'$exists': True}, 'preview': {'$exists': False}},
+                                    {'sha256': 1, 'original_filename': 1}).batch_size(batch_size)
+    for doc in cursor:
+        if doc['sha256'] not in done:
+            pipeline.process(doc['sha256'], doc.get('original_filename', ''))
+            done.add(doc['sha256'])
+    return len(done)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build thumbnails and text for uploaded files.')
+    parser.add_argument('command', choices=['backfill'])
+    parser.add_argument('--uploads', default='uploads', help='upload folder the app uses')
+    args = parser.parse_args()
+
+    from blob_store import BlobStore
+    from database import get_database
+    pipeline = ArtifactPipeline(get_database(), BlobStore(os.path.join(args.uploads, 'blobs')),
+                                ArtifactStore(os.path.join(args.uploads, 'derived')))
+    print(f"Processed {backfill(pipeline)} files")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""
+Async serving mode: the JSON routes the dashboard and study page poll run
+on Motor under an ASGI server, so a worker holds thousands of open
+connections instead of one per thread.
+
+    pip install -r requirements-async.txt
+    uvicorn asgi:app --workers 4
+
+Handled here, on the event loop:
+
+    GET /todo, /todo_stats, /todo/check-deadlines, /reminders, /events
+    POST /reminders, /log_session
+
+Everything else (the HTML pages, login, uploads, ndjson exports) goes to
+the Flask app in main.py through a2wsgi's thread pool, so one server runs
+the whole site. Sessions are read from the same store main.py uses; these
+routes only read the session, they never write it.
+"""
+import asyncio
+import inspect
+import json
+import os
+from datetime import datetime
+from time import perf_counter
+from urllib.parse import urlencode
+
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from motor.motor_asyncio import AsyncIOMotorClient
+from werkzeug.datastructures import Headers
+from werkzeug.sansio.request import Request
+
+import main
+from charts import bump_data_version
+from goal_stats import get_task_stats_async
+from live_events import RESYNC
+from metrics import CommandMetrics
+from pagination import BadCursor, fetch_page_async
+from search_index import index_reminder
+from server_session import CachedSessionStore, MemorySessionStore, MongoSessionStore, ServerSessionInterface
+from session_log import log_study_session_async
+
+client = AsyncIOMotorClient(main.MONGO_URI, event_listeners=[CommandMetrics(main.metrics)])
+db = client.get_database(os.getenv('MONGO_DB_NAME', 'pathfinderDB'))
+
+flask_app = WSGIMiddleware(main.app, workers=int(os.getenv('WSGI_THREADS', 10)))
+
+routes = {}
+
+
+def route(path, methods=('GET',)):
+    def decorator(handler):
+        for method in methods:
+            routes[(path, method)] = handler
+        return handler
+    return decorator
+
+
+async def load_session(request):
+    """The request's session data as a dict, empty if there's none."""
+    interface = main.app.session_interface
+    value = request.cookies.get(interface.get_cookie_name(main.app))
+    if not value:
+        return {}
+
+    if not isinstance(interface, ServerSessionInterface):
+        # SESSION_STORE=cookie, the data is in the signed cookie itself
+        serializer = interface.get_signing_serializer(main.app)
+        if serializer is None:
+            return {}
+        try:
+            return serializer.loads(value, max_age=int(main.app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            return {}
+
+    store, cache = interface.store, None
+    if isinstance(store, CachedSessionStore):
+        store, cache = store.store, store
+    stored = cache.cached(value) if cache else None
+    if stored is None:
+        if isinstance(store, MongoSessionStore):
+            doc = await db[store.collection.name].find_one({'_id': value, 'expires_at': {'$gt': datetime.utcnow()}})
+            stored = (doc['data'], doc['expires_at']) if doc else None
+        elif isinstance(store, MemorySessionStore):
+            stored = store.get(value)
+        else:
+            stored = await asyncio.to_thread(store.get, value)
+        if cache and stored:
+            cache.remember(value, stored)
+
+    if stored is None:
+        return {}
+    try:
+        return interface.serializer.loads(stored[0])
+    except ValueError:
+        return {}
+
+
+async def read_json(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@route('/todo_stats')
+async def todo_stats(request, session, receive):
+    if 'user_id' not in session:
+        return {"error": "Not authenticated"}, 401
+
+    return await get_task_stats_async(db, session['user_id'])
+
+
+@route('/todo')
+async def get_todos(request, session, receive):
+    if 'user_id' not in session:
+        return {"todos": []}
+
+    query = main.todo_query(session['user_id'], datetime.utcnow())
+    try:
+        todos, next_cursor = await fetch_page_async(db.goals, query, main.TODO_SORT, main.TODO_PROJECTION,
+                                                    limit=main.page_size(100, request.args),
+                                                    cursor=request.args.get('cursor'))
+    except BadCursor:
+        return {"error": "Invalid cursor"}, 400
+
+    return {"todos": [main.todo_json(todo) for todo in todos], "next_cursor": next_cursor}
+
+
+@route('/todo/check-deadlines')
+async def check_deadlines(request, session, receive):
+    if 'user_id' not in session:
+        return {"expiredTasks": []}
+
+    return {"expiredTasks": await expired_todos(session['user_id'])}
+
+
+async def expired_todos(user_id):
+    expired_tasks = await db.goals.find(main.expired_todo_query(user_id, datetime.utcnow()),
+                                        {"task": 1, "_id": 1}).to_list(None)
+    for task in expired_tasks:
+        task["_id"] = str(task["_id"])
+    return expired_tasks
+
+
+@route('/reminders', methods=('GET', 'POST'))
+async def reminders(request, session, receive):
+    if 'user_id' not in session:
+        return {"error": "Not authenticated"}, 401
+    user_id = session['user_id']
+
+    if request.method == 'POST':
+        reminder = main.new_reminder(user_id, await read_json(receive) or {})
+        if reminder is None:
+            return {"success": False}
+        await db.reminders.insert_one(reminder)
+        # sqlite, off the event loop
+        await asyncio.to_thread(index_reminder, main.search_index, reminder)
+        main.changed('reminders', reminder)
+        return {"success": True}
+
+    try:
+        data, next_cursor = await fetch_page_async(db.reminders, main.reminder_query(user_id, request.args),
+                                                   main.REMINDER_SORT, main.REMINDER_PROJECTION,
+                                                   limit=main.page_size(main.MAX_PAGE_SIZE, request.args),
+                                                   cursor=request.args.get('cursor'))
+    except BadCursor:
+        return {"error": "Invalid cursor"}, 400
+
+    for reminder in data:
+        del reminder["_id"]
+    headers = {}
+    if next_cursor:
+        next_url = f"{request.root_path}/reminders?{urlencode({**request.args.to_dict(), 'cursor': next_cursor})}"
+        headers['Link'] = f'<{next_url}>; rel="next"'
+    return data, 200, headers
+
+
+@route('/log_session', methods=('POST',))
+async def log_session(request, session, receive):
+    if 'user_id' not in session:
+        return {'status': 'error', 'message': 'User not logged in'}, 401
+    user_id = session['user_id']
+
+    data = await read_json(receive) or {}
+    subject_name = data.get('subject_name')
+    duration_seconds = data.get('duration_seconds')
+
+    if not subject_name or duration_seconds is None:
+        return {'status': 'error', 'message': 'Missing required data'}, 400
+
+    duration_seconds = main.session_duration(duration_seconds)
+    if not isinstance(subject_name, str) or duration_seconds is None:
+        return {'status': 'error', 'message': 'Invalid session data'}, 400
+
+    # From the database, not the session's subject map: it could be deleted from another device
+    subject = await db.subjects.find_one({'owner_id': user_id, 'subject': subject_name.lower()}, {'_id': 1})
+    subject_id = subject['_id'] if subject else None
+
+    if not subject_id:
+        return {'status': 'error', 'message': 'Subject not found'}, 404
+
+    today_str = await log_study_session_async(db, user_id, subject_id, subject_name, duration_seconds)
+    await bump_data_version(db, user_id)
+
+    return {'status': 'success', 'message': f'Session logged to {today_str} successfully!'}
+
+
+async def live_snapshot(user_id):
+    now = datetime.utcnow()
+    todos, expired_tasks, stats = await asyncio.gather(
+        db.goals.find(main.todo_query(user_id, now), main.TODO_PROJECTION).sort(main.TODO_SORT).to_list(None),
+        expired_todos(user_id),
+        get_task_stats_async(db, user_id),
+    )
+    return {"todos": [main.todo_json(todo) for todo in todos], "expiredTasks": expired_tasks, "stats": stats}
+
+
+async def event_stream(user_id):
+    loop = asyncio.get_running_loop()
+    # Subscribed before the snapshot is read, so nothing written in between is missed
+    subscription = main.live_events.subscribe(user_id, loop=loop)
+    try:
+        yield main.sse('snapshot', await live_snapshot(user_id))
+        snapshot_at = loop.time()
+        while True:
+            event = await subscription.get(main.LIVE_HEARTBEAT_SECONDS)
+            # Writes handled by another worker (LIVE_UPDATES=local) and the sweeper's
+            # deletes aren't pushed here, a fresh snapshot now and then catches up
+            if event == RESYNC or loop.time() - snapshot_at >= main.LIVE_RESYNC_SECONDS:
+                yield main.sse('snapshot', await live_snapshot(user_id))
+                snapshot_at = loop.time()
+            elif event is None:
+                yield ': keep-alive\n\n'
+            if event is not None and event != RESYNC:
+                yield main.sse(*event)
+    finally:
+        main.live_events.unsubscribe(subscription)
+
+
+@route('/events')
+async def live_updates(request, session, receive):
+    """
+    Server-Sent Events: a snapshot, then todo, stats and reminder changes as
+    they're written. Only served here, main.py answers /events with a 204.
+    """
+    if 'user_id' not in session:
+        return {"error": "Not authenticated"}, 401
+    return event_stream(session['user_id']), 200, {
+        'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'
+    }
+
+
+async def send_stream(chunks, status, headers, receive, send):
+    """Send an async generator of str until it ends or the client goes away."""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers.items()],
+    })
+
+    async def pump():
+        async for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        await chunks.aclose()
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+
+
+def unpack(result):
+    # Handlers return like Flask views: body, (body, status) or (body, status, headers)
+    if not isinstance(result, tuple):
+        return result, 200, {}
+    body, status, *headers = result
+    return body, status, headers[0] if headers else {}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            client.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    handler = routes.get((scope.get('path'), scope.get('method'))) if scope['type'] == 'http' else None
+    request = None
+    if handler is not None:
+        request = Request(scope['method'], scope['scheme'], scope.get('server'), scope.get('root_path', ''),
+                          scope['path'], scope['query_string'],
+                          Headers([(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope['headers']]),
+                          (scope.get('client') or (None,))[0])
+    # Streamed exports stay on the sync side
+    if request is None or request.args.get('format') == 'ndjson':
+        return await flask_app(scope, receive, send)
+
+    started = perf_counter()
+    result = await handler(request, await load_session(request), receive)
+    body, status, headers = unpack(result)
+    main.metrics.request_seconds.observe(perf_counter() - started, scope['path'], scope['method'], str(status))
+    if inspect.isasyncgen(body):
+        return await send_stream(body, status, headers, receive, send)
+
+    response = main.app.json.response(body)
+    response.status_code = status
+    response.headers.extend(headers)
+
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response.headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': response.get_data()})
@@ -0,0 +1,199 @@
+"""
+Concurrent connections the JSON routes can take, sync deployment against
+async: gunicorn running main:app, then uvicorn running asgi:app (Motor),
+both on the same scratch database, each hit by N clients at once that
+open a connection, make one request and start over.
+
+    python -m benchmarks.async_capacity --mongo mongodb://localhost:27017
+    python -m benchmarks.async_capacity --mongo ... --connections 10,100,500,1000 --workers 2 --threads 4
+
+Needs requirements-async.txt and a real mongod: the servers run in their
+own processes, so mongomock can't be shared with them. Raise `ulimit -n`
+above the largest --connections. A sync worker serves --threads requests
+at a time and the rest wait in the listen backlog, so past workers *
+threads its latency climbs with the connection count; errors are
+connections refused, reset or timed out.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask.sessions import session_json_serializer
+from pymongo import MongoClient
+
+SCRATCH_DB = 'pathfinder_bench_async'
+SESSION_ID = 'benchmark-session'
+
+# (method, path, json body) mix, roughly what an open dashboard and study page send
+REQUESTS = [
+    ('GET', '/todo', None),
+    ('GET', '/todo_stats', None),
+    ('GET', '/todo/check-deadlines', None),
+    ('GET', '/reminders', None),
+    ('POST', '/log_session', {'subject_name': 'maths', 'duration_seconds': 60}),
+]
+
+
+def seed(db, todos):
+    now = datetime.utcnow()
+    user_id = str(db.users.insert_one({'username': 'bench', 'email': 'bench@example.com', 'password': None}).inserted_id)
+    db.subjects.insert_one({'owner_id': user_id, 'subject': 'maths', 'marks': 0})
+    db.goals.insert_many([{
+        'user_id': user_id, 'task': f'task {i}', 'goal_type': 'task', 'goal_period': 'weekly',
+        'deadline': now + timedelta(days=i % 10 - 2), 'completion_status': i % 3 == 0, 'created_at': now,
+    } for i in range(todos)])
+    db.reminders.insert_many([{
+        'user_id': user_id, 'title': f'reminder {i}',
+        'date': (now + timedelta(days=i)).strftime('%Y-%m-%d'), 'expires_at': now + timedelta(days=i + 1),
+    } for i in range(30)])
+    # A logged-in session in the Mongo store both servers read
+    db.web_sessions.insert_one({
+        '_id': SESSION_ID,
+        'data': session_json_serializer.dumps({'user_id': user_id, 'username': 'bench'}),
+        'expires_at': now + timedelta(days=1),
+    })
+
+
+def start_server(kind, port, args):
+    env = {**os.environ, 'url': args.mongo, 'MONGO_DB_NAME': SCRATCH_DB, 'SESSION_STORE': 'mongo',
+           'SECRET_KEY': 'benchmark'}
+    if kind == 'sync':
+        command = [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '--threads', str(args.threads),
+                   '--backlog', '2048', '-b', f'127.0.0.1:{port}', 'main:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', '--workers', str(args.workers), '--backlog', '2048',
+                   '--port', str(port), '--log-level', 'warning', 'asgi:app']
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, start_new_session=True)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            status, _ = asyncio.run(request(port, 'GET', '/todo', None, 5))
+            if status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.5)
+    stop_server(process)
+    raise SystemExit(f"{kind} server didn't come up on port {port}")
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(timeout=30)
+
+
+async def request(port, method, path, body, timeout):
+    """One request on a fresh connection. Returns (status, seconds)."""
+    started = time.perf_counter()
+    data = json.dumps(body).encode() if body is not None else b''
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        writer.write(
+            f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nCookie: session={SESSION_ID}\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode()
+            + data
+        )
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    status = int(response.split(b' ', 2)[1]) if response.startswith(b'HTTP/') else 0
+    return status, time.perf_counter() - started
+
+
+async def run_level(port, connections, duration, timeout, rng):
+    latencies = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            method, path, body = rng.choice(REQUESTS)
+            try:
+                status, seconds = await request(port, method, path, body, timeout)
+            except (OSError, asyncio.TimeoutError):
+                errors += 1
+                continue
+            if status == 200:
+                latencies.append(seconds)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'connections': connections,
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+        'p95_ms': round(latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000, 1) if latencies else None,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo', required=True, help='MongoDB URI (uses a scratch database)')
+    parser.add_argument('--connections', default='10,50,200,500,1000')
+    parser.add_argument('--servers', default='sync,async')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn and uvicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per connection count')
+    parser.add_argument('--timeout', type=float, default=10, help='per request')
+    parser.add_argument('--todos', type=int, default=50)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='where to save results (default benchmarks/results/async-capacity-<time>.json)')
+    args = parser.parse_args()
+
+    mongo = MongoClient(args.mongo)
+    mongo.drop_database(SCRATCH_DB)
+    seed(mongo.get_database(SCRATCH_DB), args.todos)
+
+    results = {}
+    try:
+        for kind in args.servers.split(','):
+            process = start_server(kind, args.port, args)
+            try:
+                print(f"--- {kind}: {args.workers} workers"
+                      f"{f' x {args.threads} threads' if kind == 'sync' else ''}, {os.cpu_count()} CPUs ---")
+                print(f"{'conns':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+                results[kind] = []
+                for connections in (int(c) for c in args.connections.split(',')):
+                    level = asyncio.run(run_level(args.port, connections, args.duration, args.timeout,
+                                                  random.Random(args.seed)))
+                    results[kind].append(level)
+                    print(f"{connections:>6} {level['requests_per_second']:>8} {level['p50_ms'] or '-':>8} "
+                          f"{level['p95_ms'] or '-':>8} {level['errors']:>7}")
+            finally:
+                stop_server(process)
+    finally:
+        mongo.drop_database(SCRATCH_DB)
+
+    output = args.output or os.path.join('benchmarks', 'results',
+                                         f"async-capacity-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'config': {k: v for k, v in vars(args).items() if k not in ('output', 'mongo')},
+            'results': results,
+        }, f, indent=2)
+    print(f"Saved {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Microbenchmark: hour bucketing of study sessions, the old per-hour
+timedelta loop from log_session() against time_buckets.
+
+    python -m benchmarks.bucketing [--sessions 10000]
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from session_log import weekly_increments
+from time_buckets import bucket_intervals
+
+
+def loop_productive_hours(start_time, duration_seconds):
+    """The loop log_session() used before time_buckets."""
+    end_time = start_time + timedelta(seconds=duration_seconds)
+    current = start_time
+    remaining = duration_seconds
+    updates = {}
+
+    while current < end_time and remaining > 0:
+        hour_key = str(current.hour).zfill(2)
+        seconds_left_in_hour = (60 - current.minute) * 60 - current.second
+        seconds_to_add = min(remaining, seconds_left_in_hour)
+        updates[f"productive_hours.{hour_key}"] = updates.get(f"productive_hours.{hour_key}", 0) + (
+                    seconds_to_add // 60)
+        remaining -= seconds_to_add
+        current += timedelta(seconds=seconds_to_add)
+
+    return updates
+
+
+def make_sessions(count, seed=42):
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    return [(base + timedelta(seconds=rng.randrange(90 * 86400)), rng.randrange(60, 4 * 3600))
+            for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    sessions = make_sessions(args.sessions)
+    starts = [start for start, _ in sessions]
+    durations = [duration for _, duration in sessions]
+    with_subject = [('subject', start, duration) for start, duration in sessions]
+
+    timings = {
+        'loop (per session)': lambda: [loop_productive_hours(s, d) for s, d in sessions],
+        'bucket_intervals': lambda: bucket_intervals(starts, durations),
+        'weekly_increments': lambda: weekly_increments(with_subject),
+    }
+
+    print(f"--- Bucketing {args.sessions} sessions, best of {args.repeat} ---")
+    baseline = None
+    for name, fn in timings.items():
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        baseline = baseline or best
+        print(f"{name:<20} {best * 1000:9.1f} ms   {baseline / best:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
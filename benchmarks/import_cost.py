@@ -0,0 +1,75 @@
+"""
+What a worker pays to import the app: import time per package (from
+python -X importtime) and resident memory, for a worker that never draws a
+chart and for one that does. The second is what every worker paid when
+main.py imported pandas and plotly.express at the top.
+
+    python -m benchmarks.import_cost [--top 12]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+# An unreachable server with a tiny timeout, so main.py's connection check fails fast
+ENV = {**os.environ, 'url': 'mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=1'}
+
+SCENARIOS = {
+    'import main': 'import main',
+    'import main, draw charts': 'import main; import chart_figures',
+}
+
+RSS_SNIPPET = """
+import sys
+{code}
+with open('/proc/self/status') as f:
+    rss = next(line for line in f if line.startswith('VmRSS')).split()[1]
+print(rss, 'pandas' in sys.modules, 'plotly' in sys.modules)
+"""
+
+
+def run(args):
+    return subprocess.run([sys.executable, *args], env=ENV, capture_output=True, text=True)
+
+
+def import_times(code):
+    """Total import time and self time summed per top-level package, in microseconds."""
+    stderr = run(['-X', 'importtime', '-c', code]).stderr
+    per_package = defaultdict(int)
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        per_package[name.strip().split('.')[0]] += int(self_us)
+        if not name[1:].startswith(' '):
+            total += int(cumulative_us)
+    return total, per_package
+
+
+def rss(code):
+    rss_kb, has_pandas, has_plotly = run(['-c', RSS_SNIPPET.format(code=code)]).stdout.split()[-3:]
+    return int(rss_kb) / 1024, has_pandas == 'True', has_plotly == 'True'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--top', type=int, default=12)
+    args = parser.parse_args()
+
+    print("--- Import time (python -X importtime, self time per package) ---")
+    for label, code in SCENARIOS.items():
+        total, per_package = import_times(code)
+        print(f"\n{label}: {total / 1000:.0f} ms")
+        for name, micros in sorted(per_package.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {name:<20} {micros / 1000:8.1f} ms")
+
+    print("\n--- Resident memory per worker ---")
+    for label, code in SCENARIOS.items():
+        megabytes, has_pandas, has_plotly = rss(code)
+        print(f"{label:<26} {megabytes:7.1f} MB   pandas loaded: {has_pandas!s:<5}  plotly loaded: {has_plotly}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,388 @@
+"""
+Load test for the main routes: seed a database with synthetic users
+(subjects, weeks of study sessions, files, time goals and todos), then
+drive /dashboard, /log_session, /time, /performance and /todo through
+Flask's test client and report p50/p95/p99 latency, throughput and Mongo
+operations per request. Results are saved as JSON so runs can be compared.
+
+    python -m benchmarks.load [--users 20 --subjects 6 --weeks 26 --requests 500]
+    python -m benchmarks.load --mongo mongodb://localhost:27017   # real mongod, scratch database
+    python -m benchmarks.load --compare benchmarks/results/load-20250301-101500.json
+
+Without --mongo everything runs against mongomock, which is good for
+comparing query counts between runs but not for absolute latencies.
+"""
+import argparse
+import contextvars
+import json
+import math
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from server_session import CachedSessionStore, MongoSessionStore, ServerSessionInterface
+
+SCRATCH_DB = 'pathfinder_bench'
+
+# Collection methods that each cost one round trip, as in conftest.py
+DB_OPERATIONS = [
+    'find', 'find_one', 'aggregate', 'count_documents', 'distinct',
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one',
+    'delete_one', 'delete_many', 'find_one_and_update', 'bulk_write',
+]
+
+ROUTES = ['dashboard', 'log_session', 'time', 'performance', 'todo']
+SUBJECT_NAMES = ['maths', 'physics', 'chemistry', 'biology', 'history', 'geography',
+                 'english', 'economics', 'computing', 'art', 'music', 'french']
+
+
+class OpCounter:
+    """
+    Counts Mongo calls made for the current request. The count lives in a
+    context variable, so concurrent requests don't mix, and work a request
+    hands to a thread pool is still counted once the pool is followed.
+    """
+
+    def __init__(self):
+        self._ops = contextvars.ContextVar('ops', default=None)
+        self._depth = contextvars.ContextVar('depth', default=0)
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._ops.set(Counter())
+
+    def stop(self):
+        ops = self._ops.get()
+        self._ops.set(None)
+        return ops
+
+    def install(self, collection_class):
+        for name in DB_OPERATIONS:
+            setattr(collection_class, name, self._wrap(name, getattr(collection_class, name)))
+
+    def follow(self, executor):
+        """Run the executor's jobs in the context of whoever submitted them."""
+        submit = executor.submit
+
+        def submit_in_context(fn, /, *args, **kwargs):
+            return submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+        executor.submit = submit_in_context
+
+    def _wrap(self, name, method):
+        def counted(collection, *args, **kwargs):
+            ops = self._ops.get()
+            if ops is None:
+                return method(collection, *args, **kwargs)
+            # find_one() calls find() underneath, only count the outer call
+            depth = self._depth.get()
+            if depth == 0:
+                # A request's pool jobs share its Counter
+                with self._lock:
+                    ops[f"{collection.name}.{name}"] += 1
+            token = self._depth.set(depth + 1)
+            try:
+                return method(collection, *args, **kwargs)
+            finally:
+                self._depth.reset(token)
+
+        return counted
+
+
+def load_app(mongo_uri, counter):
+    """Import main.py against mongomock or a scratch database on a real server."""
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ['SEARCH_INDEX_PATH'] = os.path.join(tempfile.mkdtemp(), 'search_index.db')
+    # main builds indexes and sweeps on import, keep both off the app's real database
+    os.environ['MONGO_DB_NAME'] = SCRATCH_DB
+    os.environ['SWEEP_EVERY'] = '0'
+
+    if mongo_uri is None:
+        import mongomock
+        os.environ['url'] = 'mongodb://localhost:27017'
+        with mongomock.patch(servers=(('localhost', 27017),)):
+            import main
+        counter.install(mongomock.collection.Collection)
+    else:
+        import pymongo.collection
+        os.environ['url'] = mongo_uri
+        import main
+        if main.db is None:
+            raise SystemExit(f"Could not connect to {mongo_uri}")
+        counter.install(pymongo.collection.Collection)
+
+    # log_session writes the goal and rollups on session_log's pool while the weekly doc upserts
+    import session_log
+    counter.follow(session_log._executor)
+
+    # Never seed the app's real database
+    db = main.client.get_database(SCRATCH_DB)
+    main.client.drop_database(SCRATCH_DB)
+    main.db = db
+    main.users_collection = db.users
+    main.subjects_collection = db.subjects
+    main.activities_collection = db.activities
+    main.goals_collection = db.goals
+    main.sessions_collection = db.sessions
+    main.reminders_collection = db.reminders
+    main.files_collection = db.files
+    main.artifact_pipeline.db = db
+    # Usually wrapped in a CachedSessionStore
+    store = main.session_store
+    if isinstance(getattr(store, 'store', store), MongoSessionStore):
+        sessions = MongoSessionStore(db.web_sessions)
+        if isinstance(store, CachedSessionStore):
+            sessions = CachedSessionStore(sessions, ttl=main.SESSION_CACHE_SECONDS)
+        main.session_store = sessions
+        main.app.session_interface = ServerSessionInterface(sessions)
+    from indexes import ensure_indexes
+    list(ensure_indexes(db))
+    return main
+
+
+def seed(db, args, rng):
+    """Synthetic users shaped like real ones. Returns [(user_id, [subject names])]."""
+    from session_log import log_study_sessions
+
+    users = []
+    now = datetime.utcnow()
+    first_week = now - timedelta(weeks=args.weeks)
+    for n in range(args.users):
+        user_id = str(db.users.insert_one({
+            'username': f'bench{n}', 'email': f'bench{n}@example.com',
+            'password': None, 'auth_provider': 'local'
+        }).inserted_id)
+
+        names = rng.sample(SUBJECT_NAMES, min(args.subjects, len(SUBJECT_NAMES)))
+        subjects = []
+        for name in names:
+            subject_id = db.subjects.insert_one({
+                'owner_id': user_id, 'subject': name, 'marks': rng.randint(40, 100),
+                'priority': 'medium', 'category': 'core', 'description': f'{name} notes',
+                'created_at': first_week
+            }).inserted_id
+            subjects.append((subject_id, name))
+
+        files = [{
+            'user_id': ObjectId(user_id), 'subject_id': subject_id, 'subject_name': name,
+            'original_filename': f'{name}-{i}.pdf', 'secure_filename': f'{name}-{i}.pdf',
+            'sha256': f'{rng.getrandbits(256):064x}', 'file_type': 'application/pdf',
+            'size': rng.randint(10_000, 5_000_000), 'upload_date': first_week
+        } for subject_id, name in subjects for i in range(args.files)]
+
+        week_start = now - timedelta(days=now.weekday())
+        goals = [{
+            'user_id': ObjectId(user_id), 'subject_id': subject_id, 'goal_type': 'time',
+            'target_duration_minutes': 600, 'current_duration_minutes': 0,
+            'start_date': week_start.replace(hour=0, minute=0, second=0),
+            'end_date': (week_start + timedelta(days=6)).replace(hour=23, minute=59, second=59),
+            'status': 'active'
+        } for subject_id, _ in subjects[:2]]
+        goals += [{
+            'user_id': user_id, 'task': f'task {i}', 'goal_type': 'task', 'current_progress': 0,
+            'goal_period': rng.choice(['daily', 'weekly', 'monthly']),
+            'deadline': now + timedelta(days=rng.randint(-3, 30)),
+            'completion_status': rng.random() < 0.3, 'created_at': now - timedelta(days=rng.randint(0, 30))
+        } for i in range(args.todos)]
+        # insert_many refuses an empty list
+        for collection, docs in ((db.files, files), (db.goals, goals)):
+            if docs:
+                collection.insert_many(docs)
+
+        # A few timer runs per subject per week, through the real logging path
+        intervals = [
+            (subject_id, name, first_week + timedelta(days=rng.uniform(0, args.weeks * 7)),
+             rng.randint(10, 120) * 60)
+            for subject_id, name in subjects for _ in range(args.weeks * 3)
+        ]
+        log_study_sessions(db, user_id, intervals)
+        users.append((user_id, names))
+
+    return users
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    # Nearest rank
+    return sorted_values[max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)]
+
+
+class Runner:
+    def __init__(self, app, users, counter, seed_value):
+        self.app = app
+        self.users = users
+        self.counter = counter
+        self.seed = seed_value
+        self._local = threading.local()
+
+    def _client(self, user_id):
+        # Test clients keep a cookie jar, so one per user per thread
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        if user_id not in clients:
+            client = self.app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+                sess['username'] = 'bench'
+            clients[user_id] = client
+        return clients[user_id]
+
+    def request(self, route, user_index, rng):
+        user_id, subjects = self.users[user_index]
+        client = self._client(user_id)
+
+        self.counter.start()
+        started = time.perf_counter()
+        if route == 'log_session':
+            response = client.post('/log_session', json={
+                'subject_name': rng.choice(subjects), 'duration_seconds': rng.randint(5, 50) * 60
+            })
+        else:
+            response = client.get(f'/{route}')
+        elapsed = time.perf_counter() - started
+        ops = self.counter.stop()
+        return route, elapsed, response.status_code, ops
+
+    def run(self, plan, concurrency):
+        """plan is [(route, user_index)]. Returns (results, wall seconds)."""
+        def work(job):
+            i, (route, user_index) = job
+            return self.request(route, user_index, random.Random(self.seed + i))
+
+        started = time.perf_counter()
+        if concurrency == 1:
+            results = [work(job) for job in enumerate(plan)]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(work, enumerate(plan)))
+        return results, time.perf_counter() - started
+
+
+def summarize(results, wall_seconds):
+    per_route = {}
+    for route, elapsed, status, ops in results:
+        entry = per_route.setdefault(route, {'latencies': [], 'errors': 0, 'ops': Counter()})
+        entry['latencies'].append(elapsed)
+        entry['ops'].update(ops)
+        if status >= 400:
+            entry['errors'] += 1
+
+    def stats(latencies, ops, errors):
+        latencies = sorted(latencies)
+        count = len(latencies)
+        return {
+            'count': count,
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'mean_ms': round(sum(latencies) / count * 1000, 3),
+            'max_ms': round(latencies[-1] * 1000, 3),
+            'ops_per_request': round(sum(ops.values()) / count, 2),
+            'ops': {name: round(n / count, 2) for name, n in sorted(ops.items())},
+        }
+
+    report = {route: stats(e['latencies'], e['ops'], e['errors']) for route, e in sorted(per_route.items())}
+    everything = stats([r[1] for r in results], sum((e['ops'] for e in per_route.values()), Counter()),
+                       sum(e['errors'] for e in per_route.values()))
+    everything['throughput_rps'] = round(len(results) / wall_seconds, 1)
+    everything['seconds'] = round(wall_seconds, 3)
+    return report, everything
+
+
+def print_report(report, total, previous=None):
+    print(f"{'route':<14} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/req':>8}"
+          + ('   p95 vs before   ops vs before' if previous else ''))
+    rows = list(report.items()) + [('all', total)]
+    for route, row in rows:
+        line = (f"{route:<14} {row['count']:>5} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+                f"{row['p99_ms']:>9.2f} {row['ops_per_request']:>8.2f}")
+        before = previous.get(route) if previous else None
+        if before:
+            change = (row['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0
+            line += f"   {change:+13.1f}%   {row['ops_per_request'] - before['ops_per_request']:+13.2f}"
+        if row['errors']:
+            line += f"   {row['errors']} errors"
+        print(line)
+    print(f"\n{total['count']} requests in {total['seconds']:.2f}s, {total['throughput_rps']} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo', help='MongoDB URI to run against instead of mongomock (uses a scratch database)')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--subjects', type=int, default=6, help='per user')
+    parser.add_argument('--weeks', type=int, default=26, help='weeks of study history per user')
+    parser.add_argument('--files', type=int, default=3, help='per subject')
+    parser.add_argument('--todos', type=int, default=20, help='per user')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=25)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--routes', default=','.join(ROUTES))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='where to save results (default benchmarks/results/load-<time>.json)')
+    parser.add_argument('--compare', help='an earlier results file to compare against')
+    args = parser.parse_args()
+
+    routes = [r for r in args.routes.split(',') if r]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    rng = random.Random(args.seed)
+    counter = OpCounter()
+    app_module = load_app(args.mongo, counter)
+    app_module.app.config['TESTING'] = True
+
+    started = time.perf_counter()
+    users = seed(app_module.db, args, rng)
+    seed_seconds = time.perf_counter() - started
+    print(f"Seeded {args.users} users x {args.subjects} subjects x {args.weeks} weeks "
+          f"({app_module.db.sessions.count_documents({})} weekly docs) in {seed_seconds:.1f}s "
+          f"on {'mongomock' if args.mongo is None else args.mongo}")
+
+    # Routes drawn at random, so log_session invalidates the chart cache the way real use does
+    plan = [(rng.choice(routes), rng.randrange(len(users))) for _ in range(args.warmup + args.requests)]
+    runner = Runner(app_module.app, users, counter, args.seed)
+    runner.run(plan[:args.warmup], 1)
+    results, wall_seconds = runner.run(plan[args.warmup:], args.concurrency)
+    report, total = summarize(results, wall_seconds)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            earlier = json.load(f)
+        previous = {**earlier['routes'], 'all': earlier['total']}
+    print()
+    print_report(report, total, previous)
+
+    output = args.output or os.path.join('benchmarks', 'results', f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'backend': 'mongomock' if args.mongo is None else 'mongod',
+            'python': platform.python_version(),
+            'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'mongo')},
+            'seed_seconds': round(seed_seconds, 2),
+            'routes': report,
+            'total': total,
+        }, f, indent=2)
+    print(f"Saved {output}")
+
+    if args.mongo is not None:
+        app_module.client.drop_database(SCRATCH_DB)
+
+
+if __name__ == '__main__':
+    main()
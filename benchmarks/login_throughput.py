@@ -0,0 +1,65 @@
+"""
+Login throughput against the number of bcrypt worker processes: many
+threads (standing in for gunicorn threads or workers) verify passwords
+through one PasswordHasher at once.
+
+    python -m benchmarks.login_throughput [--workers 0,1,2,4 --threads 16 --logins 64 --rounds 10]
+
+workers=0 is the old behaviour, hashing inline on the request thread.
+Throughput stops growing at the machine's core count.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from password_hashing import PasswordHasher
+
+
+def run(workers, threads, logins, rounds, hashed):
+    hasher = PasswordHasher(rounds=rounds, workers=workers, max_pending=threads, wait=60)
+    hasher.check(hashed, 'warm up')  # start the pool's processes outside the timing
+    latencies = []
+    depths = []
+
+    def login(_):
+        started = time.perf_counter()
+        depths.append(hasher.queue_depth)
+        assert hasher.check(hashed, 'correct horse battery staple')
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+
+    latencies.sort()
+    return {
+        'logins_per_second': logins / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'max_queue_depth': max(depths),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', default='0,1,2,4')
+    parser.add_argument('--threads', type=int, default=16, help='concurrent logins')
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    hashed = PasswordHasher(rounds=args.rounds, workers=0).hash('correct horse battery staple')
+    print(f"--- {args.logins} logins from {args.threads} threads, bcrypt cost {args.rounds}, "
+          f"{os.cpu_count()} CPUs ---")
+    print(f"{'workers':>8} {'logins/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'max queue':>10}")
+    for workers in (int(w) for w in args.workers.split(',')):
+        result = run(workers, args.threads, args.logins, args.rounds, hashed)
+        print(f"{workers if workers else 'inline':>8} {result['logins_per_second']:>10.1f} "
+              f"{result['p50_ms']:>9.0f} {result['p95_ms']:>9.0f} {result['max_queue_depth']:>10}")
+
+
+if __name__ == '__main__':
+    main()
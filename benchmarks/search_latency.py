@@ -0,0 +1,42 @@
+"""
+/search latency against the sqlite full-text index: fill a scratch index
+with one user's entries, then time a mix of queries, first page of 20 like
+the search box asks for.
+
+    python -m benchmarks.search_latency [--entries 2000] [--queries 500]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from search_index import SearchIndex
+
+QUERIES = ['practice', 'integration', 'series', 'problem set', 'limi']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    index = SearchIndex(os.path.join(tempfile.mkdtemp(), 'search_index.db'))
+    for i in range(args.entries):
+        index.upsert('bench', 'todo', f'todo-{i}', f'practice problem set {i}',
+                     'integration by parts' if i % 4 == 0 else 'limits and series')
+
+    timings = []
+    for i in range(args.queries):
+        started = time.perf_counter()
+        index.search('bench', QUERIES[i % len(QUERIES)])
+        timings.append((time.perf_counter() - started) * 1000)
+
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    print(f"--- {args.queries} searches over {args.entries} entries ---")
+    print(f"median {statistics.median(timings):.2f} ms   p95 {p95:.2f} ms   max {max(timings):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
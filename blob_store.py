@@ -0,0 +1,229 @@
+"""
+Content-addressed storage for uploaded files.
+
+Every file is stored once under its SHA-256 (uploads/blobs/ab/cd/abcd...),
+so uploading the same file twice, or two files with the same name, never
+overwrites anything and identical files share one copy on disk. Form
+uploads are hashed while Werkzeug writes them to disk; resumable uploads are
+hashed in one pass once their last chunk arrives.
+"""
+import fcntl
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import Request
+
+CHUNK_SIZE = 1024 * 1024
+SHA256_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+def is_sha256(value):
+    return isinstance(value, str) and SHA256_PATTERN.fullmatch(value) is not None
+
+
+def hash_path(root, sha256):
+    """root/ab/cd/abcd..., refusing anything that isn't a hex digest and could point outside root."""
+    if not is_sha256(sha256):
+        raise ValueError(f"not a sha256: {sha256!r}")
+    return os.path.join(root, sha256[:2], sha256[2:4], sha256)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class OffsetMismatch(Exception):
+    """A resumable chunk didn't start where the partial upload ends."""
+
+    def __init__(self, offset):
+        super().__init__(f"upload is at offset {offset}")
+        self.offset = offset
+
+
+class HashingFile:
+    """A temp file in the blob store that hashes everything written to it."""
+
+    def __init__(self, directory):
+        fd, self.name = tempfile.mkstemp(dir=directory, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def close(self):
+        self._file.close()
+        # Never committed (e.g. a rejected upload), so nothing refers to it
+        try:
+            os.remove(self.name)
+        except FileNotFoundError:
+            pass
+
+    def __getattr__(self, name):
+        # read, seek, tell, flush, ... for Werkzeug's FileStorage
+        return getattr(self._file, name)
+
+
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.partial_dir = os.path.join(root, 'partial')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    def path(self, sha256):
+        return hash_path(self.root, sha256)
+
+    def exists(self, sha256):
+        return os.path.exists(self.path(sha256))
+
+    def delete(self, sha256):
+        try:
+            os.remove(self.path(sha256))
+        except FileNotFoundError:
+            pass
+
+    def touch(self, sha256):
+        """
+        Mark an existing blob as just used, so the garbage collector's grace
+        period protects it while its new files doc is being written.
+        Returns False if there is no such blob.
+        """
+        try:
+            os.utime(self.path(sha256))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def iter_blobs(self):
+        """Yield (sha256, size, mtime) for every stored blob."""
+        for top in os.scandir(self.root):
+            if not top.is_dir() or top.path in (self.tmp_dir, self.partial_dir):
+                continue
+            for sub in os.scandir(top.path):
+                for entry in os.scandir(sub.path):
+                    if not is_sha256(entry.name):
+                        continue
+                    stat = entry.stat()
+                    yield entry.name, stat.st_size, stat.st_mtime
+
+    def iter_leftovers(self):
+        """Yield (path, size, mtime) for temp files and partial uploads."""
+        for directory in (self.tmp_dir, self.partial_dir):
+            for entry in os.scandir(directory):
+                stat = entry.stat()
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def temp_file(self):
+        return HashingFile(self.tmp_dir)
+
+    def commit(self, hashing_file):
+        """Move a fully written HashingFile to its content address. Returns (sha256, size)."""
+        hashing_file.flush()
+        os.fsync(hashing_file.fileno())
+        sha256, size = hashing_file.hexdigest(), hashing_file.size
+        destination = self.path(sha256)
+
+        if self.touch(sha256):
+            hashing_file.close()  # already stored, drop the duplicate
+        else:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.replace(hashing_file.name, destination)
+            hashing_file.close()
+        return sha256, size
+
+    def save_stream(self, stream, max_size=None):
+        """Copy any readable stream into the store in fixed-size chunks."""
+        hashing_file = self.temp_file()
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hashing_file.write(chunk)
+                if max_size is not None and hashing_file.size > max_size:
+                    raise UploadTooLarge()
+        except BaseException:
+            hashing_file.close()
+            raise
+        return self.commit(hashing_file)
+
+    # --- Resumable uploads ---
+    # A partial upload is a plain file; its size on disk is how far the
+    # client got, so any worker can accept the next chunk.
+
+    def _partial_path(self, upload_id):
+        return os.path.join(self.partial_dir, str(upload_id))
+
+    def partial_size(self, upload_id):
+        try:
+            return os.path.getsize(self._partial_path(upload_id))
+        except FileNotFoundError:
+            return 0
+
+    def append_chunk(self, upload_id, offset, stream, max_size):
+        """Append a chunk that starts at offset. Returns the new size of the partial upload."""
+        with open(self._partial_path(upload_id), 'ab') as partial:
+            # Two retries of the same chunk must not both append
+            fcntl.flock(partial, fcntl.LOCK_EX)
+            current = partial.seek(0, os.SEEK_END)
+            if current != offset:
+                raise OffsetMismatch(current)
+
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if current + len(chunk) > max_size:
+                    partial.truncate(offset)
+                    raise UploadTooLarge()
+                partial.write(chunk)
+                current += len(chunk)
+            return current
+
+    def commit_partial(self, upload_id):
+        """Hash a finished resumable upload and move it into the store. Returns (sha256, size)."""
+        partial_path = self._partial_path(upload_id)
+        digest = hashlib.sha256()
+        size = 0
+        with open(partial_path, 'rb') as partial:
+            while True:
+                chunk = partial.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        destination = self.path(sha256)
+        if self.touch(sha256):
+            self.discard_partial(upload_id)
+        else:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.replace(partial_path, destination)
+        return sha256, size
+
+    def discard_partial(self, upload_id):
+        try:
+            os.remove(self._partial_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+
+def upload_request_class(store):
+    """A Flask Request class that streams uploaded files straight into the blob store."""
+
+    class BlobUploadRequest(Request):
+        def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+            return store.temp_file()
+
+    return BlobUploadRequest
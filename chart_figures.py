@@ -0,0 +1,47 @@
+"""
+Plotly figures for the chart series in charts.py.
+
+plotly.express pulls in pandas and takes a noticeable share of a worker's
+startup time and memory, so this module is only imported the first time a
+chart actually has to be drawn. Don't import it at module level elsewhere.
+"""
+import plotly.express as px
+
+
+def time_figure(series):
+    return px.bar(x=series['labels'],
+                  y=series['values'],
+                  labels={"x": "subject_name", "y": "time_hours"},
+                  title="Total Study Time by Subject (hrs)",
+                  text=series['values'],
+                  color_discrete_sequence=["#6B8E23"])
+
+
+def performance_figure(series):
+    fig = px.bar(
+        x=[label.title() for label in series['labels']],
+        y=series['values'],
+        labels={'x': 'Subject', 'y': 'Marks'},
+        title="Subject-wise Performance",
+        text=series['values'],
+        color_discrete_sequence=['#7E6363']
+    )
+    fig.update_traces(textposition="outside")
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#7E6363',
+        xaxis_title="Subject",
+        yaxis_title="Marks (%)"
+    )
+    return fig
+
+
+FIGURES = {
+    'time': time_figure,
+    'performance': performance_figure,
+}
+
+
+def render_html(kind, series):
+    return FIGURES[kind](series).to_html(full_html=False, include_plotlyjs='cdn')
@@ -0,0 +1,106 @@
+"""
+Chart data for /time and /performance, and a cache for the Plotly HTML
+built from it (see chart_figures).
+
+Cached entries are keyed by the user's data_version, which every write that
+changes chart data bumps, so stale charts are never served and nothing has
+to be invalidated explicitly.
+"""
+import threading
+from collections import OrderedDict
+
+from bson import ObjectId
+
+from rollups import get_rollups
+
+
+def get_data_version(db, user_id):
+    user = db.users.find_one({'_id': ObjectId(user_id)}, {'data_version': 1})
+    return (user or {}).get('data_version', 0)
+
+
+def bump_data_version(db, user_id):
+    # Returns the write, so a Motor db can await it
+    return db.users.update_one({'_id': ObjectId(user_id)}, {'$inc': {'data_version': 1}})
+
+
+def time_series(db, user_id):
+    rollups = get_rollups(db, user_id)
+    return {
+        'labels': [r['subject_name'] for r in rollups],
+        'values': [round(r.get('total_minutes', 0) / 60, 2) for r in rollups],
+    }
+
+
+def performance_series(db, user_id):
+    subjects = list(db.subjects.find({'owner_id': user_id}, {'_id': 1, 'subject': 1, 'marks': 1}))
+    minutes_by_subject = {r['subject_id']: r.get('total_minutes', 0) for r in get_rollups(db, user_id)}
+    return {
+        'labels': [s['subject'] for s in subjects],
+        'values': [s['marks'] for s in subjects],
+        'minutes': [minutes_by_subject.get(s['_id'], 0) for s in subjects],
+    }
+
+
+CHARTS = {
+    'time': time_series,
+    'performance': performance_series,
+}
+
+
+class ChartCache:
+    """Small thread-safe LRU of chart series and rendered HTML, with hit/miss counters."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+def _entry(cache, db, kind, user_id):
+    key = (user_id, kind, get_data_version(db, user_id))
+    entry = cache.get(key)
+    if entry is None:
+        entry = {'series': CHARTS[kind](db, user_id), 'html': None}
+        cache.put(key, entry)
+    return entry
+
+
+def get_series(cache, db, kind, user_id):
+    return _entry(cache, db, kind, user_id)['series']
+
+
+def get_chart(cache, db, kind, user_id):
+    """
+    Series plus the Plotly HTML fragment, which is only built once per data
+    version. There is no fragment (None) when the series is empty.
+    """
+    entry = _entry(cache, db, kind, user_id)
+    if entry['html'] is None and entry['series']['labels']:
+        # Plotly (and pandas under it) only get imported by workers that draw a chart
+        from chart_figures import render_html
+        entry['html'] = render_html(kind, entry['series'])
+    return entry['series'], entry['html']
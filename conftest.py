@@ -0,0 +1,130 @@
+import os
+import tempfile
+import threading
+from collections import Counter
+
+import mongomock
+import pytest
+
+from artifacts import ArtifactPipeline, ArtifactStore
+from blob_store import BlobStore, upload_request_class
+from search_index import SearchIndex
+
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+# Tests count Mongo calls, keep login sessions out of the database
+os.environ.setdefault('SESSION_STORE', 'memory')
+os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+# Tests call sweep() themselves
+os.environ.setdefault('SWEEP_EVERY', '0')
+os.environ.setdefault('SEARCH_INDEX_PATH', os.path.join(tempfile.mkdtemp(), 'search_index.db'))
+
+# main.py connects at import time, so point it at mongomock before importing
+with mongomock.patch(servers=(('localhost', 27017),)):
+    import main
+
+
+# Collection methods that cost one round trip to the server each
+DB_OPERATIONS = [
+    'find', 'find_one', 'aggregate', 'count_documents', 'distinct',
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one',
+    'delete_one', 'delete_many', 'find_one_and_update', 'bulk_write',
+]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.calls = Counter()
+        self._local = threading.local()
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+    def reset(self):
+        self.calls.clear()
+
+    def wrap(self, name, method):
+        counter = self
+
+        def counted(collection, *args, **kwargs):
+            # mongomock calls find() from find_one() etc., only count the outer call
+            depth = getattr(counter._local, 'depth', 0)
+            if depth == 0:
+                counter.calls[(collection.name, name)] += 1
+            counter._local.depth = depth + 1
+            try:
+                return method(collection, *args, **kwargs)
+            finally:
+                counter._local.depth = depth
+
+        return counted
+
+
+@pytest.fixture
+def db():
+    for name in main.db.list_collection_names():
+        main.db.drop_collection(name)
+    return main.db
+
+
+@pytest.fixture(autouse=True)
+def search_index(tmp_path, monkeypatch):
+    index = SearchIndex(str(tmp_path / 'search_index.db'))
+    monkeypatch.setattr(main, 'search_index', index)
+    return index
+
+
+@pytest.fixture(autouse=True)
+def rate_limits():
+    # Every test client comes from 127.0.0.1, don't let sign-in limits carry over between tests
+    main.rate_limit_store.clear()
+    return main.rate_limit_store
+
+
+@pytest.fixture
+def user_id(db):
+    result = db.users.insert_one({
+        'username': 'tester',
+        'email': 'tester@example.com',
+        'password': None,
+        'auth_provider': 'local'
+    })
+    return str(result.inserted_id)
+
+
+@pytest.fixture
+def client(db, user_id):
+    main.app.config['TESTING'] = True
+    with main.app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+            sess['username'] = 'tester'
+        yield client
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / 'blobs'))
+    monkeypatch.setattr(main, 'blob_store', store)
+    monkeypatch.setattr(main.app, 'request_class', upload_request_class(store))
+    # Uploads queue thumbnail/text jobs, keep those on the temp store too
+    artifacts = ArtifactStore(str(tmp_path / 'derived'))
+    monkeypatch.setattr(main, 'artifact_store', artifacts)
+    pipeline = ArtifactPipeline(main.db, store, artifacts, backoff=0)
+    pipeline.listeners.append(main.index_file_text)
+    monkeypatch.setattr(main, 'artifact_pipeline', pipeline)
+    return store
+
+
+@pytest.fixture
+def subject_id(db, user_id):
+    return str(db.subjects.insert_one({'owner_id': user_id, 'subject': 'maths', 'marks': 80}).inserted_id)
+
+
+@pytest.fixture
+def query_counter(monkeypatch):
+    counter = QueryCounter()
+    for name in DB_OPERATIONS:
+        method = getattr(mongomock.collection.Collection, name)
+        monkeypatch.setattr(mongomock.collection.Collection, name, counter.wrap(name, method))
+    return counter
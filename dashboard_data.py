@@ -0,0 +1,48 @@
+from goal_stats import get_goal_summary
+
+
+def load_subjects_with_files(db, user_id):
+    """Get all of a user's subjects with their files attached, in one query."""
+    return list(db.subjects.aggregate([
+        {'$match': {'owner_id': user_id}},
+        {'$lookup': {
+            'from': 'files',
+            'localField': '_id',
+            'foreignField': 'subject_id',
+            'as': 'files'
+        }}
+    ]))
+
+
+def name_time_goals(db, time_goals, subjects):
+    """Name time goals from the already loaded subjects."""
+    subject_names = {s['_id']: s.get('subject', 'Unknown Subject') for s in subjects}
+
+    # Goals pointing at subjects we didn't load get resolved in one batch
+    missing_ids = {g.get('subject_id') for g in time_goals} - set(subject_names)
+    missing_ids.discard(None)
+    if missing_ids:
+        for subject in db.subjects.find({'_id': {'$in': list(missing_ids)}}, {'subject': 1}):
+            subject_names[subject['_id']] = subject.get('subject', 'Unknown Subject')
+
+    for goal in time_goals:
+        if goal.get('subject_id') in subject_names:
+            goal['subject_name'] = subject_names[goal['subject_id']]
+
+    return time_goals
+
+
+def load_dashboard(db, user_id):
+    """
+    Load everything the dashboard renders with a fixed number of queries,
+    no matter how many subjects, files or goals the user has.
+    """
+    subjects = load_subjects_with_files(db, user_id)
+    stats, time_goals = get_goal_summary(db, user_id)
+    name_time_goals(db, time_goals, subjects)
+
+    return {
+        'subjects': subjects,
+        'stats': stats,
+        'time_goals': time_goals
+    }
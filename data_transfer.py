@@ -0,0 +1,209 @@
+"""
+Export and import everything one user owns: their account, subjects, study
+sessions and rollups, goals and todos, reminders, activity and file
+metadata (not the uploaded files themselves, those live in the blob store).
+
+Exports stream collection by collection in batches, one document per line
+as {"collection": ..., "doc": ...} with Extended JSON so ObjectIds and dates
+survive the trip. Imports upsert by _id, unordered, so running one twice is
+harmless and a duplicate doesn't stop the rest.
+
+    python data_transfer.py export USER_ID -o user.ndjson
+    python data_transfer.py import user.ndjson
+    python data_transfer.py export USER_ID -o user.parquet --format parquet   # needs pyarrow
+"""
+import argparse
+
+from bson import ObjectId, json_util
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+BATCH_SIZE = 1000
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+
+# Collection -> field holding the owner. Older collections store the user id
+# as a string, newer ones as an ObjectId.
+USER_FIELDS = {
+    'users': '_id',
+    'subjects': 'owner_id',
+    'sessions': 'user_id',
+    'study_rollups': 'user_id',
+    'goals': 'user_id',
+    'reminders': 'user_id',
+    'activities': 'user_id',
+    'files': 'user_id',
+}
+
+# What /import takes. Files docs name blobs and paths on the server, so only
+# the CLI, run by whoever runs the server, restores them.
+WEB_IMPORT_COLLECTIONS = [name for name in USER_FIELDS if name != 'files']
+
+
+def _owner_query(collection_name, user_id):
+    field = USER_FIELDS[collection_name]
+    if field == '_id':
+        return {'_id': ObjectId(user_id)}
+    # goals holds both: todos by string, time goals by ObjectId
+    return {field: {'$in': [str(user_id), ObjectId(user_id)]}}
+
+
+def export_docs(db, user_id, collections=None, batch_size=BATCH_SIZE):
+    """Yield (collection, doc) for everything the user owns, a batch at a time."""
+    for collection_name in collections or USER_FIELDS:
+        cursor = db[collection_name].find(_owner_query(collection_name, user_id)).batch_size(batch_size)
+        for doc in cursor:
+            yield collection_name, doc
+
+
+def ndjson_export(docs):
+    for collection_name, doc in docs:
+        yield json_util.dumps({'collection': collection_name, 'doc': doc}, json_options=JSON_OPTIONS) + '\n'
+
+
+def parse_ndjson(lines):
+    """(collection, doc) from export lines; blank lines are skipped."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        record = json_util.loads(line)
+        if not isinstance(record['collection'], str) or not isinstance(record['doc'], dict):
+            raise ValueError(f"not an export record: {line[:100]!r}")
+        yield record['collection'], record['doc']
+
+
+def _owned_by(collection_name, doc, user_id):
+    field = USER_FIELDS[collection_name]
+    value = doc.get(field)
+    return value is not None and str(value) == str(user_id)
+
+
+def import_docs(db, docs, batch_size=BATCH_SIZE, user_id=None, collections=None):
+    """
+    Upsert exported docs by _id in unordered bulk writes. With user_id, only
+    docs owned by that user are written, only over docs that user already
+    owns, and never their account itself. Docs for collections not in
+    collections (default: all of USER_FIELDS) are skipped.
+    Returns {collection: {'upserted': n, 'replaced': n, 'failed': n, 'skipped': n}}.
+    """
+    report = {}
+    batches = {}
+
+    def flush(collection_name):
+        ops = batches.pop(collection_name, [])
+        if not ops:
+            return
+        counts = report[collection_name]
+        try:
+            result = db[collection_name].bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # e.g. a unique index (same email, same weekly doc under another _id)
+            result_details = e.details
+            counts['failed'] += len(result_details['writeErrors'])
+            counts['upserted'] += result_details.get('nUpserted', 0)
+            counts['replaced'] += result_details.get('nModified', 0)
+            return
+        counts['upserted'] += result.upserted_count
+        counts['replaced'] += result.modified_count
+
+    for collection_name, doc in docs:
+        counts = report.setdefault(collection_name, {'upserted': 0, 'replaced': 0, 'failed': 0, 'skipped': 0})
+        if collection_name not in (collections or USER_FIELDS) or '_id' not in doc:
+            counts['skipped'] += 1
+            continue
+        if user_id is not None and (collection_name == 'users' or not _owned_by(collection_name, doc, user_id)):
+            counts['skipped'] += 1
+            continue
+
+        query = {'_id': doc['_id']}
+        if user_id is not None:
+            # Only ever replaces the user's own doc: someone else's _id fails as a duplicate key
+            field = USER_FIELDS[collection_name]
+            query[field] = doc[field]
+        ops = batches.setdefault(collection_name, [])
+        ops.append(ReplaceOne(query, doc, upsert=True))
+        if len(ops) >= batch_size:
+            flush(collection_name)
+
+    for collection_name in list(batches):
+        flush(collection_name)
+    return report
+
+
+# --- Parquet, optional ---
+# One row per document: (collection, doc as Extended JSON), written a row
+# group per batch so neither side holds the whole export in memory.
+
+def write_parquet(docs, path, batch_size=BATCH_SIZE):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([('collection', pa.string()), ('doc', pa.string())])
+    written = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        batch = {'collection': [], 'doc': []}
+        for collection_name, doc in docs:
+            batch['collection'].append(collection_name)
+            batch['doc'].append(json_util.dumps(doc, json_options=JSON_OPTIONS))
+            if len(batch['doc']) >= batch_size:
+                writer.write_table(pa.table(batch, schema=schema))
+                written += len(batch['doc'])
+                batch = {'collection': [], 'doc': []}
+        if batch['doc']:
+            writer.write_table(pa.table(batch, schema=schema))
+            written += len(batch['doc'])
+    return written
+
+
+def read_parquet(path):
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path)
+    for group in range(parquet.num_row_groups):
+        table = parquet.read_row_group(group)
+        for collection_name, doc in zip(table.column('collection').to_pylist(), table.column('doc').to_pylist()):
+            yield collection_name, json_util.loads(doc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move a user's data in and out of the database.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    export_parser = subcommands.add_parser('export')
+    export_parser.add_argument('user_id')
+    export_parser.add_argument('-o', '--output', required=True)
+    export_parser.add_argument('--format', choices=['ndjson', 'parquet'], default='ndjson')
+    import_parser = subcommands.add_parser('import')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=['ndjson', 'parquet'], default='ndjson')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    from database import get_database
+    db = get_database()
+
+    if args.command == 'export':
+        docs = export_docs(db, args.user_id, batch_size=args.batch_size)
+        if args.format == 'parquet':
+            written = write_parquet(docs, args.output, args.batch_size)
+        else:
+            written = 0
+            with open(args.output, 'w') as f:
+                for line in ndjson_export(docs):
+                    f.write(line)
+                    written += 1
+        print(f"Exported {written} documents to {args.output}")
+        return
+
+    if args.format == 'parquet':
+        report = import_docs(db, read_parquet(args.path), args.batch_size)
+    else:
+        with open(args.path) as f:
+            report = import_docs(db, parse_ndjson(f), args.batch_size)
+    for collection_name, counts in report.items():
+        print(f"{collection_name:<14} {counts['upserted']:>7} new {counts['replaced']:>7} replaced "
+              f"{counts['failed']:>5} failed {counts['skipped']:>5} skipped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+import os
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+DB_NAME = 'pathfinderDB'
+
+
+def get_database():
+    """Connect the same way main.py does, for command line tools."""
+    load_dotenv()
+    client = MongoClient(os.environ.get('url'))
+    return client.get_database(os.getenv('MONGO_DB_NAME', DB_NAME))
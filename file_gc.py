@@ -0,0 +1,212 @@
+"""
+Garbage collection for uploaded files.
+
+Deleting a files doc is the commit point of a delete; blobs are shared by
+content and only removed once nothing references them. This job sweeps up
+whatever the request paths miss:
+
+  - files docs whose subject (or blob on disk) no longer exists
+  - blobs no files doc references
+  - temp files and partial uploads nobody finished
+  - thumbnails and extracted text of blobs that are gone
+
+    python file_gc.py --dry-run   # report what would be reclaimed
+    python file_gc.py             # reclaim it
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+# A blob newer than this may be about to get a files doc (see BlobStore.touch)
+BLOB_GRACE_SECONDS = 300
+# Resumable uploads expire after a day (upload_sessions TTL)
+LEFTOVER_SECONDS = 24 * 60 * 60
+
+_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def _batches(cursor_or_list, size):
+    batch = []
+    for item in cursor_or_list:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def reclaim_blobs(db, store, sha256s, grace=BLOB_GRACE_SECONDS, dry_run=False, ignore_ids=()):
+    """
+    Delete the given blobs that no files doc references. Returns (count, bytes).
+    References from ignore_ids don't count, for dry runs where those docs
+    would have been deleted first.
+    """
+    sha256s = set(sha256s)
+    if not sha256s:
+        return 0, 0
+    query = {'sha256': {'$in': list(sha256s)}}
+    if ignore_ids:
+        query['_id'] = {'$nin': list(ignore_ids)}
+    referenced = set(db.files.distinct('sha256', query))
+
+    count = size = 0
+    cutoff = time.time() - grace
+    for sha256 in sha256s - referenced:
+        try:
+            stat = os.stat(store.path(sha256))
+        except FileNotFoundError:
+            continue
+        if stat.st_mtime > cutoff:
+            continue
+        if not dry_run:
+            store.delete(sha256)
+        count += 1
+        size += stat.st_size
+    return count, size
+
+
+def _delete_file_docs(db, store, docs, grace, dry_run, ignore_ids=()):
+    """Delete files docs (and legacy files on disk), then any blobs left unreferenced."""
+    if not dry_run:
+        db.files.delete_many({'_id': {'$in': [doc['_id'] for doc in docs]}})
+
+    size = 0
+    for doc in docs:
+        if 'sha256' not in doc and doc.get('file_path') and os.path.exists(doc['file_path']):
+            size += os.path.getsize(doc['file_path'])
+            if not dry_run:
+                os.remove(doc['file_path'])
+
+    blobs, blob_bytes = reclaim_blobs(db, store, [doc['sha256'] for doc in docs if 'sha256' in doc],
+                                      grace=grace, dry_run=dry_run, ignore_ids=ignore_ids)
+    return blobs, size + blob_bytes
+
+
+def _missing_on_disk(doc, store):
+    if 'sha256' in doc:
+        return not store.exists(doc['sha256'])
+    return not doc.get('file_path') or not os.path.exists(doc['file_path'])
+
+
+def collect_garbage(db, store, dry_run=False, batch_size=500, grace=BLOB_GRACE_SECONDS, artifacts=None):
+    """One full sweep. Returns a report of what was (or, with dry_run, would be) reclaimed."""
+    started = time.monotonic()
+    report = {'dry_run': dry_run, 'orphan_files': 0, 'orphan_blobs': 0, 'leftovers': 0,
+              'orphan_artifacts': 0, 'bytes': 0}
+    recent = datetime.utcnow() - timedelta(seconds=grace)
+    # A dry run deletes nothing, so remember what would already be gone
+    dead_ids, dead_blobs = [], set()
+
+    projection = {'subject_id': 1, 'sha256': 1, 'file_path': 1, 'upload_date': 1}
+    cursor = db.files.find({}, projection).batch_size(batch_size)
+    for batch in _batches(cursor, batch_size):
+        subject_ids = {doc['subject_id'] for doc in batch}
+        live = {s['_id'] for s in db.subjects.find({'_id': {'$in': list(subject_ids)}}, {'_id': 1})}
+        orphans = [
+            doc for doc in batch
+            if doc['subject_id'] not in live
+            or (_missing_on_disk(doc, store) and doc.get('upload_date', recent) < recent)
+        ]
+        if not orphans:
+            continue
+        report['orphan_files'] += len(orphans)
+        if dry_run:
+            dead_ids.extend(doc['_id'] for doc in orphans)
+            dead_blobs.update(doc['sha256'] for doc in orphans if 'sha256' in doc)
+        blobs, size = _delete_file_docs(db, store, orphans, grace, dry_run, ignore_ids=dead_ids)
+        report['bytes'] += size
+        report['orphan_blobs'] += blobs
+
+    cutoff = time.time() - grace
+    for batch in _batches(store.iter_blobs(), batch_size):
+        candidates = {sha256: size for sha256, size, mtime in batch if mtime <= cutoff}
+        if not candidates:
+            continue
+        referenced = set(db.files.distinct('sha256', {'sha256': {'$in': list(candidates)}}))
+        for sha256, size in candidates.items():
+            if sha256 in referenced or sha256 in dead_blobs:
+                continue
+            if dry_run:
+                dead_blobs.add(sha256)
+            else:
+                store.delete(sha256)
+            report['orphan_blobs'] += 1
+            report['bytes'] += size
+
+    leftover_cutoff = time.time() - LEFTOVER_SECONDS
+    for path, size, mtime in store.iter_leftovers():
+        if mtime > leftover_cutoff:
+            continue
+        if not dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+        report['leftovers'] += 1
+        report['bytes'] += size
+
+    # Thumbnails and text of blobs that are gone (or going, in a dry run)
+    if artifacts is not None:
+        for sha256 in list(artifacts.iter_hashes()):
+            if store.exists(sha256) and not (dry_run and sha256 in dead_blobs):
+                continue
+            if not dry_run:
+                artifacts.delete(sha256)
+            report['orphan_artifacts'] += 1
+
+    report['seconds'] = round(time.monotonic() - started, 3)
+    return report
+
+
+def delete_subject_files(db, store, user_id, subject_id, batch_size=500, on_delete=None):
+    """
+    Remove every file of a deleted subject. Returns how many files docs went.
+    on_delete is called with the ids of each batch once its docs are gone.
+    """
+    query = {'user_id': ObjectId(user_id), 'subject_id': ObjectId(subject_id)}
+    projection = {'sha256': 1, 'file_path': 1}
+    deleted = 0
+    for batch in _batches(db.files.find(query, projection).batch_size(batch_size), batch_size):
+        _delete_file_docs(db, store, batch, BLOB_GRACE_SECONDS, dry_run=False)
+        if on_delete is not None:
+            on_delete([doc['_id'] for doc in batch])
+        deleted += len(batch)
+    return deleted
+
+
+def delete_subject_files_async(db, store, user_id, subject_id, on_delete=None):
+    """Cascade a subject delete in the background so the request returns straight away."""
+    return _executor.submit(delete_subject_files, db, store, user_id, subject_id, on_delete=on_delete)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reclaim orphaned uploads.')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be deleted')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--grace', type=int, default=BLOB_GRACE_SECONDS,
+                        help='skip blobs modified in the last GRACE seconds')
+    parser.add_argument('--uploads', default='uploads', help='upload folder the app uses')
+    args = parser.parse_args()
+
+    from artifacts import ArtifactStore
+    from blob_store import BlobStore
+    from database import get_database
+    db = get_database()
+    store = BlobStore(os.path.join(args.uploads, 'blobs'))
+    artifacts = ArtifactStore(os.path.join(args.uploads, 'derived'))
+
+    report = collect_garbage(db, store, dry_run=args.dry_run, batch_size=args.batch_size, grace=args.grace,
+                             artifacts=artifacts)
+    action = 'Would reclaim' if args.dry_run else 'Reclaimed'
+    print(f"{action} {report['orphan_files']} orphaned files docs, {report['orphan_blobs']} blobs, "
+          f"{report['leftovers']} unfinished uploads and {report['orphan_artifacts']} previews "
+          f"({report['bytes'] / 1024 / 1024:.1f} MB) in {report['seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
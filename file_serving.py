@@ -0,0 +1,122 @@
+"""
+Serving uploaded files for /download and /view_file.
+
+Blobs are named by their SHA-256, which makes it a perfect ETag: browsers
+revalidate with If-None-Match and get a 304, and PDF viewers can fetch byte
+ranges. With X_ACCEL_REDIRECT set, nginx sends the bytes instead of a
+gunicorn worker (USE_X_SENDFILE does the same for Apache/lighttpd).
+
+The Content-Type comes from the stored filename, never from what the
+client sent at upload time, and only types that can't run script are
+shown inline; everything else is sent as an attachment.
+"""
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, make_response, request, send_file
+from werkzeug.utils import safe_join
+
+
+class FileMetaCache:
+    """LRU of the metadata needed to serve a file, so repeat views skip Mongo."""
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            # Deletes only invalidate this worker's cache, the ttl bounds the rest
+            if entry is None or entry[0] < self.clock():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, meta):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, meta)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+# Everything file_meta() needs from a files doc
+META_PROJECTION = {'user_id': 1, 'sha256': 1, 'secure_filename': 1}
+
+# Shown in the browser; HTML, SVG and the rest are downloaded so they can't run on our origin
+INLINE_MIMETYPES = {'application/pdf', 'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'text/plain'}
+
+
+def guess_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def file_meta(file_doc, upload_folder, blob_store):
+    if 'sha256' in file_doc:
+        path, etag = blob_store.path(file_doc['sha256']), file_doc['sha256']
+    else:
+        # Uploaded before the blob store, still in the user's own folder
+        path = safe_join(upload_folder, str(file_doc['user_id']), file_doc['secure_filename'])
+        etag = None
+    return {
+        'path': path,
+        'sha256': file_doc.get('sha256'),
+        'etag': etag,
+        'mimetype': guess_mimetype(file_doc['secure_filename']),
+        'download_name': file_doc['secure_filename'],
+    }
+
+
+def send_stored_file(meta, upload_folder, max_age=3600):
+    accel_prefix = current_app.config.get('X_ACCEL_REDIRECT')
+    if accel_prefix:
+        response = _accel_redirect(meta, upload_folder, accel_prefix)
+    else:
+        # send_file answers If-None-Match with a 304 and Range with a 206
+        response = send_file(meta['path'], mimetype=meta['mimetype'], download_name=meta['download_name'],
+                             as_attachment=meta['mimetype'] not in INLINE_MIMETYPES,
+                             etag=meta['etag'] or True, conditional=True)
+
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if meta['etag']:
+        # A files doc never changes content, only gets deleted
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def _accel_redirect(meta, upload_folder, accel_prefix):
+    relative = os.path.relpath(meta['path'], upload_folder).replace(os.sep, '/')
+    response = make_response('')
+    response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative
+    disposition = 'inline' if meta['mimetype'] in INLINE_MIMETYPES else 'attachment'
+    response.headers['Content-Disposition'] = f"{disposition}; filename=\"{meta['download_name']}\""
+    response.mimetype = meta['mimetype']
+    if meta['etag']:
+        response.set_etag(meta['etag'])
+    # nginx does the ranges itself, only the 304 is decided here
+    return response.make_conditional(request)
@@ -0,0 +1,58 @@
+from bson import ObjectId
+
+GOAL_PERIODS = ("daily", "weekly", "monthly")
+
+
+def _task_stats_pipeline():
+    # One row per period instead of every goal document
+    return [
+        {'$match': {'goal_period': {'$in': list(GOAL_PERIODS)}}},
+        {'$group': {
+            '_id': '$goal_period',
+            'total': {'$sum': 1},
+            'completed': {'$sum': {'$cond': ['$completion_status', 1, 0]}}
+        }}
+    ]
+
+
+def _stats_from_rows(rows):
+    stats = {period: {"total": 0, "completed": 0} for period in GOAL_PERIODS}
+    for row in rows:
+        stats[row['_id']] = {"total": row['total'], "completed": row['completed']}
+    return stats
+
+
+def get_task_stats(db, user_id):
+    """Count total and completed todos per goal period on the server."""
+    rows = db.goals.aggregate(
+        [{'$match': {'user_id': user_id}}] + _task_stats_pipeline()
+    )
+    return _stats_from_rows(rows)
+
+
+async def get_task_stats_async(db, user_id):
+    """get_task_stats for a Motor database."""
+    rows = await db.goals.aggregate(
+        [{'$match': {'user_id': user_id}}] + _task_stats_pipeline()
+    ).to_list(None)
+    return _stats_from_rows(rows)
+
+
+def get_goal_summary(db, user_id):
+    """
+    Task stats and active time goals in a single round trip.
+    Todos store user_id as a string and time goals as an ObjectId, so match both.
+    """
+    result = next(db.goals.aggregate([
+        {'$match': {'user_id': {'$in': [user_id, ObjectId(user_id)]}}},
+        {'$facet': {
+            'task_stats': [{'$match': {'user_id': user_id}}] + _task_stats_pipeline(),
+            'time_goals': [{'$match': {
+                'user_id': ObjectId(user_id),
+                'goal_type': 'time',
+                'status': 'active'
+            }}]
+        }}
+    ]), {'task_stats': [], 'time_goals': []})
+
+    return _stats_from_rows(result['task_stats']), result['time_goals']
@@ -0,0 +1,103 @@
+"""
+HTTP plumbing for Google sign-in: one pooled requests session with timeouts
+for every OAuth call, and a cache for Google's OpenID discovery document so
+logins don't wait on fetching it.
+"""
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (3.05, 10)  # connect, read
+
+# Used until the discovery document has been fetched once
+FALLBACK_CONFIG = {
+    "authorization_endpoint": "https://accounts.google.com/o/oauth2/auth",
+    "token_endpoint": "https://oauth2.googleapis.com/token",
+    "userinfo_endpoint": "https://openidconnect.googleapis.com/v1/userinfo"
+}
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session that never waits forever: every call gets a timeout unless one is passed."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, pool_size=10):
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def max_age(cache_control, default):
+    """Seconds a response may be cached for, from its Cache-Control header."""
+    if not cache_control:
+        return default
+    if re.search(r'\b(no-store|no-cache)\b', cache_control):
+        return 0
+    match = re.search(r'\bmax-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else default
+
+
+class DiscoveryCache:
+    """
+    Caches a JSON document for as long as its Cache-Control allows.
+
+    Once expired the old copy keeps being served while one background thread
+    fetches a new one, and if fetching fails the old copy (or the fallback,
+    before the first success) is served and retried after retry_after seconds.
+    """
+
+    def __init__(self, url, http, fallback=None, default_ttl=3600, retry_after=300, clock=time.monotonic):
+        self.url = url
+        self.http = http
+        self.fallback = fallback
+        self.default_ttl = default_ttl
+        self.retry_after = retry_after
+        self.clock = clock
+        self._document = None
+        self._expires_at = 0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            document = self._document
+            expired = self.clock() >= self._expires_at
+            start_refresh = expired and document is not None and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+
+        if document is None:
+            if not expired:
+                # The last fetch failed, don't hammer the server until retry_after
+                return self.fallback
+            # Nothing to serve yet, so this one request has to wait
+            return self.refresh() or self.fallback
+        if start_refresh:
+            threading.Thread(target=self.refresh, daemon=True).start()
+        return document
+
+    def refresh(self):
+        try:
+            response = self.http.get(self.url)
+            response.raise_for_status()
+            document = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"Could not fetch {self.url}: {e}")
+            with self._lock:
+                self._expires_at = self.clock() + self.retry_after
+                self._refreshing = False
+            return None
+
+        with self._lock:
+            self._document = document
+            self._expires_at = self.clock() + max_age(response.headers.get('Cache-Control'), self.default_ttl)
+            self._refreshing = False
+        return document
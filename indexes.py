@@ -0,0 +1,235 @@
+"""
+Indexes for every collection the app queries, plus the small data migrations
+they depend on. Run at startup from main.py, or by hand:
+
+    python indexes.py            # create/update indexes
+    python indexes.py --migrate  # also fix up data the indexes rely on
+    python indexes.py --stats    # show how often each index is used
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from time_buckets import DAYS
+
+ONE_DAY = 24 * 60 * 60
+
+# Keyed by collection, each index has an explicit name so reruns can tell
+# whether it already exists with the same definition.
+INDEXES = {
+    'users': [
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+    ],
+    'subjects': [
+        IndexModel([('owner_id', ASCENDING), ('subject', ASCENDING)], name='owner_subject'),
+    ],
+    'activities': [
+        IndexModel([('user_id', ASCENDING), ('timestamp', DESCENDING)], name='user_timestamp'),
+    ],
+    'goals': [
+        IndexModel([('user_id', ASCENDING), ('deadline', ASCENDING), ('completion_status', ASCENDING)],
+                   name='user_deadline_status'),
+        IndexModel([('user_id', ASCENDING), ('goal_type', ASCENDING), ('status', ASCENDING)],
+                   name='user_type_status'),
+        IndexModel([('user_id', ASCENDING), ('subject_id', ASCENDING), ('goal_type', ASCENDING),
+                    ('status', ASCENDING)],
+                   name='user_subject_type_status'),
+        # Todos are gone a day after their deadline
+        IndexModel([('deadline', ASCENDING)], name='todo_ttl', expireAfterSeconds=ONE_DAY),
+    ],
+    'sessions': [
+        # One weekly doc per subject, log_session upserts against this
+        IndexModel([('user_id', ASCENDING), ('subject_id', ASCENDING), ('week_start', ASCENDING)],
+                   name='user_subject_week', unique=True),
+        IndexModel([('user_id', ASCENDING), ('subject_name', ASCENDING), ('week_start', ASCENDING)],
+                   name='user_subject_name_week'),
+        # /history pages newest first
+        IndexModel([('user_id', ASCENDING), ('end_time', DESCENDING), ('_id', DESCENDING)],
+                   name='user_end_time'),
+    ],
+    'logged_intervals': [
+        # Ids of batched timer runs already logged; a client retries long before this
+        IndexModel([('logged_at', ASCENDING)], name='logged_interval_ttl', expireAfterSeconds=90 * ONE_DAY),
+    ],
+    'study_rollups': [
+        IndexModel([('user_id', ASCENDING), ('subject_id', ASCENDING)], name='user_subject', unique=True),
+    ],
+    'files': [
+        IndexModel([('subject_id', ASCENDING)], name='subject'),
+        IndexModel([('user_id', ASCENDING)], name='user'),
+        # Blobs are shared, deleting a file checks whether anything else still uses its hash
+        IndexModel([('sha256', ASCENDING)], name='sha256', sparse=True),
+    ],
+    'upload_sessions': [
+        # Abandoned resumable uploads
+        IndexModel([('created_at', ASCENDING)], name='upload_ttl', expireAfterSeconds=ONE_DAY),
+    ],
+    'reminders': [
+        IndexModel([('user_id', ASCENDING), ('date', ASCENDING), ('_id', ASCENDING)], name='user_date'),
+        IndexModel([('expires_at', ASCENDING)], name='reminder_ttl', expireAfterSeconds=0),
+    ],
+    'web_sessions': [
+        # Login sessions (server_session.MongoSessionStore), not study sessions
+        IndexModel([('expires_at', ASCENDING)], name='web_session_ttl', expireAfterSeconds=0),
+    ],
+}
+
+# Options that change what an index does; anything else (v, ns, ...) is ignored
+COMPARED_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression')
+
+
+def reminder_expiry(date_str):
+    """Reminders are stored with a 'YYYY-MM-DD' date and expire once that day is over."""
+    return datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=1)
+
+
+def _same_index(existing, wanted):
+    if [tuple(k) for k in existing['key']] != list(wanted['key'].items()):
+        return False
+    return all(existing.get(opt) == wanted.get(opt) for opt in COMPARED_OPTIONS)
+
+
+def _restore_index(collection, name, info):
+    options = {opt: info[opt] for opt in COMPARED_OPTIONS if opt in info}
+    collection.create_index([tuple(k) for k in info['key']], name=name, **options)
+
+
+def ensure_indexes(db):
+    """
+    Create missing indexes and rebuild ones whose definition changed.
+    Safe to run any number of times. Returns (collection, index, result) rows.
+    """
+    report = []
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = collection.index_information()
+
+        for model in models:
+            wanted = model.document
+            name = wanted['name']
+            current = existing.get(name)
+
+            if current and _same_index(current, wanted):
+                report.append((collection_name, name, 'unchanged'))
+                continue
+
+            if current:
+                collection.drop_index(name)
+            try:
+                collection.create_indexes([model])
+                report.append((collection_name, name, 'rebuilt' if current else 'created'))
+            except OperationFailure as e:
+                # e.g. duplicate emails blocking the unique index; keep going
+                if current:
+                    _restore_index(collection, name, current)
+                report.append((collection_name, name, f'failed: {e}'))
+
+    return report
+
+
+def backfill_reminder_expiry(db):
+    """Give reminders created before the TTL index an expires_at field."""
+    updated = 0
+    for reminder in db.reminders.find({'expires_at': {'$exists': False}}, {'date': 1}):
+        try:
+            expires_at = reminder_expiry(reminder['date'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        db.reminders.update_one({'_id': reminder['_id']}, {'$set': {'expires_at': expires_at}})
+        updated += 1
+    return updated
+
+
+def backfill_session_end_time(db, now=None):
+    """
+    Weekly session docs from before end_time was written: use the end of the
+    last day with study time that week, which keeps /history in order.
+    """
+    now = now or datetime.now()
+    updated = 0
+    for doc in db.sessions.find({'end_time': {'$exists': False}}, {'week_start': 1, **{day: 1 for day in DAYS}}):
+        try:
+            week_start = datetime.strptime(doc['week_start'], '%Y-%m-%d')
+        except (KeyError, TypeError, ValueError):
+            continue
+        active = [i for i, day in enumerate(DAYS) if doc.get(day)]
+        end_time = min(week_start + timedelta(days=(active[-1] + 1) if active else 7), now)
+        db.sessions.update_one({'_id': doc['_id']}, {'$set': {'end_time': end_time}})
+        updated += 1
+    return updated
+
+
+def merge_duplicate_sessions(db):
+    """
+    Fold weekly session docs that were created twice by racing requests into
+    one, so the unique user_subject_week index can be built.
+    """
+    duplicates = db.sessions.aggregate([
+        {'$group': {
+            '_id': {'user_id': '$user_id', 'subject_id': '$subject_id', 'week_start': '$week_start'},
+            'ids': {'$push': '$_id'},
+            'count': {'$sum': 1}
+        }},
+        {'$match': {'count': {'$gt': 1}}}
+    ])
+
+    merged = 0
+    for group in duplicates:
+        docs = list(db.sessions.find({'_id': {'$in': group['ids']}}).sort('_id', ASCENDING))
+        keep, extra = docs[0], docs[1:]
+
+        inc = {}
+        for doc in extra:
+            for day in DAYS:
+                inc[day] = inc.get(day, 0) + doc.get(day, 0)
+            for hour, minutes in doc.get('productive_hours', {}).items():
+                key = f'productive_hours.{hour}'
+                inc[key] = inc.get(key, 0) + minutes
+
+        update = {'$inc': inc}
+        end_times = [doc['end_time'] for doc in extra if doc.get('end_time')]
+        if end_times:
+            update['$max'] = {'end_time': max(end_times)}
+        db.sessions.update_one({'_id': keep['_id']}, update)
+        db.sessions.delete_many({'_id': {'$in': [doc['_id'] for doc in extra]}})
+        merged += len(extra)
+
+    return merged
+
+
+def index_usage(db):
+    """Per index operation counts from $indexStats, least used first."""
+    usage = []
+    for collection_name in INDEXES:
+        for stat in db[collection_name].aggregate([{'$indexStats': {}}]):
+            usage.append((collection_name, stat['name'], stat['accesses']['ops'], stat['accesses']['since']))
+    return sorted(usage, key=lambda row: row[2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create and inspect PathfinderAI indexes.')
+    parser.add_argument('--migrate', action='store_true', help='fix up existing data the indexes rely on')
+    parser.add_argument('--stats', action='store_true', help='report index usage from $indexStats')
+    args = parser.parse_args()
+
+    from database import get_database
+    db = get_database()
+
+    if args.migrate:
+        print(f"Backfilled expires_at on {backfill_reminder_expiry(db)} reminders")
+        print(f"Merged {merge_duplicate_sessions(db)} duplicate weekly session docs")
+        print(f"Backfilled end_time on {backfill_session_end_time(db)} weekly session docs")
+
+    for collection_name, name, result in ensure_indexes(db):
+        print(f"{collection_name:<12} {name:<28} {result}")
+
+    if args.stats:
+        print()
+        for collection_name, name, ops, since in index_usage(db):
+            print(f"{collection_name:<12} {name:<28} {ops:>10} ops since {since:%Y-%m-%d %H:%M}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Per-user push channel for the dashboard: /events is a Server-Sent Events
+stream, and writes to a user's todos or reminders are published to every
+stream that user has open, instead of each tab re-fetching /todo,
+/todo_stats, /todo/check-deadlines and /reminders after every action.
+
+Two ways changes reach the broker (LIVE_UPDATES):
+
+    local          the route that made the write publishes it. Only streams
+                   in the same process see it straight away.
+    changestream   every process tails a Mongo change stream and publishes
+                   what it sees, whichever worker wrote it. Needs a replica set.
+
+Whatever isn't pushed (another worker's writes in local mode, deletes)
+reaches a stream with the fresh snapshot it's sent every
+LIVE_RESYNC_SECONDS, so with several workers local mode is at most that
+far behind.
+
+Each stream has a bounded queue. A client too slow to keep up doesn't hold
+events forever: its queue is dropped and it's sent a fresh snapshot.
+"""
+import asyncio
+import threading
+
+from pymongo.errors import PyMongoError
+
+# Sent in place of a queue that overflowed, the stream answers with a snapshot
+RESYNC = ('resync', None)
+
+
+def format_event(name, data, dumps):
+    """One SSE message. dumps is the app's JSON encoder, so dates match the JSON routes."""
+    return f'event: {name}\ndata: {dumps(data)}\n\n'
+
+
+class Subscription:
+    """
+    An open stream's queue of (event name, data). The stream is served on an
+    event loop, publishers may be on any thread.
+    """
+
+    def __init__(self, user_id, max_queue, loop):
+        self.user_id = user_id
+        self.events = asyncio.Queue(max_queue)
+        self.loop = loop
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.events.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.events.empty():
+                self.events.get_nowait()
+            self.events.put_nowait(RESYNC)
+
+    async def get(self, timeout):
+        """Next event, None if there was none within timeout (time for a heartbeat)."""
+        try:
+            return await asyncio.wait_for(self.events.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self.published = 0
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, loop):
+        """A queue for one stream served on loop."""
+        subscription = Subscription(user_id, self.max_queue, loop)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, user_id):
+        # Lets publishers skip work (like recounting stats) nobody would see
+        return user_id in self._subscribers
+
+    def publish(self, user_id, name, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.deliver((name, data))
+        self.published += len(subscribers)
+
+    @property
+    def open_streams(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+class ChangeStreamRelay:
+    """
+    Tails a change stream on the given collections in a background thread
+    and calls on_change(collection name, full document) for every insert,
+    replace and update. Deletes carry no document (so no owner) and are
+    skipped: the sweeper resyncs the owners' streams in its own process,
+    and every stream's periodic snapshot catches up on the rest.
+    """
+
+    def __init__(self, db, on_change, collections=('goals', 'reminders'), retry=5):
+        self.db = db
+        self.on_change = on_change
+        self.collections = list(collections)
+        self.retry = retry
+        self.resume_token = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='change-stream', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _watch(self):
+        pipeline = [{'$match': {
+            'ns.coll': {'$in': self.collections},
+            'operationType': {'$in': ['insert', 'replace', 'update']}
+        }}]
+        return self.db.watch(pipeline, full_document='updateLookup', resume_after=self.resume_token,
+                             max_await_time_ms=1000)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self._watch() as stream:
+                    while stream.alive and not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        self.resume_token = change['_id']
+                        if change.get('fullDocument'):
+                            self.on_change(change['ns']['coll'], change['fullDocument'])
+            except PyMongoError as e:
+                print(f"Change stream failed, retrying in {self.retry}s: {e}")
+                # ChangeStreamHistoryLost: the token fell off the oplog, start from now
+                if getattr(e, 'code', None) == 286:
+                    self.resume_token = None
+                self._stop.wait(self.retry)
@@ -1,1072 +1,1548 @@
-import os
-os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
-import plotly.express as px
-import pytz
-import requests
-import secrets
-import json
-from urllib.parse import urlencode
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
-from pymongo import MongoClient
-import pandas as pd
-from flask_bcrypt import Bcrypt
-from dotenv import load_dotenv
-from datetime import datetime, timedelta
-from bson import ObjectId
-from werkzeug.utils import secure_filename
-from flask import send_from_directory
-
-# Load environment variables first
-load_dotenv()
-
-# Create Flask app
-app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'uploads'
-ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'docx', 'pptx'}
-
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-
-
-GOOGLE_CLIENT_ID = os.getenv('GOOGLE_OAUTH_CLIENT_ID')
-GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_OAUTH_CLIENT_SECRET')
-GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid_configuration"
-
-# MongoDB setup (keeping your existing setup)
-MONGO_URI = os.environ.get('url')
-utc_now = datetime.utcnow()
-local_tz = pytz.timezone("Asia/Kolkata")
-local_now = utc_now.replace(tzinfo=pytz.utc).astimezone(local_tz)
-
-try:
-    client = MongoClient(MONGO_URI)
-    db = client.get_database('pathfinderDB')
-    users_collection = db.users
-    subjects_collection = db.subjects
-    activities_collection = db.activities
-    goals_collection = db.goals
-    sessions_collection = db.sessions
-    reminders_collection = db.reminders
-    files_collection = db.files
-    client.admin.command('ping')
-    print("MongoDB connection successful.")
-except Exception as e:
-    print(f"Could not connect to MongoDB: {e}")
-    db = None
-    users_collection = None
-    subjects_collection = None
-    activities_collection = None
-    goals_collection = None
-    sessions_collection = None
-    reminders_collection = None
-    files_collection = None
-
-bcrypt = Bcrypt(app)
-
-def get_google_provider_cfg():
-    """Get Google's OAuth configuration"""
-    try:
-        response = requests.get(GOOGLE_DISCOVERY_URL)
-        return response.json()
-    except:
-        # Fallback configuration
-        return {
-            "authorization_endpoint": "https://accounts.google.com/o/oauth2/auth",
-            "token_endpoint": "https://oauth2.googleapis.com/token",
-            "userinfo_endpoint": "https://openidconnect.googleapis.com/v1/userinfo"
-        }
-
-@app.route('/')
-def home():
-    return redirect(url_for('login'))
-
-# Debug route to check OAuth configuration
-@app.route('/debug-oauth')
-def debug_oauth():
-    redirect_uri = 'http://127.0.0.1:5000/auth/callback'  # Fixed
-    return f"""
-    <h2>OAuth Debug Info</h2>
-    <p><strong>Redirect URI:</strong> {redirect_uri}</p>
-    <p><strong>Client ID:</strong> {GOOGLE_CLIENT_ID}</p>
-    <p><strong>Add this exact redirect URI to your Google Cloud Console!</strong></p>
-    <hr>
-    <p>In Google Cloud Console:</p>
-    <ol>
-        <li>Go to APIs & Services → Credentials</li>
-        <li>Click your OAuth 2.0 Client ID</li>
-        <li>Add this redirect URI: <strong>{redirect_uri}</strong></li>
-        <li>Save changes</li>
-    </ol>
-    """
-
-@app.route('/auth/google')
-def google_login():
-    """Initiate Google OAuth flow"""
-    try:
-        # Generate state for CSRF protection
-        state = secrets.token_urlsafe(32)
-        session['oauth_state'] = state
-
-        # Get Google's configuration
-        google_provider_cfg = get_google_provider_cfg()
-        authorization_endpoint = google_provider_cfg["authorization_endpoint"]
-
-        # FIXED: Force 127.0.0.1 in redirect URI to match Google Console
-        redirect_uri = 'http://127.0.0.1:5000/auth/callback'
-
-        # Prepare the authorization URL
-        params = {
-            'client_id': GOOGLE_CLIENT_ID,
-            'redirect_uri': redirect_uri,
-            'scope': 'openid email profile',
-            'response_type': 'code',
-            'state': state,
-            'access_type': 'offline',
-            'prompt': 'consent'
-        }
-
-        authorization_url = authorization_endpoint + '?' + urlencode(params)
-        print(f"Redirecting to: {authorization_url}")
-
-        return redirect(authorization_url)
-
-    except Exception as e:
-        print(f"Error in google_login: {e}")
-        flash("Error initiating Google login", "error")
-        return redirect(url_for('login'))
-
-@app.route('/auth/callback')
-def callback():
-    """Handle Google OAuth callback"""
-    try:
-        print("=== OAuth Callback Started ===")
-
-        # Verify state parameter
-        if request.args.get('state') != session.get('oauth_state'):
-            print("State mismatch!")
-            flash("Invalid state parameter", "error")
-            return redirect(url_for('login'))
-
-        # Get authorization code
-        code = request.args.get('code')
-        if not code:
-            print("No authorization code received")
-            flash("Authorization failed", "error")
-            return redirect(url_for('login'))
-
-        print(f"Authorization code received: {code[:20]}...")
-
-        # Get Google's configuration
-        google_provider_cfg = get_google_provider_cfg()
-        token_endpoint = google_provider_cfg["token_endpoint"]
-
-        # FIXED: Use same redirect URI format as in authorization
-        redirect_uri = 'http://127.0.0.1:5000/auth/callback'
-
-        # Exchange code for tokens
-        token_data = {
-            'client_id': GOOGLE_CLIENT_ID,
-            'client_secret': GOOGLE_CLIENT_SECRET,
-            'code': code,
-            'grant_type': 'authorization_code',
-            'redirect_uri': redirect_uri
-        }
-
-        print("Exchanging code for tokens...")
-        token_response = requests.post(token_endpoint, data=token_data)
-
-        if not token_response.ok:
-            print(f"Token exchange failed: {token_response.text}")
-            flash("Failed to exchange authorization code", "error")
-            return redirect(url_for('login'))
-
-        tokens = token_response.json()
-        print("Tokens received successfully")
-
-        # Get user info
-        userinfo_endpoint = google_provider_cfg["userinfo_endpoint"]
-        headers = {'Authorization': f'Bearer {tokens["access_token"]}'}
-
-        print("Fetching user info...")
-        user_response = requests.get(userinfo_endpoint, headers=headers)
-
-        if not user_response.ok:
-            print(f"Failed to get user info: {user_response.text}")
-            flash("Failed to get user information", "error")
-            return redirect(url_for('login'))
-
-        user_info = user_response.json()
-        print(f"User info received: {user_info}")
-
-        email = user_info.get('email')
-        name = user_info.get('name', 'Google User')
-
-        if not email:
-            print("No email in user info")
-            flash("Failed to get email from Google", "error")
-            return redirect(url_for('login'))
-
-        # Check if user exists in database
-        user = users_collection.find_one({"email": email})
-
-        if not user:
-            # Register new Google user
-            user_data = {
-                "username": name,
-                "email": email,
-                "password": None,
-                "auth_provider": "google",
-                "created_at": datetime.utcnow()
-            }
-            result = users_collection.insert_one(user_data)
-            user = users_collection.find_one({"_id": result.inserted_id})
-            print(f"New user created: {email}")
-        else:
-            print(f"Existing user found: {email}")
-
-        # Set session
-        session['user_id'] = str(user['_id'])
-        session['username'] = user['username']
-        session.permanent = True
-
-        # Clean up OAuth state
-        session.pop('oauth_state', None)
-
-        print(f"Login successful for: {name}")
-        flash(f"Successfully logged in as {name}!", "success")
-        return redirect(url_for('dashboard'))
-
-    except Exception as e:
-        print(f"=== OAuth Callback Error ===")
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
-        print("=== End Error ===")
-
-        session.pop('oauth_state', None)
-        flash("An error occurred during Google login", "error")
-        return redirect(url_for('login'))
-
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    if request.method == 'POST':
-        if users_collection is None:
-            flash("Database not connected. Please check server logs.", "error")
-            return redirect(url_for('register'))
-
-        username = request.form.get('username')
-        email = request.form.get('email')
-        password = request.form.get('password')
-
-        existing_user = users_collection.find_one({'email': email})
-        if existing_user:
-            flash('Email already registered!', 'error')
-            return redirect(url_for('register'))
-
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-        users_collection.insert_one({
-            'username': username,
-            'email': email,
-            'password': hashed_password,
-            'auth_provider': 'local',
-            'created_at': datetime.utcnow()
-        })
-
-        flash('Registration successful! Login with the new ID', 'success')
-        return redirect(url_for('login'))
-
-    return render_template('register.html')
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        if users_collection is None:
-            flash("Database not connected. Please check server logs.", "error")
-            return redirect(url_for('login'))
-
-        email = request.form.get('email')
-        password = request.form.get('password')
-
-        user = users_collection.find_one({'email': email})
-        if user and bcrypt.check_password_hash(user['password'], password):
-            session['user_id'] = str(user['_id'])
-            session['username'] = user['username']
-            flash('Login successful!', 'success')
-            return redirect(url_for('dashboard'))
-        else:
-            flash('Login failed. Check your email and password.', 'error')
-            return redirect(url_for('login'))
-
-    return render_template('login.html')
-
-@app.route('/dashboard')
-def dashboard():
-    if 'user_id' not in session:
-        flash('Please log in to access this page.', 'warning')
-        return redirect(url_for('login'))
-
-    user_id_obj = ObjectId(session['user_id'])
-
-    if activities_collection is not None:
-        activities_collection.insert_one({
-            'user_id': session['user_id'],
-            'action': 'viewed_dashboard',
-            'timestamp': datetime.utcnow()
-        })
-        user_subjects = list(subjects_collection.find({'owner_id': session['user_id']}))
-
-        stats = {
-            "daily": {"total": 0, "completed": 0},
-            "weekly": {"total": 0, "completed": 0},
-            "monthly": {"total": 0, "completed": 0}
-        }
-
-        todos = goals_collection.find({"user_id": session['user_id']})
-        for todo in todos:
-            period = todo.get("goal_period")
-            completed = todo.get("completion_status", False)
-
-            if period in stats:
-                stats[period]["total"] += 1
-                if completed:
-                    stats[period]["completed"] += 1
-
-        time_goals = list(goals_collection.find({
-            'user_id': user_id_obj,
-            'goal_type': 'time',
-            'status': 'active'
-        }))
-
-        for goal in time_goals:
-            subject = subjects_collection.find_one({'_id': goal.get('subject_id')})
-            if subject:
-                goal['subject_name'] = subject.get('subject', 'Unknown Subject')
-
-        user_subjects = list(subjects_collection.find({'owner_id': session['user_id']}))
-
-        for subject in user_subjects:
-            subject_id_obj = subject['_id']
-            subject['files'] = list(files_collection.find({'subject_id': subject_id_obj}))
-
-
-        return render_template('dashboard.html',
-                               username=session['username'],
-                               subject_collection=user_subjects,
-                               stats=stats,
-                               time_goals=time_goals)
-
-
-@app.route('/study_session/<subject_name>')
-def study_session(subject_name):
-    if 'user_id' not in session:
-        flash('Please log in to start a session.', 'warning')
-        return redirect(url_for('login'))
-
-    local_today = datetime.now()
-    week_start = local_today - timedelta(days=local_today.weekday())
-
-    # Get session doc
-    doc = sessions_collection.find_one({
-        "user_id": ObjectId(session['user_id']),
-        "subject_name": subject_name,
-        "week_start": week_start.date().isoformat()
-    })
-
-    # Get the subject
-    subject = subjects_collection.find_one({
-        "owner_id": session['user_id'],
-        "subject": subject_name.lower()
-    })
-
-    # Attach files for this subject
-    if subject:
-        original_subject_id = subject['_id']
-        subject['_id'] = str(subject['_id'])
-        subject['name'] = subject['subject']  # For template compatibility
-
-        # Find files using original ObjectId
-        files = list(files_collection.find({'subject_id': original_subject_id}))
-
-        # Convert file ObjectIds to strings for template use
-        for file in files:
-            file['_id'] = str(file['_id'])
-            if 'subject_id' in file:
-                file['subject_id'] = str(file['subject_id'])
-
-        subject['files'] = files
-    else:
-        subject = {"name": subject_name, "files": []}
-
-    days = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
-
-    if not doc:
-        time_spent = [0] * 7
-        productive_hours = {}
-    else:
-        time_spent = [doc.get(day, 0) for day in days]
-        productive_hours = doc.get("productive_hours", {})
-
-    chart_data = [t / 60 for t in time_spent]
-
-    return render_template(
-        "study_session.html",
-        subject=subject,
-        subject_name=subject_name,
-        chart_data=chart_data,
-        days=days,
-        productive_hours=productive_hours
-    )
-
-
-@app.route('/log_session', methods=['POST'])
-def log_session():
-    if 'user_id' not in session:
-        return jsonify({'status': 'error', 'message': 'User not logged in'}), 401
-
-    data = request.get_json()
-    subject_name = data.get('subject_name')
-    duration_seconds = data.get('duration_seconds')
-
-    if not subject_name or duration_seconds is None:
-        return jsonify({'status': 'error', 'message': 'Missing required data'}), 400
-
-    duration_seconds = int(duration_seconds)
-    local_today = datetime.now()
-    today_str = local_today.strftime("%a").lower()
-    week_start = local_today - timedelta(days=local_today.weekday())
-
-    start_time = datetime.now()
-    end_time = start_time + timedelta(seconds=duration_seconds)
-
-    # Productive hours calculation
-    current = start_time
-    remaining = duration_seconds
-    updates = {}
-
-    while current < end_time and remaining > 0:
-        hour_key = str(current.hour).zfill(2)
-        seconds_left_in_hour = (60 - current.minute) * 60 - current.second
-        seconds_to_add = min(remaining, seconds_left_in_hour)
-        updates[f"productive_hours.{hour_key}"] = updates.get(f"productive_hours.{hour_key}", 0) + (
-                    seconds_to_add // 60)
-        remaining -= seconds_to_add
-        current += timedelta(seconds=seconds_to_add)
-
-    # Find subject
-    subject = subjects_collection.find_one({
-        "owner_id": session['user_id'],
-        "subject": subject_name.lower()
-    })
-
-    if not subject:
-        return jsonify({'status': 'error', 'message': 'Subject not found'}), 404
-
-    # Get or create weekly doc
-    weekly_doc = sessions_collection.find_one({
-        "user_id": ObjectId(session['user_id']),
-        "subject_id": subject['_id'],
-        "week_start": week_start.date().isoformat()
-    })
-
-    if not weekly_doc:
-        weekly_doc = {
-            "user_id": ObjectId(session['user_id']),
-            "subject_id": subject['_id'],
-            "subject_name": subject_name,
-            "week_start": week_start.date().isoformat(),
-            "mon": 0, "tue": 0, "wed": 0,
-            "thu": 0, "fri": 0, "sat": 0, "sun": 0,
-            "productive_hours": {str(h).zfill(2): 0 for h in range(24)},
-            'created_at': datetime.utcnow()
-        }
-        sessions_collection.insert_one(weekly_doc)
-
-    # Update study time + productive hours
-    sessions_collection.update_one(
-        {
-            "user_id": ObjectId(session['user_id']),
-            "subject_id": subject['_id'],
-            "week_start": week_start.date().isoformat()
-        },
-        {
-            "$inc": {
-                today_str: duration_seconds // 60,
-                **updates
-            }
-        }
-    )
-
-    now = datetime.utcnow()
-    duration_minutes = int(duration_seconds) / 60
-
-    # Update time-based goals
-    goals_collection.update_one(
-        {
-            'user_id': ObjectId(session['user_id']),
-            'subject_id': subject['_id'],
-            'goal_type': 'time',
-            'status': 'active',
-            'start_date': {'$lte': now},
-            'end_date': {'$gte': now}
-        },
-        {
-            '$inc': {'current_duration_minutes': duration_minutes}
-        })
-
-    return jsonify({'status': 'success', 'message': f'Session logged to {today_str} successfully!'})
-
-
-@app.route('/add_form')
-def add_form():
-    return render_template('add.html')
-
-
-@app.route('/add', methods=['POST'])
-def add_subject():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    subject = request.form['subject'].lower()
-    marks = int(request.form['marks'])
-    priority = request.form.get('priority')
-    category = request.form.get('category')
-    description = request.form.get('description')
-
-    subject_data = {
-        'owner_id': session['user_id'],
-        'subject': subject,
-        'marks': marks,
-        'priority': priority,
-        'category': category,
-        'description': description,
-        'created_at': datetime.utcnow()
-    }
-
-    subjects_collection.insert_one(subject_data)
-    flash('Subject added successfully!', 'success')
-    return redirect(url_for('dashboard'))
-
-
-@app.route('/update', methods=['POST'])
-def update():
-    if 'user_id' not in session:
-        return "Unauthorized", 401
-
-    subject = request.form['subject'].lower()
-    new_marks = int(request.form['marks'])
-    new_priority = request.form.get('priority')
-    new_category = request.form.get('category')
-
-    subjects_collection.update_one(
-        {"subject": subject, "owner_id": session['user_id']},
-        {"$set": {"marks": new_marks, "priority": new_priority,"category":new_category}}
-    )
-    return "Success", 200
-
-
-@app.route('/delete', methods=['POST'])
-def delete():
-    if 'user_id' not in session:
-        return "Unauthorized", 401
-
-    subject = request.form['subject'].lower()
-
-
-    result = subjects_collection.delete_one({
-            "subject": subject,
-            "owner_id": session['user_id']
-        })
-
-    return "Success", 200
-
-
-@app.route('/upload/<subject_id>', methods=['POST'])
-def upload_file(subject_id):
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    if 'file' not in request.files:
-        flash('No file part', 'danger')
-        return redirect(url_for('dashboard'))
-
-    file = request.files['file']
-    if file.filename == '':
-        flash('No selected file', 'danger')
-        return redirect(url_for('dashboard'))
-
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        user_upload_folder = os.path.join(app.config['UPLOAD_FOLDER'], session['user_id'])
-        os.makedirs(user_upload_folder, exist_ok=True)
-        file_path = os.path.join(user_upload_folder, filename)
-        file.save(file_path)
-
-        # --- THIS IS THE NEW PART ---
-        # 1. Find the subject document to get its name
-        subject_doc = subjects_collection.find_one({'_id': ObjectId(subject_id)})
-        subject_name = subject_doc.get('subject', 'Unknown Subject') if subject_doc else 'Unknown Subject'
-
-        # 2. Save the file's metadata, now including the subject_name
-        files_collection.insert_one({
-            'user_id': ObjectId(session['user_id']),
-            'subject_id': ObjectId(subject_id),
-            'subject_name': subject_name,  # <-- The new field you wanted
-            'original_filename': file.filename,
-            'secure_filename': filename,
-            'file_path': file_path,
-            'file_type': file.mimetype,
-            'upload_date': datetime.utcnow()
-        })
-        # ---------------------------
-
-
-        # Check if request came from study session
-        if request.form.get('source') == 'study_session':
-            return redirect(url_for('study_session', subject_name=subject_name))
-    else:
-        flash('File type not allowed.', 'danger')
-
-    return redirect(url_for('dashboard'))
-
-
-@app.route('/download/<file_id>')
-def download_file(file_id):
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    file_doc = files_collection.find_one({'_id': ObjectId(file_id), 'user_id': ObjectId(session['user_id'])})
-    if not file_doc:
-        return "File not found or access denied.", 404
-
-    # The directory is the user's specific upload folder
-    directory = os.path.join(app.config['UPLOAD_FOLDER'], session['user_id'])
-
-    # Use send_from_directory for security
-    return send_from_directory(directory=directory, path=file_doc['secure_filename'], as_attachment=False)
-
-
-# Add this new route to main.py
-@app.route('/view_file/<file_id>')
-def view_file(file_id):
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    # Find the file metadata in the database
-    file_doc = files_collection.find_one({
-        '_id': ObjectId(file_id),
-        'user_id': ObjectId(session['user_id'])
-    })
-
-    if not file_doc:
-        # Check if request came from study session
-        if request.args.get('source') == 'study_session':
-            # Need to have file_doc before using it - redirect to dashboard if file not found
-            return redirect(url_for('dashboard'))
-        return redirect(url_for('dashboard'))
-
-    # Get the directory where the user's files are stored
-    directory = os.path.join(app.config['UPLOAD_FOLDER'], session['user_id'])
-
-    # Serve the file for inline viewing (the browser will try to open it)
-    return send_from_directory(
-        directory=directory,
-        path=file_doc['secure_filename'],
-        as_attachment=False
-    )
-
-
-@app.route('/delete_file/<file_id>', methods=['POST'])
-def delete_file(file_id):
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    file_doc = files_collection.find_one({'_id': ObjectId(file_id), 'user_id': ObjectId(session['user_id'])})
-    if file_doc:
-        # Delete the physical file from the server
-        try:
-            os.remove(file_doc['file_path'])
-        except OSError as e:
-            print(f"Error deleting file {file_doc['file_path']}: {e}")
-            flash('Error deleting file from server.', 'danger')
-
-        # Delete the metadata from the database
-        files_collection.delete_one({'_id': ObjectId(file_id)})
-
-        # Check if request came from study session
-        if request.form.get('source') == 'study_session':
-            return redirect(url_for('study_session', subject_name=file_doc.get('subject_name', 'Unknown')))
-    else:
-        flash('File not found or you do not have permission to delete it.', 'danger')
-
-    return redirect(url_for('dashboard'))
-
-@app.route("/reminders", methods=["GET", "POST"])
-def reminders():
-    user_id = session["user_id"]
-
-    if request.method == "GET":
-        today = datetime.now().strftime('%Y-%m-%d')
-
-        reminders_collection.delete_many({
-            "user_id": user_id,
-            "date": {"$lt": today}
-        })
-
-        data = list(reminders_collection.find(
-            {"user_id": user_id},
-            {"_id": 0}
-        ))
-        return jsonify(data)
-
-    if request.method == "POST":
-        title = request.json.get("title")
-        date = request.json.get("date")
-
-        if not title or not date:
-            return jsonify({"success": False})
-
-        reminders_collection.insert_one({
-            "user_id": user_id,
-            "title": title,
-            "date": date
-        })
-        return jsonify({"success": True})
-
-
-@app.route('/time')
-def time():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    subjects = list(sessions_collection.find({"user_id": ObjectId(session['user_id'])}))
-
-    if not subjects:
-        chart2 = "<p>No subjects found. Please add some subjects first.</p>"
-        max_subject = None
-        min_subject = None
-    else:
-        df = pd.DataFrame(subjects)
-        weekday_cols = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
-        df["time_spent"] = df[weekday_cols].sum(axis=1)
-        df_grouped = df.groupby("subject_name", as_index=False)["time_spent"].sum()
-        df_grouped["time_hours"] = df_grouped["time_spent"] / 3600
-
-        fig2 = px.bar(df_grouped,
-                      x="subject_name",
-                      y="time_hours",
-                      title="Total Study Time by Subject (hrs)",
-                      text="time_hours",
-                      color_discrete_sequence=["#6B8E23"])
-
-        chart2 = fig2.to_html(full_html=False, include_plotlyjs='cdn')
-
-        max_row = df_grouped.loc[df_grouped["time_spent"].idxmax()]
-        min_row = df_grouped.loc[df_grouped["time_spent"].idxmin()]
-
-        max_subject = {
-            "name": max_row["subject_name"],
-            "hours": round(max_row["time_spent"] / 3600, 1)
-        }
-        min_subject = {
-            "name": min_row["subject_name"],
-            "hours": round(min_row["time_spent"] / 3600, 1)
-        }
-
-    return render_template("time.html",
-                           chart2=chart2,
-                           max_subject=max_subject,
-                           min_subject=min_subject,
-                           subjects=subjects)
-@app.route('/history')
-def study_history():
-    """Displays a complete history of all past study sessions."""
-    if 'user_id' not in session:
-        flash('Please log in to view your history.', 'warning')
-        return redirect(url_for('login'))
-
-    # Find all sessions for the current user and sort them by end_time (newest first)
-    user_sessions = list(sessions_collection.find(
-        {'user_id': ObjectId(session['user_id'])}
-    ).sort('end_time', -1))
-
-    return render_template('history.html', sessions=user_sessions)
-
-@app.route('/add_goal_form')
-def add_goal_form():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    # Fetch user's subjects to show in the dropdown
-    subjects = list(subjects_collection.find({'owner_id': session['user_id']}))
-    return render_template('add_goal.html', subjects=subjects)
-
-# In main.py
-@app.route('/add_goal', methods=['POST'])
-def add_goal():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    subject_id = request.form.get('subject_id')
-    target_duration = float(request.form.get('target_duration')) # Assuming hours for now
-    period = request.form.get('period')
-
-    # Calculate start and end dates for the goal
-    today = datetime.utcnow()
-    if period == 'weekly':
-        start_date = today - timedelta(days=today.weekday()) # Monday
-        end_date = start_date + timedelta(days=6) # Sunday
-    else: # monthly
-        start_date = today.replace(day=1)
-        # Find the last day of the month
-        next_month = start_date.replace(day=28) + timedelta(days=4)
-        end_date = next_month - timedelta(days=next_month.day)
-
-    goal_data = {
-        'user_id': ObjectId(session['user_id']),
-        'subject_id': ObjectId(subject_id),
-        'goal_type': 'time',
-        'target_duration_minutes': target_duration * 60, # Convert hours to minutes
-        'current_duration_minutes': 0,
-        'start_date': start_date.replace(hour=0, minute=0, second=0),
-        'end_date': end_date.replace(hour=23, minute=59, second=59),
-        'status': 'active'
-    }
-
-    goals_collection.insert_one(goal_data)
-    flash('New time-based goal has been set!', 'success')
-    return redirect(url_for('dashboard'))
-
-
-
-@app.route("/todo_stats")
-@app.route("/todo_stats")
-def todo_stats():
-    if 'user_id' not in session:
-        return jsonify({"error": "Not authenticated"}), 401
-
-    user_id = session.get("user_id")
-
-    stats = {
-        "daily": {"total": 0, "completed": 0},
-        "weekly": {"total": 0, "completed": 0},
-        "monthly": {"total": 0, "completed": 0}
-    }
-
-    todos = goals_collection.find({"user_id": user_id})
-
-    for todo in todos:
-        period = todo.get("goal_period")
-        completed = todo.get("completion_status", False)
-
-        if period in stats:
-            stats[period]["total"] += 1
-            if completed:
-                stats[period]["completed"] += 1
-
-    return jsonify(stats)
-
-
-@app.route('/todo')
-def get_todos():
-    if 'user_id' not in session:
-        return {"todos": []}
-
-    today = datetime.utcnow()
-
-    expired_goals = list(goals_collection.find({
-        "user_id": session['user_id'],
-        "deadline": {"$lt": today},
-        "completion_status": False
-    }))
-
-    if expired_goals:
-        expired_goal_ids = [g["_id"] for g in expired_goals]
-        goals_collection.delete_many({
-            "user_id": session['user_id'],
-            "_id": {"$in": expired_goal_ids}
-        })
-
-    cleanup_time = today - timedelta(days=1)
-    goals_collection.delete_many({
-        "user_id": session['user_id'],
-        "deadline": {"$lt": cleanup_time},
-        "completion_status": True
-    })
-
-    todos = list(goals_collection.find(
-        {"user_id": session['user_id']},
-        {
-            "task": 1,
-            "_id": 1,
-            "completion_status": 1,
-            "goal_period": 1,
-            "created_at": 1,
-            "deadline": 1
-        }
-    ))
-
-    for todo in todos:
-        todo["_id"] = str(todo["_id"])
-        todo["completion_status"] = todo.get("completion_status", False)
-        todo["goal_period"] = todo.get("goal_period", "no-period")
-
-    return jsonify({"todos": todos})
-
-
-@app.route("/todo/add", methods=["POST"])
-def add_todo():
-    user_id = session.get("user_id")
-    task = request.json.get("task")
-    goal_period = request.json.get("goal_period")
-
-    if not task:
-        return jsonify({"error": "Task cannot be empty"}), 400
-
-    if not goal_period:
-        return jsonify({"error": "Goal period is required"}), 400
-
-    today = datetime.utcnow()
-    if goal_period == "daily":
-        deadline = today + timedelta(days=1)
-    elif goal_period == "weekly":
-        deadline = today + timedelta(weeks=1)
-    elif goal_period == "monthly":
-        deadline = today + timedelta(days=30)
-    else:
-        deadline = today + timedelta(days=1)
-
-    new_goal = {
-        "user_id": user_id,
-        "task": task,
-        "goal_type": "task",
-        "current_progress": 0,
-        "goal_period": goal_period,
-        "deadline": deadline,
-        "completion_status": False,
-        "created_at": datetime.utcnow()
-    }
-
-    result = goals_collection.insert_one(new_goal)
-
-    if result.inserted_id:
-        return jsonify({"success": True})
-    else:
-        return jsonify({"error": "Failed to add task"}), 500
-
-
-@app.route("/todo/done", methods=["POST"])
-def mark_todo_done():
-    user_id = session.get("user_id")
-    todo_id = request.json.get("id")
-
-    if not todo_id:
-        return jsonify({"error": "Todo ID is required"}), 400
-
-    try:
-        todo = goals_collection.find_one({"_id": ObjectId(todo_id), "user_id": user_id})
-        if not todo:
-            return jsonify({"error": "Todo not found"}), 404
-
-        new_status = not todo.get("completion_status", False)
-        progress = 1 if new_status else 0
-
-        result = goals_collection.update_one(
-            {"_id": ObjectId(todo_id), "user_id": user_id},
-            {"$set": {
-                "completion_status": new_status,
-                "current_progress": progress
-            }}
-        )
-
-        if result.modified_count > 0:
-            return jsonify({"success": True, "completion_status": new_status})
-        else:
-            return jsonify({"error": "Failed to update todo"}), 500
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-@app.route("/todo/check-deadlines", methods=["GET"])
-def check_deadlines():
-    if 'user_id' not in session:
-        return jsonify({"expiredTasks": []})
-
-    today = datetime.utcnow()
-
-    expired_tasks = list(goals_collection.find({
-        "user_id": session['user_id'],
-        "deadline": {"$lt": today},
-        "completion_status": False
-    }, {"task": 1, "_id": 1}))
-
-    if expired_tasks:
-        expired_goal_ids = [task["_id"] for task in expired_tasks]
-        goals_collection.delete_many({
-            "user_id": session['user_id'],
-            "_id": {"$in": expired_goal_ids}
-        })
-
-        for task in expired_tasks:
-            task["_id"] = str(task["_id"])
-
-    return jsonify({"expiredTasks": expired_tasks})
-
-
-
-
-
-@app.route('/performance')
-def performance():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    user_id = session['user_id']
-    subjects = list(subjects_collection.find(
-        {"owner_id": user_id},
-        {"_id": 0, "subject": 1, "marks": 1, "time_spent": 1}
-    ))
-
-    if not subjects:
-        chart1 = "<p>No subjects found. Please add some subjects first.</p>"
-    else:
-        subject_names = [s['subject'].title() for s in subjects]
-        marks = [s['marks'] for s in subjects]
-
-        df = pd.DataFrame({
-            'Subject': subject_names,
-            'Marks': marks
-        })
-
-        fig1 = px.bar(
-            df,
-            x='Subject',
-            y='Marks',
-            title="Subject-wise Performance",
-            text='Marks',
-            color_discrete_sequence=['#7E6363']
-        )
-        fig1.update_traces(textposition="outside")
-        fig1.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font_color='#7E6363',
-            xaxis_title="Subject",
-            yaxis_title="Marks (%)"
-        )
-        chart1 = fig1.to_html(full_html=False, include_plotlyjs='cdn')
-
-    return render_template("performance.html", chart1=chart1, subjects=subjects)
-
-
-@app.route('/logout')
-def logout():
-    session.clear()
-    flash('You have been logged out.', 'info')
-    return redirect(url_for('login'))
-
-
-if __name__ == '__main__':
+import os
+os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
+import pytz
+import re
+import secrets
+import json
+from urllib.parse import urlencode
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, flash, stream_with_context, g, has_request_context
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from dotenv import load_dotenv
+from datetime import datetime, timedelta
+from time import perf_counter
+from bson import ObjectId
+from werkzeug.utils import secure_filename
+from artifacts import ArtifactPipeline, ArtifactStore
+from blob_store import BlobStore, HashingFile, OffsetMismatch, UploadTooLarge, upload_request_class
+from file_gc import delete_subject_files_async, reclaim_blobs
+from file_serving import META_PROJECTION, FileMetaCache, file_meta, send_file, send_stored_file
+from dashboard_data import load_dashboard
+from data_transfer import WEB_IMPORT_COLLECTIONS, export_docs, import_docs, ndjson_export, parse_ndjson
+from goal_stats import get_task_stats
+from google_oauth import FALLBACK_CONFIG, DiscoveryCache, TimeoutSession
+from indexes import ensure_indexes, reminder_expiry
+from live_events import RESYNC, ChangeStreamRelay, EventBroker, format_event
+from metrics import CommandMetrics, MetricsRegistry
+from password_hashing import DEFAULT_ROUNDS, PasswordHasher, PasswordHasherBusy
+from charts import CHARTS, ChartCache, bump_data_version, get_chart, get_series
+from pagination import BadCursor, fetch_page, ndjson_lines
+from rate_limit import MemoryCounterStore, RateLimit, RedisCounterStore
+from server_session import CachedSessionStore, MemorySessionStore, MongoSessionStore, RedisSessionStore, ServerSessionInterface, rotate_session
+from search_index import SearchIndex, index_file, rebuild as rebuild_search_index, index_reminder, index_subject, index_todo
+from sweeper import COMPLETED_TODO_GRACE, SweepTimer
+from time_buckets import DAYS
+from session_log import claim_intervals, log_study_session, log_study_sessions, release_intervals
+from user_context import current_user
+
+# Load environment variables first
+load_dotenv()
+
+# Create Flask app
+app = Flask(__name__)
+app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', 50)) * 1024 * 1024
+app.config['MAX_CHUNKED_UPLOAD_BYTES'] = int(os.getenv('MAX_CHUNKED_UPLOAD_MB', 500)) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+blob_store = BlobStore(os.path.join(app.config['UPLOAD_FOLDER'], 'blobs'))
+app.request_class = upload_request_class(blob_store)
+# Hand file bodies to the front-end server: USE_X_SENDFILE=1 for Apache/lighttpd,
+# X_ACCEL_REDIRECT=/internal-uploads for an nginx internal location aliased to uploads/
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE') == '1'
+app.config['X_ACCEL_REDIRECT'] = os.getenv('X_ACCEL_REDIRECT')
+file_meta_cache = FileMetaCache(maxsize=int(os.getenv('FILE_META_CACHE_SIZE', 1024)))
+ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'docx', 'pptx'}
+
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+
+
+GOOGLE_CLIENT_ID = os.getenv('GOOGLE_OAUTH_CLIENT_ID')
+GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_OAUTH_CLIENT_SECRET')
+GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+oauth_http = TimeoutSession()
+google_discovery = DiscoveryCache(GOOGLE_DISCOVERY_URL, oauth_http, fallback=FALLBACK_CONFIG)
+
+# MongoDB setup (keeping your existing setup)
+MONGO_URI = os.environ.get('url')
+utc_now = datetime.utcnow()
+local_tz = pytz.timezone("Asia/Kolkata")
+local_now = utc_now.replace(tzinfo=pytz.utc).astimezone(local_tz)
+
+# Prometheus metrics at /metrics, see metrics.py
+metrics = MetricsRegistry(slow_query_ms=float(os.getenv('SLOW_QUERY_MS', 100)))
+# Print requests slower than this many milliseconds, off when unset
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 0)) or None
+
+
+def current_request_stats():
+    return g.get('request_stats') if has_request_context() else None
+
+
+try:
+    client = MongoClient(MONGO_URI, event_listeners=[CommandMetrics(metrics, current_request_stats)])
+    db = client.get_database(os.getenv('MONGO_DB_NAME', 'pathfinderDB'))
+    users_collection = db.users
+    subjects_collection = db.subjects
+    activities_collection = db.activities
+    goals_collection = db.goals
+    sessions_collection = db.sessions
+    reminders_collection = db.reminders
+    files_collection = db.files
+    client.admin.command('ping')
+    print("MongoDB connection successful.")
+except Exception as e:
+    print(f"Could not connect to MongoDB: {e}")
+    db = None
+    users_collection = None
+    subjects_collection = None
+    activities_collection = None
+    goals_collection = None
+    sessions_collection = None
+    reminders_collection = None
+    files_collection = None
+
+# A bad index (say a conflicting definition) is logged, it doesn't take the app down
+if db is not None:
+    try:
+        for collection_name, index_name, result in ensure_indexes(db):
+            if result.startswith('failed'):
+                print(f"Index {collection_name}.{index_name} {result}")
+    except PyMongoError as e:
+        print(f"Could not update indexes: {e}")
+
+# bcrypt runs in a few worker processes, see password_hashing.py
+password_hasher = PasswordHasher(rounds=int(os.getenv('BCRYPT_LOG_ROUNDS', DEFAULT_ROUNDS)),
+                                 workers=int(os.getenv('PASSWORD_HASH_WORKERS', 2)),
+                                 max_pending=int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32)),
+                                 wait=float(os.getenv('PASSWORD_HASH_WAIT', 5)))
+BUSY_MESSAGE = 'Lots of people are signing in right now, please try again in a moment.'
+
+# Sign-in rate limits, per process unless RATE_LIMIT_REDIS_URL shares them between workers.
+# Keyed by request.remote_addr, so behind a proxy wrap the app in werkzeug's ProxyFix.
+if os.getenv('RATE_LIMIT_REDIS_URL'):
+    import redis
+    rate_limit_store = RedisCounterStore(redis.Redis.from_url(os.environ['RATE_LIMIT_REDIS_URL']))
+else:
+    rate_limit_store = MemoryCounterStore()
+login_ip_limit = RateLimit('login_ip', int(os.getenv('LOGIN_LIMIT_PER_IP', 20)), 60, rate_limit_store)
+# Failed logins only, so someone else guessing can lock an account for at most 15 minutes
+login_email_limit = RateLimit('login_email', int(os.getenv('LOGIN_FAILURES_PER_EMAIL', 5)), 15 * 60, rate_limit_store)
+register_ip_limit = RateLimit('register_ip', int(os.getenv('REGISTER_LIMIT_PER_IP', 10)), 60 * 60, rate_limit_store)
+oauth_ip_limit = RateLimit('oauth_ip', int(os.getenv('OAUTH_LIMIT_PER_IP', 20)), 60, rate_limit_store)
+RATE_LIMIT_MESSAGE = 'Too many attempts, please wait a little and try again.'
+
+# The session cookie is only an id, the data is kept server-side.
+# SESSION_STORE: mongo (default), redis (SESSION_REDIS_URL), memory (one process) or cookie
+SESSION_STORE = os.getenv('SESSION_STORE', 'mongo')
+if SESSION_STORE == 'redis':
+    import redis
+    session_store = RedisSessionStore(redis.Redis.from_url(os.environ['SESSION_REDIS_URL']))
+elif SESSION_STORE == 'mongo' and db is not None:
+    session_store = MongoSessionStore(db.web_sessions)
+elif SESSION_STORE != 'cookie':
+    session_store = MemorySessionStore(maxsize=int(os.getenv('SESSION_CACHE_SIZE', 10000)))
+else:
+    session_store = None
+# Each worker keeps the sessions it reads for this long, so Mongo/Redis aren't asked every request
+SESSION_CACHE_SECONDS = int(os.getenv('SESSION_CACHE_SECONDS', 5))
+if SESSION_CACHE_SECONDS and isinstance(session_store, (MongoSessionStore, RedisSessionStore)):
+    session_store = CachedSessionStore(session_store, ttl=SESSION_CACHE_SECONDS,
+                                       maxsize=int(os.getenv('SESSION_CACHE_SIZE', 10000)))
+if session_store is not None:
+    app.session_interface = ServerSessionInterface(session_store)
+chart_cache = ChartCache(maxsize=int(os.getenv('CHART_CACHE_SIZE', 256)))
+artifact_store = ArtifactStore(os.path.join(app.config['UPLOAD_FOLDER'], 'derived'))
+artifact_pipeline = ArtifactPipeline(db, blob_store, artifact_store,
+                                     workers=int(os.getenv('ARTIFACT_WORKERS', 2)),
+                                     queue_size=int(os.getenv('ARTIFACT_QUEUE_SIZE', 100)))
+search_index = SearchIndex(os.getenv('SEARCH_INDEX_PATH', 'search_index.db'))
+
+
+def index_file_text(sha256, manifest):
+    """Artifact pipeline listener: make extracted text searchable."""
+    if not manifest.get('text_chars'):
+        return
+    text = artifact_store.read_text(sha256)
+    for file_doc in files_collection.find({'sha256': sha256}, {'_id': 1}):
+        search_index.set_body('file', file_doc['_id'], text)
+
+
+artifact_pipeline.listeners.append(index_file_text)
+
+metrics.gauge('artifact_queue_depth', 'Files waiting for thumbnails and text.',
+              lambda: artifact_pipeline.queue.qsize())
+metrics.gauge('artifact_jobs_dropped', 'Artifact jobs skipped because the queue was full.',
+              lambda: artifact_pipeline.dropped)
+metrics.gauge('password_hash_queue_depth', 'Password hashes running or waiting for a worker.',
+              lambda: password_hasher.queue_depth)
+metrics.gauge('password_hash_rejected', 'Logins and sign-ups turned away because hashing was backed up.',
+              lambda: password_hasher.rejected)
+rate_limit_decisions = metrics.counter('rate_limit_decisions_total', 'Sign-in requests allowed or turned away.',
+                                       ('limit', 'decision'))
+metrics.gauge('cache_hits', 'Lookups answered from an in-process cache.',
+              lambda: {('chart',): chart_cache.hits, ('file_meta',): file_meta_cache.hits}, ('cache',))
+metrics.gauge('cache_misses', 'Lookups that missed an in-process cache.',
+              lambda: {('chart',): chart_cache.misses, ('file_meta',): file_meta_cache.misses}, ('cache',))
+
+# Pushes todo, stats and reminder changes to the dashboard's /events stream (asgi.py), see live_events.py
+# LIVE_UPDATES: local (the writing route publishes in its own process) or changestream (needs a replica set)
+LIVE_UPDATES = os.getenv('LIVE_UPDATES', 'local')
+LIVE_HEARTBEAT_SECONDS = float(os.getenv('LIVE_HEARTBEAT_SECONDS', 15))
+# Streams are sent a fresh snapshot this often, for changes that weren't pushed to this process
+LIVE_RESYNC_SECONDS = float(os.getenv('LIVE_RESYNC_SECONDS', 60))
+live_events = EventBroker(max_queue=int(os.getenv('LIVE_QUEUE_SIZE', 100)))
+change_relay = None
+metrics.gauge('live_streams', 'Open /events streams in this process.', lambda: live_events.open_streams)
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = perf_counter()
+    # Rule rather than path, so /download/<file_id> is one series and not one per file
+    g.request_stats = {
+        'route': request.url_rule.rule if request.url_rule else 'unmatched',
+        'commands': 0,
+        'mongo_seconds': 0.0
+    }
+
+
+@app.after_request
+def record_request_metrics(response):
+    stats = g.get('request_stats')
+    if stats is None:
+        return response
+    elapsed = perf_counter() - g.request_started
+    metrics.request_seconds.observe(elapsed, stats['route'], request.method, str(response.status_code))
+    metrics.request_commands.observe(stats['commands'], stats['route'])
+    metrics.request_mongo_seconds.observe(stats['mongo_seconds'], stats['route'])
+
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        print(f"Slow request: {request.method} {request.path} took {elapsed * 1000:.0f}ms, "
+              f"{stats['commands']} Mongo commands ({stats['mongo_seconds'] * 1000:.0f}ms)")
+    return response
+
+
+def rate_limited(limit, key, count=True):
+    """True if the request is over the limit. Checked before any Mongo or bcrypt work."""
+    decision = limit.hit(key) if count else limit.peek(key)
+    rate_limit_decisions.inc(limit.name, 'allowed' if decision.allowed else 'rejected')
+    if not decision.allowed:
+        g.retry_after = max(g.get('retry_after', 0), decision.retry_after)
+    return not decision.allowed
+
+
+def too_many_attempts(template):
+    flash(RATE_LIMIT_MESSAGE, 'error')
+    return render_template(template), 429, {'Retry-After': str(g.retry_after)}
+
+
+def get_google_provider_cfg():
+    """Get Google's OAuth configuration (cached, see google_oauth.DiscoveryCache)"""
+    return google_discovery.get()
+
+@app.route('/')
+def home():
+    return redirect(url_for('login'))
+
+# Debug route to check OAuth configuration
+@app.route('/debug-oauth')
+def debug_oauth():
+    redirect_uri = 'http://127.0.0.1:5000/auth/callback'  # Fixed
+    return f"""
+    <h2>OAuth Debug Info</h2>
+    <p><strong>Redirect URI:</strong> {redirect_uri}</p>
+    <p><strong>Client ID:</strong> {GOOGLE_CLIENT_ID}</p>
+    <p><strong>Add this exact redirect URI to your Google Cloud Console!</strong></p>
+    <hr>
+    <p>In Google Cloud Console:</p>
+    <ol>
+        <li>Go to APIs & Services → Credentials</li>
+        <li>Click your OAuth 2.0 Client ID</li>
+        <li>Add this redirect URI: <strong>{redirect_uri}</strong></li>
+        <li>Save changes</li>
+    </ol>
+    """
+
+@app.route('/auth/google')
+def google_login():
+    """Initiate Google OAuth flow"""
+    try:
+        # Generate state for CSRF protection
+        state = secrets.token_urlsafe(32)
+        session['oauth_state'] = state
+
+        # Get Google's configuration
+        google_provider_cfg = get_google_provider_cfg()
+        authorization_endpoint = google_provider_cfg["authorization_endpoint"]
+
+        # FIXED: Force 127.0.0.1 in redirect URI to match Google Console
+        redirect_uri = 'http://127.0.0.1:5000/auth/callback'
+
+        # Prepare the authorization URL
+        params = {
+            'client_id': GOOGLE_CLIENT_ID,
+            'redirect_uri': redirect_uri,
+            'scope': 'openid email profile',
+            'response_type': 'code',
+            'state': state,
+            'access_type': 'offline',
+            'prompt': 'consent'
+        }
+
+        authorization_url = authorization_endpoint + '?' + urlencode(params)
+        print(f"Redirecting to: {authorization_url}")
+
+        return redirect(authorization_url)
+
+    except Exception as e:
+        print(f"Error in google_login: {e}")
+        flash("Error initiating Google login", "error")
+        return redirect(url_for('login'))
+
+@app.route('/auth/callback')
+def callback():
+    """Handle Google OAuth callback"""
+    try:
+        print("=== OAuth Callback Started ===")
+
+        if rate_limited(oauth_ip_limit, request.remote_addr):
+            return too_many_attempts('login.html')
+
+        # Verify state parameter
+        if request.args.get('state') != session.get('oauth_state'):
+            print("State mismatch!")
+            flash("Invalid state parameter", "error")
+            return redirect(url_for('login'))
+
+        # Get authorization code
+        code = request.args.get('code')
+        if not code:
+            print("No authorization code received")
+            flash("Authorization failed", "error")
+            return redirect(url_for('login'))
+
+        print(f"Authorization code received: {code[:20]}...")
+
+        # Get Google's configuration
+        google_provider_cfg = get_google_provider_cfg()
+        token_endpoint = google_provider_cfg["token_endpoint"]
+
+        # FIXED: Use same redirect URI format as in authorization
+        redirect_uri = 'http://127.0.0.1:5000/auth/callback'
+
+        # Exchange code for tokens
+        token_data = {
+            'client_id': GOOGLE_CLIENT_ID,
+            'client_secret': GOOGLE_CLIENT_SECRET,
+            'code': code,
+            'grant_type': 'authorization_code',
+            'redirect_uri': redirect_uri
+        }
+
+        print("Exchanging code for tokens...")
+        token_response = oauth_http.post(token_endpoint, data=token_data)
+
+        if not token_response.ok:
+            print(f"Token exchange failed: {token_response.text}")
+            flash("Failed to exchange authorization code", "error")
+            return redirect(url_for('login'))
+
+        tokens = token_response.json()
+        print("Tokens received successfully")
+
+        # Get user info
+        userinfo_endpoint = google_provider_cfg["userinfo_endpoint"]
+        headers = {'Authorization': f'Bearer {tokens["access_token"]}'}
+
+        print("Fetching user info...")
+        user_response = oauth_http.get(userinfo_endpoint, headers=headers)
+
+        if not user_response.ok:
+            print(f"Failed to get user info: {user_response.text}")
+            flash("Failed to get user information", "error")
+            return redirect(url_for('login'))
+
+        user_info = user_response.json()
+        print(f"User info received: {user_info}")
+
+        email = user_info.get('email')
+        name = user_info.get('name', 'Google User')
+
+        if not email:
+            print("No email in user info")
+            flash("Failed to get email from Google", "error")
+            return redirect(url_for('login'))
+
+        # Check if user exists in database
+        user = users_collection.find_one({"email": email})
+
+        if not user:
+            # Register new Google user
+            user_data = {
+                "username": name,
+                "email": email,
+                "password": None,
+                "auth_provider": "google",
+                "created_at": datetime.utcnow()
+            }
+            result = users_collection.insert_one(user_data)
+            user = users_collection.find_one({"_id": result.inserted_id})
+            print(f"New user created: {email}")
+        else:
+            print(f"Existing user found: {email}")
+
+        # Set session
+        rotate_session(session)
+        session['user_id'] = str(user['_id'])
+        session['username'] = user['username']
+        session.permanent = True
+
+        # Clean up OAuth state
+        session.pop('oauth_state', None)
+
+        print(f"Login successful for: {name}")
+        flash(f"Successfully logged in as {name}!", "success")
+        return redirect(url_for('dashboard'))
+
+    except Exception as e:
+        print(f"=== OAuth Callback Error ===")
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        print("=== End Error ===")
+
+        session.pop('oauth_state', None)
+        flash("An error occurred during Google login", "error")
+        return redirect(url_for('login'))
+
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        if users_collection is None:
+            flash("Database not connected. Please check server logs.", "error")
+            return redirect(url_for('register'))
+
+        if rate_limited(register_ip_limit, request.remote_addr):
+            return too_many_attempts('register.html')
+
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+
+        existing_user = users_collection.find_one({'email': email})
+        if existing_user:
+            flash('Email already registered!', 'error')
+            return redirect(url_for('register'))
+
+        try:
+            hashed_password = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            flash(BUSY_MESSAGE, 'error')
+            return render_template('register.html'), 503
+        users_collection.insert_one({
+            'username': username,
+            'email': email,
+            'password': hashed_password,
+            'auth_provider': 'local',
+            'created_at': datetime.utcnow()
+        })
+
+        flash('Registration successful! Login with the new ID', 'success')
+        return redirect(url_for('login'))
+
+    return render_template('register.html')
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        if users_collection is None:
+            flash("Database not connected. Please check server logs.", "error")
+            return redirect(url_for('login'))
+
+        email = request.form.get('email')
+        password = request.form.get('password')
+        email_key = (email or '').strip().lower()
+
+        if rate_limited(login_ip_limit, request.remote_addr) or \
+                rate_limited(login_email_limit, email_key, count=False):
+            return too_many_attempts('login.html')
+
+        user = users_collection.find_one({'email': email})
+        try:
+            valid = user is not None and password_hasher.check(user['password'], password)
+        except PasswordHasherBusy:
+            flash(BUSY_MESSAGE, 'error')
+            return render_template('login.html'), 503
+
+        if valid:
+            # Stored at an older cost, redo it now the password is at hand (or at a quieter login)
+            if password_hasher.needs_rehash(user['password']):
+                try:
+                    users_collection.update_one({'_id': user['_id'], 'password': user['password']},
+                                                {'$set': {'password': password_hasher.hash(password)}})
+                except PasswordHasherBusy:
+                    pass
+            rotate_session(session)
+            session['user_id'] = str(user['_id'])
+            session['username'] = user['username']
+            flash('Login successful!', 'success')
+            return redirect(url_for('dashboard'))
+        else:
+            login_email_limit.record(email_key)
+            flash('Login failed. Check your email and password.', 'error')
+            return redirect(url_for('login'))
+
+    return render_template('login.html')
+
+@app.route('/dashboard')
+def dashboard():
+    if 'user_id' not in session:
+        flash('Please log in to access this page.', 'warning')
+        return redirect(url_for('login'))
+
+    if activities_collection is not None:
+        activities_collection.insert_one({
+            'user_id': session['user_id'],
+            'action': 'viewed_dashboard',
+            'timestamp': datetime.utcnow()
+        })
+        dashboard_data = load_dashboard(db, session['user_id'])
+
+        return render_template('dashboard.html',
+                               username=session['username'],
+                               subject_collection=dashboard_data['subjects'],
+                               stats=dashboard_data['stats'],
+                               time_goals=dashboard_data['time_goals'])
+
+
+@app.route('/study_session/<subject_name>')
+def study_session(subject_name):
+    if 'user_id' not in session:
+        flash('Please log in to start a session.', 'warning')
+        return redirect(url_for('login'))
+
+    local_today = datetime.now()
+    week_start = local_today - timedelta(days=local_today.weekday())
+
+    # Get session doc
+    doc = sessions_collection.find_one({
+        "user_id": ObjectId(session['user_id']),
+        "subject_name": subject_name,
+        "week_start": week_start.date().isoformat()
+    })
+
+    # Get the subject
+    original_subject_id = current_user(db).subject_id(subject_name.lower())
+
+    # Attach files for this subject
+    if original_subject_id:
+        subject = {'_id': str(original_subject_id), 'subject': subject_name.lower()}
+        subject['name'] = subject['subject']  # For template compatibility
+
+        # Find files using original ObjectId
+        files = list(files_collection.find({'subject_id': original_subject_id}))
+
+        # Convert file ObjectIds to strings for template use
+        for file in files:
+            file['_id'] = str(file['_id'])
+            if 'subject_id' in file:
+                file['subject_id'] = str(file['subject_id'])
+
+        subject['files'] = files
+    else:
+        subject = {"name": subject_name, "files": []}
+
+    days = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+    if not doc:
+        time_spent = [0] * 7
+        productive_hours = {}
+    else:
+        time_spent = [doc.get(day, 0) for day in days]
+        productive_hours = doc.get("productive_hours", {})
+
+    chart_data = [t / 60 for t in time_spent]
+
+    return render_template(
+        "study_session.html",
+        subject=subject,
+        subject_name=subject_name,
+        chart_data=chart_data,
+        days=days,
+        productive_hours=productive_hours
+    )
+
+
+# One timer run is at most a day long, and started between 2000 and tomorrow
+MAX_INTERVAL_SECONDS = 24 * 60 * 60
+EARLIEST_INTERVAL = datetime(2000, 1, 1)
+
+
+def session_duration(value):
+    """A posted duration_seconds as an int, None unless it's 1 to MAX_INTERVAL_SECONDS."""
+    try:
+        duration_seconds = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return duration_seconds if 0 < duration_seconds <= MAX_INTERVAL_SECONDS else None
+
+
+@app.route('/log_session', methods=['POST'])
+def log_session():
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'User not logged in'}), 401
+
+    data = request.get_json()
+    subject_name = data.get('subject_name')
+    duration_seconds = data.get('duration_seconds')
+
+    if not subject_name or duration_seconds is None:
+        return jsonify({'status': 'error', 'message': 'Missing required data'}), 400
+
+    duration_seconds = session_duration(duration_seconds)
+    if not isinstance(subject_name, str) or duration_seconds is None:
+        return jsonify({'status': 'error', 'message': 'Invalid session data'}), 400
+
+    subject_id = current_user(db).owned_subject_ids([subject_name.lower()]).get(subject_name.lower())
+
+    if not subject_id:
+        return jsonify({'status': 'error', 'message': 'Subject not found'}), 404
+    subject = {'_id': subject_id}
+
+    today_str = log_study_session(db, session['user_id'], subject, subject_name, duration_seconds)
+    bump_data_version(db, session['user_id'])
+
+    return jsonify({'status': 'success', 'message': f'Session logged to {today_str} successfully!'})
+
+
+MAX_BATCH_INTERVALS = 500
+
+
+def parse_interval(interval, now):
+    """(subject_name, start_time, duration_seconds, id) for one queued run, None if it's malformed."""
+    try:
+        subject_name = interval['subject_name']
+        start_time = datetime.fromisoformat(interval['start'])
+        duration_seconds = session_duration(interval['duration_seconds'])
+        interval_id = interval.get('id')
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+    if not isinstance(subject_name, str) or not subject_name or duration_seconds is None:
+        return None
+    if interval_id is not None and not (isinstance(interval_id, str) and 0 < len(interval_id) <= 64):
+        return None
+    if start_time.tzinfo is not None:
+        start_time = start_time.astimezone().replace(tzinfo=None)
+    if not EARLIEST_INTERVAL <= start_time <= now + timedelta(days=1):
+        return None
+    return subject_name, start_time, duration_seconds, interval_id
+
+
+@app.route('/log_session/batch', methods=['POST'])
+def log_session_batch():
+    """
+    Log a queue of timer runs the study page buffered up, possibly across
+    subjects and days. Runs carrying an id the client generated are logged
+    once, however many times (or from however many tabs) they're sent.
+    """
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'User not logged in'}), 401
+    user_id = session['user_id']
+
+    data = request.get_json(silent=True) or {}
+    intervals = data.get('intervals')
+
+    if not isinstance(intervals, list):
+        return jsonify({'status': 'error', 'message': 'Missing required data'}), 400
+    if len(intervals) > MAX_BATCH_INTERVALS:
+        return jsonify({'status': 'error', 'message': f'At most {MAX_BATCH_INTERVALS} intervals per batch'}), 413
+
+    # Drop malformed entries instead of failing the batch, a retry would never fix them
+    now = datetime.now()
+    parsed = [interval for interval in (parse_interval(i, now) for i in intervals) if interval]
+
+    subject_ids = current_user(db).owned_subject_ids(interval[0].lower() for interval in parsed)
+    parsed = [interval for interval in parsed if interval[0].lower() in subject_ids]
+
+    # Skip runs an earlier request already logged
+    claimed = claim_intervals(db.logged_intervals, user_id, [interval[3] for interval in parsed if interval[3]])
+    new_ids = set(claimed)
+    to_log = []
+    for subject_name, start_time, duration_seconds, interval_id in parsed:
+        if interval_id:
+            if interval_id not in new_ids:
+                continue
+            new_ids.discard(interval_id)
+        to_log.append((subject_ids[subject_name.lower()], subject_name, start_time, duration_seconds))
+
+    if to_log:
+        try:
+            log_study_sessions(db, user_id, to_log)
+        except Exception:
+            # Not logged after all, let the client's retry through
+            release_intervals(db.logged_intervals, user_id, claimed)
+            raise
+        bump_data_version(db, user_id)
+
+    duplicates = len(parsed) - len(to_log)
+    return jsonify({
+        'status': 'success',
+        'logged': len(to_log),
+        'duplicates': duplicates,
+        'rejected': len(intervals) - len(to_log) - duplicates
+    })
+
+
+@app.route('/add_form')
+def add_form():
+    return render_template('add.html')
+
+
+@app.route('/add', methods=['POST'])
+def add_subject():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    subject = request.form['subject'].lower()
+    marks = int(request.form['marks'])
+    priority = request.form.get('priority')
+    category = request.form.get('category')
+    description = request.form.get('description')
+
+    subject_data = {
+        'owner_id': session['user_id'],
+        'subject': subject,
+        'marks': marks,
+        'priority': priority,
+        'category': category,
+        'description': description,
+        'created_at': datetime.utcnow()
+    }
+
+    subjects_collection.insert_one(subject_data)
+    current_user(db).forget_subjects()
+    index_subject(search_index, subject_data)
+    bump_data_version(db, session['user_id'])
+    flash('Subject added successfully!', 'success')
+    return redirect(url_for('dashboard'))
+
+
+@app.route('/update', methods=['POST'])
+def update():
+    if 'user_id' not in session:
+        return "Unauthorized", 401
+
+    subject = request.form['subject'].lower()
+    new_marks = int(request.form['marks'])
+    new_priority = request.form.get('priority')
+    new_category = request.form.get('category')
+
+    subjects_collection.update_one(
+        {"subject": subject, "owner_id": session['user_id']},
+        {"$set": {"marks": new_marks, "priority": new_priority,"category":new_category}}
+    )
+    bump_data_version(db, session['user_id'])
+    return "Success", 200
+
+
+@app.route('/delete', methods=['POST'])
+def delete():
+    if 'user_id' not in session:
+        return "Unauthorized", 401
+
+    subject = request.form['subject'].lower()
+
+
+    deleted = subjects_collection.find_one_and_delete({
+            "subject": subject,
+            "owner_id": session['user_id']
+        }, projection={'_id': 1})
+    current_user(db).forget_subjects()
+    bump_data_version(db, session['user_id'])
+
+    # The subject's files go in the background, the garbage collector catches anything missed
+    if deleted:
+        search_index.delete('subject', [deleted['_id']])
+        user_id = session['user_id']
+        delete_subject_files_async(db, blob_store, user_id, deleted['_id'],
+                                   on_delete=lambda file_ids: forget_file_meta(user_id, file_ids))
+
+    return "Success", 200
+
+
+def forget_file_meta(user_id, file_ids):
+    # Same keys as load_file_meta, so /download and /view_file stop answering for deleted docs
+    for file_id in file_ids:
+        file_meta_cache.invalidate((user_id, str(file_id)))
+
+
+def save_file_metadata(subject_id, original_filename, mimetype, sha256, size):
+    """Record an uploaded blob for a subject, unless the same file is already there."""
+    subject_name = current_user(db).subject_name(subject_id) or 'Unknown Subject'
+
+    result = files_collection.update_one(
+        {
+            'user_id': ObjectId(session['user_id']),
+            'subject_id': ObjectId(subject_id),
+            'sha256': sha256
+        },
+        {'$setOnInsert': {
+            'subject_name': subject_name,
+            'original_filename': original_filename,
+            'secure_filename': secure_filename(original_filename),
+            'file_path': blob_store.path(sha256),
+            'file_type': mimetype,
+            'size': size,
+            'upload_date': datetime.utcnow()
+        }},
+        upsert=True
+    )
+    created = result.upserted_id is not None
+    if created:
+        index_file(search_index, {
+            '_id': result.upserted_id,
+            'user_id': session['user_id'],
+            'subject_id': subject_id,
+            'original_filename': original_filename
+        })
+        # Thumbnail and text are made in the background, see artifacts.py
+        artifact_pipeline.submit(sha256, original_filename)
+    return subject_name, created
+
+
+@app.route('/upload/<subject_id>', methods=['POST'])
+def upload_file(subject_id):
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    if 'file' not in request.files:
+        flash('No file part', 'danger')
+        return redirect(url_for('dashboard'))
+
+    file = request.files['file']
+    if file.filename == '':
+        flash('No selected file', 'danger')
+        return redirect(url_for('dashboard'))
+
+    if file and allowed_file(file.filename):
+        # The upload was hashed while Werkzeug streamed it to disk
+        if isinstance(file.stream, HashingFile):
+            sha256, size = blob_store.commit(file.stream)
+        else:
+            sha256, size = blob_store.save_stream(file.stream)
+
+        subject_name, created = save_file_metadata(subject_id, file.filename, file.mimetype, sha256, size)
+        if not created:
+            flash('This file is already uploaded.', 'info')
+
+        # Check if request came from study session
+        if request.form.get('source') == 'study_session':
+            return redirect(url_for('study_session', subject_name=subject_name))
+    else:
+        flash('File type not allowed.', 'danger')
+
+    return redirect(url_for('dashboard'))
+
+
+@app.route('/upload/<subject_id>/chunked', methods=['POST'])
+def start_chunked_upload(subject_id):
+    """Start a resumable upload; the file is then sent with PUT /upload/chunked/<upload_id>."""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename', '')
+    size = data.get('size')
+
+    if not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed.'}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'File size is required'}), 400
+    if size > app.config['MAX_CHUNKED_UPLOAD_BYTES']:
+        return jsonify({'error': 'File is too large.'}), 413
+
+    result = db.upload_sessions.insert_one({
+        'user_id': ObjectId(session['user_id']),
+        'subject_id': ObjectId(subject_id),
+        'original_filename': filename,
+        'file_type': data.get('mimetype') or 'application/octet-stream',
+        'size': size,
+        'source': data.get('source'),
+        'created_at': datetime.utcnow()
+    })
+    return jsonify({'upload_id': str(result.inserted_id), 'offset': 0, 'chunk_size': UPLOAD_CHUNK_SIZE})
+
+
+@app.route('/upload/chunked/<upload_id>', methods=['GET', 'PUT'])
+def chunked_upload(upload_id):
+    """
+    GET tells a client how much of the upload the server has, so it can resume.
+    PUT appends the request body, which must start at that offset
+    (Content-Range: bytes <start>-<end>/<total>).
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    upload = db.upload_sessions.find_one({
+        '_id': ObjectId(upload_id),
+        'user_id': ObjectId(session['user_id'])
+    })
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    if request.method == 'GET':
+        return jsonify({'offset': blob_store.partial_size(upload_id), 'size': upload['size'],
+                        'chunk_size': UPLOAD_CHUNK_SIZE})
+
+    content_range = re.fullmatch(r'bytes (\d+)-(\d+)/(\d+)', request.headers.get('Content-Range', ''))
+    if not content_range or int(content_range.group(3)) != upload['size']:
+        return jsonify({'error': 'Content-Range header is required'}), 400
+
+    try:
+        offset = blob_store.append_chunk(upload_id, int(content_range.group(1)), request.stream, upload['size'])
+    except OffsetMismatch as e:
+        return jsonify({'error': 'Chunk does not start at the current offset', 'offset': e.offset}), 409
+    except UploadTooLarge:
+        return jsonify({'error': 'More data than the declared size'}), 413
+
+    if offset < upload['size']:
+        return jsonify({'offset': offset, 'size': upload['size']})
+
+    sha256, size = blob_store.commit_partial(upload_id)
+    subject_name, created = save_file_metadata(
+        upload['subject_id'], upload['original_filename'], upload['file_type'], sha256, size
+    )
+    db.upload_sessions.delete_one({'_id': upload['_id']})
+
+    if upload.get('source') == 'study_session':
+        next_url = url_for('study_session', subject_name=subject_name)
+    else:
+        next_url = url_for('dashboard')
+    return jsonify({'status': 'complete', 'created': created, 'offset': size, 'redirect': next_url}), 201
+
+
+def load_file_meta(file_id):
+    key = (session['user_id'], file_id)
+    meta = file_meta_cache.get(key)
+    if meta is None or not os.path.exists(meta['path']):
+        file_doc = files_collection.find_one(
+            {'_id': ObjectId(file_id), 'user_id': ObjectId(session['user_id'])},
+            META_PROJECTION
+        )
+        if not file_doc:
+            return None
+        meta = file_meta(file_doc, app.config['UPLOAD_FOLDER'], blob_store)
+        file_meta_cache.put(key, meta)
+    return meta
+
+
+@app.route('/download/<file_id>')
+def download_file(file_id):
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    meta = load_file_meta(file_id)
+    if not meta:
+        return "File not found or access denied.", 404
+
+    return send_stored_file(meta, app.config['UPLOAD_FOLDER'])
+
+
+# Add this new route to main.py
+@app.route('/view_file/<file_id>')
+def view_file(file_id):
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    # Usually cached, otherwise looked up in the database
+    meta = load_file_meta(file_id)
+
+    if not meta:
+        # Check if request came from study session
+        if request.args.get('source') == 'study_session':
+            # Need to have file_doc before using it - redirect to dashboard if file not found
+            return redirect(url_for('dashboard'))
+        return redirect(url_for('dashboard'))
+
+    # Serve the file for inline viewing (the browser will try to open it)
+    return send_stored_file(meta, app.config['UPLOAD_FOLDER'])
+
+
+@app.route('/thumbnail/<file_id>')
+def file_thumbnail(file_id):
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    meta = load_file_meta(file_id)
+    if not meta or not meta['sha256']:
+        return "Thumbnail not found.", 404
+
+    path = artifact_store.thumbnail_path(meta['sha256'])
+    if not os.path.exists(path):
+        return "Thumbnail not found.", 404
+    response = send_file(path, mimetype='image/png', etag=meta['sha256'], conditional=True, max_age=86400)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+
+@app.route('/delete_file/<file_id>', methods=['POST'])
+def delete_file(file_id):
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    file_doc = files_collection.find_one({'_id': ObjectId(file_id), 'user_id': ObjectId(session['user_id'])})
+    if file_doc:
+        # Delete the metadata from the database
+        files_collection.delete_one({'_id': ObjectId(file_id)})
+        file_meta_cache.invalidate((session['user_id'], file_id))
+        search_index.delete('file', [file_id])
+
+        # Delete the physical file, unless another upload shares the same content.
+        # The metadata is already gone, so a failure here only leaves work for file_gc.
+        if 'sha256' not in file_doc:
+            try:
+                os.remove(file_doc['file_path'])
+            except OSError as e:
+                print(f"Error deleting file {file_doc['file_path']}: {e}")
+        else:
+            reclaim_blobs(db, blob_store, [file_doc['sha256']])
+
+        # Check if request came from study session
+        if request.form.get('source') == 'study_session':
+            return redirect(url_for('study_session', subject_name=file_doc.get('subject_name', 'Unknown')))
+    else:
+        flash('File not found or you do not have permission to delete it.', 'danger')
+
+    return redirect(url_for('dashboard'))
+
+REMINDER_FIELDS = ("title", "date", "user_id")
+REMINDER_PROJECTION = dict.fromkeys(REMINDER_FIELDS, 1)
+
+
+def reminder_query(user_id, args):
+    # Past reminders are removed by the TTL index and sweeper.py.
+    # FullCalendar asks for the visible range with start/end.
+    today = datetime.now().strftime('%Y-%m-%d')
+    date_range = {"$gte": max(today, args.get('start', '')[:10])}
+    if args.get('end'):
+        date_range["$lt"] = args['end'][:10]
+    return {"user_id": user_id, "date": date_range}
+
+
+def new_reminder(user_id, data):
+    """The reminder doc to insert from a POSTed {title, date}, None if it's incomplete."""
+    title = data.get("title")
+    date = data.get("date")
+    if not title or not date:
+        return None
+    try:
+        expires_at = reminder_expiry(date)
+    except ValueError:
+        return None
+    return {
+        "user_id": user_id,
+        "title": title,
+        "date": date,
+        "expires_at": expires_at
+    }
+
+
+@app.route("/reminders", methods=["GET", "POST"])
+def reminders():
+    user_id = session["user_id"]
+
+    if request.method == "GET":
+        query = reminder_query(user_id, request.args)
+
+        if request.args.get('format') == 'ndjson':
+            export = reminders_collection.find(query, {**REMINDER_PROJECTION, "_id": 0}).sort(REMINDER_SORT)
+            return ndjson_response(export, 'reminders.ndjson')
+
+        try:
+            data, next_cursor = fetch_page(reminders_collection, query, REMINDER_SORT, REMINDER_PROJECTION,
+                                           limit=page_size(MAX_PAGE_SIZE), cursor=request.args.get('cursor'))
+        except BadCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        for reminder in data:
+            del reminder["_id"]
+        response = jsonify(data)
+        # The body stays a plain event list for FullCalendar, the next page is in a Link header
+        if next_cursor:
+            next_url = url_for('reminders', **{**request.args.to_dict(), 'cursor': next_cursor})
+            response.headers['Link'] = f'<{next_url}>; rel="next"'
+        return response
+
+    if request.method == "POST":
+        reminder = new_reminder(user_id, request.json)
+        if reminder is None:
+            return jsonify({"success": False})
+
+        reminders_collection.insert_one(reminder)
+        index_reminder(search_index, reminder)
+        changed('reminders', reminder)
+        return jsonify({"success": True})
+
+
+@app.route('/time')
+def time():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    series, chart2 = get_chart(chart_cache, db, 'time', session['user_id'])
+
+    if not series['labels']:
+        chart2 = "<p>No subjects found. Please add some subjects first.</p>"
+        max_subject = None
+        min_subject = None
+    else:
+        subjects = list(zip(series['labels'], series['values']))
+
+        max_name, max_hours = max(subjects, key=lambda s: s[1])
+        min_name, min_hours = min(subjects, key=lambda s: s[1])
+
+        max_subject = {"name": max_name, "hours": round(max_hours, 1)}
+        min_subject = {"name": min_name, "hours": round(min_hours, 1)}
+
+    return render_template("time.html",
+                           chart2=chart2,
+                           max_subject=max_subject,
+                           min_subject=min_subject)
+
+
+# Cursor paging for /history, /todo and /reminders, see pagination.py
+HISTORY_PAGE_SIZE = 20
+HISTORY_SORT = [('end_time', -1), ('_id', -1)]
+HISTORY_PROJECTION = {'_id': 1, 'subject_name': 1, 'week_start': 1, 'end_time': 1, **{day: 1 for day in DAYS}}
+TODO_SORT = [('_id', 1)]
+REMINDER_SORT = [('date', 1), ('_id', 1)]
+MAX_PAGE_SIZE = 500
+
+
+def page_size(default, args=None):
+    args = request.args if args is None else args
+    return min(max(args.get('limit', default, type=int), 1), MAX_PAGE_SIZE)
+
+
+def ndjson_response(cursor, filename):
+    """Stream a whole Mongo cursor as newline-delimited JSON, without building a list."""
+    response = Response(stream_with_context(ndjson_lines(cursor.batch_size(500))), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+@app.route('/history')
+def study_history():
+    """Displays a complete history of all past study sessions."""
+    if 'user_id' not in session:
+        flash('Please log in to view your history.', 'warning')
+        return redirect(url_for('login'))
+
+    query = {'user_id': ObjectId(session['user_id'])}
+
+    if request.args.get('format') == 'ndjson':
+        export = sessions_collection.find(query, HISTORY_PROJECTION).sort(HISTORY_SORT)
+        return ndjson_response(export, 'study_history.ndjson')
+
+    # Newest first, one page at a time
+    try:
+        user_sessions, next_cursor = fetch_page(sessions_collection, query, HISTORY_SORT, HISTORY_PROJECTION,
+                                                limit=HISTORY_PAGE_SIZE, cursor=request.args.get('cursor'))
+    except BadCursor:
+        return redirect(url_for('study_history'))
+
+    for week in user_sessions:
+        week['total_minutes'] = sum(week.get(day, 0) for day in DAYS)
+
+    return render_template('history.html', sessions=user_sessions, next_cursor=next_cursor,
+                           first_page=not request.args.get('cursor'))
+
+@app.route('/add_goal_form')
+def add_goal_form():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    # Fetch user's subjects to show in the dropdown
+    subjects = list(subjects_collection.find({'owner_id': session['user_id']}))
+    return render_template('add_goal.html', subjects=subjects)
+
+# In main.py
+@app.route('/add_goal', methods=['POST'])
+def add_goal():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    subject_id = request.form.get('subject_id')
+    target_duration = float(request.form.get('target_duration')) # Assuming hours for now
+    period = request.form.get('period')
+
+    # Calculate start and end dates for the goal
+    today = datetime.utcnow()
+    if period == 'weekly':
+        start_date = today - timedelta(days=today.weekday()) # Monday
+        end_date = start_date + timedelta(days=6) # Sunday
+    else: # monthly
+        start_date = today.replace(day=1)
+        # Find the last day of the month
+        next_month = start_date.replace(day=28) + timedelta(days=4)
+        end_date = next_month - timedelta(days=next_month.day)
+
+    goal_data = {
+        'user_id': ObjectId(session['user_id']),
+        'subject_id': ObjectId(subject_id),
+        'goal_type': 'time',
+        'target_duration_minutes': target_duration * 60, # Convert hours to minutes
+        'current_duration_minutes': 0,
+        'start_date': start_date.replace(hour=0, minute=0, second=0),
+        'end_date': end_date.replace(hour=23, minute=59, second=59),
+        'status': 'active'
+    }
+
+    goals_collection.insert_one(goal_data)
+    flash('New time-based goal has been set!', 'success')
+    return redirect(url_for('dashboard'))
+
+
+
+@app.route("/todo_stats")
+def todo_stats():
+    if 'user_id' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    stats = get_task_stats(db, session['user_id'])
+
+    return jsonify(stats)
+
+
+TODO_PROJECTION = {
+    "task": 1,
+    "_id": 1,
+    "completion_status": 1,
+    "goal_period": 1,
+    "created_at": 1,
+    "deadline": 1
+}
+
+
+def todo_query(user_id, now):
+    # Expired todos are removed by sweeper.py, until then they're just not shown:
+    # unfinished ones past their deadline, finished ones a day after it
+    return {
+        "user_id": user_id,
+        "$or": [
+            {"deadline": {"$gte": now}},
+            {"deadline": {"$gte": now - COMPLETED_TODO_GRACE}, "completion_status": True}
+        ]
+    }
+
+
+def todo_json(todo):
+    todo["_id"] = str(todo["_id"])
+    todo["completion_status"] = todo.get("completion_status", False)
+    todo["goal_period"] = todo.get("goal_period", "no-period")
+    return todo
+
+
+@app.route('/todo')
+def get_todos():
+    if 'user_id' not in session:
+        return {"todos": []}
+
+    query = todo_query(session['user_id'], datetime.utcnow())
+
+    if request.args.get('format') == 'ndjson':
+        return ndjson_response(goals_collection.find(query, TODO_PROJECTION).sort(TODO_SORT), 'todos.ndjson')
+
+    try:
+        todos, next_cursor = fetch_page(goals_collection, query, TODO_SORT, TODO_PROJECTION,
+                                        limit=page_size(100), cursor=request.args.get('cursor'))
+    except BadCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    return jsonify({"todos": [todo_json(todo) for todo in todos], "next_cursor": next_cursor})
+
+
+@app.route("/todo/add", methods=["POST"])
+def add_todo():
+    user_id = session.get("user_id")
+    task = request.json.get("task")
+    goal_period = request.json.get("goal_period")
+
+    if not task:
+        return jsonify({"error": "Task cannot be empty"}), 400
+
+    if not goal_period:
+        return jsonify({"error": "Goal period is required"}), 400
+
+    today = datetime.utcnow()
+    if goal_period == "daily":
+        deadline = today + timedelta(days=1)
+    elif goal_period == "weekly":
+        deadline = today + timedelta(weeks=1)
+    elif goal_period == "monthly":
+        deadline = today + timedelta(days=30)
+    else:
+        deadline = today + timedelta(days=1)
+
+    new_goal = {
+        "user_id": user_id,
+        "task": task,
+        "goal_type": "task",
+        "current_progress": 0,
+        "goal_period": goal_period,
+        "deadline": deadline,
+        "completion_status": False,
+        "created_at": datetime.utcnow()
+    }
+
+    result = goals_collection.insert_one(new_goal)
+
+    if result.inserted_id:
+        index_todo(search_index, new_goal)
+        changed('goals', new_goal)
+        return jsonify({"success": True})
+    else:
+        return jsonify({"error": "Failed to add task"}), 500
+
+
+@app.route("/todo/done", methods=["POST"])
+def mark_todo_done():
+    user_id = session.get("user_id")
+    todo_id = request.json.get("id")
+
+    if not todo_id:
+        return jsonify({"error": "Todo ID is required"}), 400
+
+    try:
+        todo = goals_collection.find_one({"_id": ObjectId(todo_id), "user_id": user_id})
+        if not todo:
+            return jsonify({"error": "Todo not found"}), 404
+
+        new_status = not todo.get("completion_status", False)
+        progress = 1 if new_status else 0
+
+        result = goals_collection.update_one(
+            {"_id": ObjectId(todo_id), "user_id": user_id},
+            {"$set": {
+                "completion_status": new_status,
+                "current_progress": progress
+            }}
+        )
+
+        if result.modified_count > 0:
+            changed('goals', {**todo, "completion_status": new_status, "current_progress": progress})
+            return jsonify({"success": True, "completion_status": new_status})
+        else:
+            return jsonify({"error": "Failed to update todo"}), 500
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def expired_todo_query(user_id, now):
+    # Reported until the sweeper deletes them, within SWEEP_EVERY seconds
+    return {"user_id": user_id, "deadline": {"$lt": now}, "completion_status": False}
+
+
+def expired_todos(user_id):
+    expired_tasks = list(goals_collection.find(expired_todo_query(user_id, datetime.utcnow()), {"task": 1, "_id": 1}))
+    for task in expired_tasks:
+        task["_id"] = str(task["_id"])
+    return expired_tasks
+
+
+@app.route("/todo/check-deadlines", methods=["GET"])
+def check_deadlines():
+    if 'user_id' not in session:
+        return jsonify({"expiredTasks": []})
+
+    return jsonify({"expiredTasks": expired_todos(session['user_id'])})
+
+
+def publish_change(collection_name, doc):
+    """Push a written todo or reminder to its owner's open /events streams."""
+    user_id = doc.get('user_id')
+    if not live_events.has_subscribers(user_id):
+        return
+    if collection_name == 'goals' and doc.get('goal_type') == 'task':
+        live_events.publish(user_id, 'todo', todo_json({k: doc[k] for k in TODO_PROJECTION if k in doc}))
+        live_events.publish(user_id, 'stats', get_task_stats(db, user_id))
+    elif collection_name == 'reminders':
+        live_events.publish(user_id, 'reminder', {k: doc[k] for k in REMINDER_FIELDS if k in doc})
+
+
+def changed(collection_name, doc):
+    # With change streams the relay publishes instead, for writes from any worker
+    if change_relay is None:
+        publish_change(collection_name, doc)
+
+
+def resync_streams(user_ids):
+    """Deletes aren't pushed one by one, so after a sweep the owners' open streams get a fresh snapshot."""
+    for user_id in user_ids:
+        live_events.publish(user_id, *RESYNC)
+
+
+def sse(name, data):
+    return format_event(name, data, app.json.dumps)
+
+
+@app.route('/events')
+def live_updates():
+    """
+    The dashboard's Server-Sent Events stream is served by asgi.py, where an
+    open stream costs a queue rather than a worker thread (and isn't cut off
+    by the worker timeout). Here the answer is 204, which tells EventSource
+    not to reconnect, and the dashboard polls the JSON routes instead.
+    """
+    return '', 204
+
+
+@app.route('/performance')
+def performance():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    series, chart1 = get_chart(chart_cache, db, 'performance', session['user_id'])
+    subjects = [{'subject': name, 'marks': marks, 'time_spent': minutes}
+                for name, marks, minutes in zip(series['labels'], series['values'], series['minutes'])]
+
+    if not subjects:
+        chart1 = "<p>No subjects found. Please add some subjects first.</p>"
+
+    return render_template("performance.html", chart1=chart1, subjects=subjects)
+
+
+@app.route('/api/charts/<kind>')
+def chart_api(kind):
+    """Compact chart series for rendering on the client."""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    if kind not in CHARTS:
+        return jsonify({"error": "Unknown chart"}), 404
+
+    return jsonify(get_series(chart_cache, db, kind, session['user_id']))
+
+
+@app.route('/search')
+def search():
+    """Paginated full-text search over the user's subjects, todos, reminders and files."""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+    results, total = search_index.search(session['user_id'], query, limit=per_page, offset=(page - 1) * per_page)
+
+    subject_names = {}
+    subject_ids = [r['id'] for r in results if r['kind'] == 'subject']
+    if subject_ids:
+        subject_names = {str(s['_id']): s['subject'] for s in subjects_collection.find(
+            {'_id': {'$in': [ObjectId(i) for i in subject_ids]}}, {'subject': 1}
+        )}
+    for result in results:
+        if result['kind'] == 'subject' and result['id'] in subject_names:
+            result['url'] = url_for('study_session', subject_name=subject_names[result['id']])
+        elif result['kind'] == 'file':
+            result['url'] = url_for('view_file', file_id=result['id'])
+
+    return jsonify({
+        "query": query,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "results": results
+    })
+
+
+@app.route('/export')
+def export_data():
+    """Everything the user owns as one NDJSON download, streamed a batch at a time."""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    def without_password(docs):
+        for collection_name, doc in docs:
+            if collection_name == 'users':
+                doc.pop('password', None)
+            yield collection_name, doc
+
+    lines = ndjson_export(without_password(export_docs(db, session['user_id'])))
+    response = Response(stream_with_context(lines), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f"attachment; filename=pathfinder-{datetime.now():%Y-%m-%d}.ndjson"
+    return response
+
+
+@app.route('/import', methods=['POST'])
+def import_data():
+    """Load an export back in. Safe to repeat, and only the user's own documents are written."""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    # Parsed in full before anything is written, so a bad line leaves the data as it was.
+    # The body is capped by MAX_CONTENT_LENGTH.
+    try:
+        docs = list(parse_ndjson(request.stream))
+    except (ValueError, KeyError, TypeError):
+        return jsonify({"error": "Not a valid export file"}), 400
+
+    report = import_docs(db, docs, user_id=session['user_id'], collections=WEB_IMPORT_COLLECTIONS)
+
+    bump_data_version(db, session['user_id'])
+    rebuild_search_index(search_index, db, artifact_store, user_id=session['user_id'])
+    # Too many changes to send one by one, open dashboards reload everything
+    live_events.publish(session['user_id'], *RESYNC)
+    return jsonify({"status": "success", "imported": report})
+
+
+def metrics_allowed():
+    # Open unless METRICS_TOKEN is set, for scrapers on a private network
+    token = os.getenv('METRICS_TOKEN')
+    return not token or request.headers.get('Authorization') == f'Bearer {token}'
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    if not metrics_allowed():
+        return jsonify({"error": "Not authorized"}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/metrics/slow_queries')
+def slow_queries():
+    """The most recent Mongo commands over SLOW_QUERY_MS, with their filter shapes."""
+    if not metrics_allowed():
+        return jsonify({"error": "Not authorized"}), 401
+    return jsonify({"threshold_ms": metrics.slow_query_ms, "samples": list(metrics.slow_queries)[::-1]})
+
+
+@app.route('/logout')
+def logout():
+    session.clear()
+    rotate_session(session)
+    flash('You have been logged out.', 'info')
+    return redirect(url_for('login'))
+
+
+# Started last, it calls publish_change as soon as something changes
+if LIVE_UPDATES == 'changestream' and db is not None:
+    change_relay = ChangeStreamRelay(db, publish_change)
+    change_relay.start()
+
+# Expired todos and reminders are deleted every SWEEP_EVERY seconds, 0 when cron runs sweeper.py instead
+SWEEP_EVERY = int(os.getenv('SWEEP_EVERY', 300))
+sweep_timer = None
+if SWEEP_EVERY and db is not None:
+    sweep_timer = SweepTimer(db, SWEEP_EVERY, search_index=search_index, on_sweep=resync_streams)
+    sweep_timer.start()
+
+
+if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,248 @@
+"""
+Request and Mongo metrics in the Prometheus text format, with no client
+library: route latency histograms, Mongo commands per request and their
+durations, and samples of slow commands with the shape of their filters.
+
+main.py times each request in before/after_request hooks, and
+CommandMetrics is registered on the MongoClient as a pymongo command
+listener. Both add to a MetricsRegistry that /metrics renders.
+"""
+import threading
+import time
+from collections import deque
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# A route doing more than a handful of commands is usually a query in a loop
+COMMAND_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# Commands that aren't the app's queries
+IGNORED_COMMANDS = {'ping', 'hello', 'ismaster', 'isMaster', 'endSessions', 'saslStart', 'saslContinue',
+                    'buildInfo', 'getLastError', 'killCursors'}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labels, labels)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series['count'] if series else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, series['buckets']):
+                    cumulative += n
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f'{self.name}_bucket{_labels(self.labels, labels, [le])} {cumulative}')
+                lines.append(f'{self.name}_sum{_labels(self.labels, labels)} {_number(series["sum"])}')
+                lines.append(f'{self.name}_count{_labels(self.labels, labels)} {series["count"]}')
+        return lines
+
+
+class Gauge:
+    """Read when scraped. callback returns a number, or {label values tuple: number}."""
+
+    def __init__(self, name, help, callback, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.callback = callback
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        value = self.callback()
+        values = value if isinstance(value, dict) else {(): value}
+        for labels, number in sorted(values.items()):
+            lines.append(f'{self.name}{_labels(self.labels, labels)} {_number(number)}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, prefix='pathfinder', slow_query_ms=100, slow_samples=50):
+        self.prefix = prefix
+        self.slow_query_ms = slow_query_ms
+        self.slow_queries = deque(maxlen=slow_samples)
+        self._metrics = []
+
+        self.request_seconds = self.histogram('request_duration_seconds', 'Time spent handling requests.',
+                                              ('route', 'method', 'status'))
+        self.request_commands = self.histogram('request_mongo_commands', 'Mongo commands run per request.',
+                                                ('route',), buckets=COMMAND_COUNT_BUCKETS)
+        self.request_mongo_seconds = self.histogram('request_mongo_seconds', 'Time per request spent in Mongo.',
+                                                    ('route',))
+        self.command_seconds = self.histogram('mongo_command_duration_seconds', 'Mongo command round trips.',
+                                              ('command', 'collection'))
+        self.command_failures = self.counter('mongo_command_failures_total', 'Mongo commands that failed.',
+                                             ('command', 'collection'))
+        self.slow_commands = self.counter('mongo_slow_commands_total', 'Mongo commands over the slow threshold.',
+                                          ('command', 'collection', 'shape'))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(f'{self.prefix}_{name}', help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(f'{self.prefix}_{name}', help, labels, buckets))
+
+    def gauge(self, name, help, callback, labels=()):
+        return self._add(Gauge(f'{self.prefix}_{name}', help, callback, labels))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# --- Mongo commands ---
+
+def query_shape(value):
+    """A filter with its values replaced by '?', so queries that differ only by ids group together."""
+    if isinstance(value, dict):
+        return {key: query_shape(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        # {$in: [...]} of any length is one shape, $or/$and keep their branches
+        shapes = [query_shape(v) for v in value]
+        unique = []
+        for shape in shapes:
+            if shape not in unique:
+                unique.append(shape)
+        return unique
+    return '?'
+
+
+def command_filter(command_name, command):
+    """The part of a command that decides which documents it touches."""
+    if command_name in ('find', 'count', 'distinct', 'findAndModify'):
+        return command.get('filter', command.get('query'))
+    if command_name == 'aggregate':
+        pipeline = command.get('pipeline') or [{}]
+        return pipeline[0].get('$match')
+    if command_name == 'update':
+        return [u.get('q') for u in command.get('updates', [])[:1]]
+    if command_name == 'delete':
+        return [d.get('q') for d in command.get('deletes', [])[:1]]
+    return None
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    pymongo calls these in the thread that ran the command, so the request
+    being served is the one in that thread's Flask context (if any).
+    """
+
+    def __init__(self, registry, current_request=None):
+        self.registry = registry
+        # Returns the calling thread's per-request stats dict, or None outside a request
+        self.current_request = current_request
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ''  # getMore carries a cursor id, aggregate can be on the db
+        if event.command_name == 'getMore':
+            collection = event.command.get('collection', '')
+        started = (event.command_name, collection, command_filter(event.command_name, event.command))
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = started
+
+    def _finish(self, event, failed):
+        with self._lock:
+            started = self._pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        command_name, collection, query = started
+        seconds = event.duration_micros / 1e6
+
+        stats = self.current_request() if self.current_request else None
+        if stats is not None:
+            stats['commands'] += 1
+            stats['mongo_seconds'] += seconds
+
+        self.registry.command_seconds.observe(seconds, command_name, collection)
+        if failed:
+            self.registry.command_failures.inc(command_name, collection)
+        if seconds * 1000 >= self.registry.slow_query_ms:
+            shape = query_shape(query) if query is not None else None
+            self.registry.slow_commands.inc(command_name, collection, str(shape))
+            self.registry.slow_queries.append({
+                'command': command_name,
+                'collection': collection,
+                'shape': shape,
+                'ms': round(seconds * 1000, 1),
+                'route': stats['route'] if stats is not None else None,
+                'at': time.time(),
+            })
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
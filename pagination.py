@@ -0,0 +1,108 @@
+"""
+Keyset (cursor) pagination and NDJSON streaming for list endpoints.
+
+A cursor is the sort key of the last document on a page, so the next page
+is one indexed range query however deep the client has paged, and rows
+inserted meanwhile don't shift pages the way skip/limit does. The sort must
+end in _id to be stable.
+"""
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING
+
+
+class BadCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, ObjectId):
+        return {'$oid': str(value)}
+    if isinstance(value, datetime):
+        return {'$date': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if '$oid' in value:
+            return ObjectId(value['$oid'])
+        if '$date' in value:
+            return datetime.fromisoformat(value['$date'])
+    return value
+
+
+def encode_cursor(doc, sort):
+    values = [_encode_value(doc.get(field)) for field, _ in sort]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """The sort key values in a cursor, or None if it isn't a valid cursor for this sort."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = [_decode_value(v) for v in json.loads(base64.urlsafe_b64decode(padded))]
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(sort):
+        return None
+    return values
+
+
+def after(sort, values):
+    """Filter for documents that come after the given sort key values."""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: values[j] for j, (f, _) in enumerate(sort[:i])}
+        clause[field] = {'$gt' if direction == ASCENDING else '$lt': values[i]}
+        clauses.append(clause)
+    return {'$or': clauses}
+
+
+def page_query(query, sort, cursor=None):
+    """query narrowed to what comes after cursor."""
+    if not cursor:
+        return query
+    values = decode_cursor(cursor, sort)
+    if values is None:
+        raise BadCursor(cursor)
+    return {'$and': [query, after(sort, values)]}
+
+
+def _split_page(docs, sort, limit):
+    # One extra row says whether there's another page without a count
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1], sort)
+
+
+def fetch_page(collection, query, sort, projection=None, limit=50, cursor=None):
+    """One page of results. Returns (docs, next_cursor); next_cursor is None on the last page."""
+    query = page_query(query, sort, cursor)
+    docs = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    return _split_page(docs, sort, limit)
+
+
+async def fetch_page_async(collection, query, sort, projection=None, limit=50, cursor=None):
+    """fetch_page for a Motor collection."""
+    query = page_query(query, sort, cursor)
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(None)
+    return _split_page(docs, sort, limit)
+
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def ndjson_lines(cursor):
+    """One JSON document per line, straight off a Mongo cursor."""
+    for doc in cursor:
+        yield json.dumps(doc, default=_json_default) + '\n'
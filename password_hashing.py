@@ -0,0 +1,103 @@
+"""
+bcrypt hashing off the request thread, in a small process pool.
+
+Each hash is deliberately slow (hundreds of ms at cost 12), so at the
+start of term a burst of logins would otherwise pin every web worker. The
+pool runs at most `workers` hashes at once; at most `max_pending` may be
+running or waiting, and a request that can't get a slot within `wait`
+seconds gets PasswordHasherBusy (a 503) instead of piling up.
+
+The cost comes from BCRYPT_LOG_ROUNDS. Hashes made at another cost are
+redone at login, when the password is at hand.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+# bcrypt only ever used the first 72 bytes, bcrypt>=5 raises instead of truncating
+MAX_PASSWORD_BYTES = 72
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _encode(password):
+    return password.encode('utf-8')[:MAX_PASSWORD_BYTES]
+
+
+# Module level so the pool's processes can unpickle them
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed.encode('utf-8'))
+
+
+def hash_cost(hashed):
+    """The work factor of a $2b$12$... hash, None if it isn't a bcrypt hash."""
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, rounds=DEFAULT_ROUNDS, workers=2, max_pending=32, wait=5.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.wait = wait
+        self.rejected = 0
+        self._pending = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def queue_depth(self):
+        """Hashes running or waiting for a process."""
+        return self._pending
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)  # workers=0 hashes inline, for tests and one-off scripts
+        if not self._slots.acquire(timeout=self.wait):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+        with self._lock:
+            self._pending += 1
+        try:
+            return self._pool().submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, _encode(password), self.rounds)
+
+    def check(self, hashed, password):
+        # Google accounts have no password
+        if not hashed or not password or hash_cost(hashed) is None:
+            return False
+        return self._run(_check, _encode(password), hashed)
+
+    def needs_rehash(self, hashed):
+        return hash_cost(hashed) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
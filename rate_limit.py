@@ -0,0 +1,109 @@
+"""
+Sliding-window rate limits for the sign-in routes, checked before any
+Mongo lookup or bcrypt work is done for the request.
+
+Each limit keeps a counter per key (an IP, an email) per fixed window and
+weighs the previous window by how much of it still overlaps the sliding
+one, so a burst straddling a window boundary can't get double the limit.
+Counters live in a store:
+
+    MemoryCounterStore   this process only (one gunicorn worker = its own limits)
+    RedisCounterStore    shared by every worker, anything with redis-py's get/incr/expire
+"""
+import math
+import threading
+import time
+from collections import namedtuple
+
+Decision = namedtuple('Decision', 'allowed remaining retry_after')
+
+
+class MemoryCounterStore:
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._counters.get(key)
+            return entry[0] if entry and entry[1] > time.time() else 0
+
+    def incr(self, key, ttl):
+        with self._lock:
+            now = time.time()
+            count, expires_at = self._counters.get(key, (0, 0))
+            if expires_at <= now:
+                count, expires_at = 0, now + ttl
+            self._counters[key] = (count + 1, expires_at)
+            if len(self._counters) > self.maxsize:
+                self._prune(now)
+            return count + 1
+
+    def _prune(self, now):
+        for key in [k for k, (_, expires_at) in self._counters.items() if expires_at <= now]:
+            del self._counters[key]
+        # Still full of live keys (an attack from many IPs): drop the oldest half
+        if len(self._counters) > self.maxsize:
+            for key in list(self._counters)[:len(self._counters) // 2]:
+                del self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+
+
+class RedisCounterStore:
+    def __init__(self, client, prefix='ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def incr(self, key, ttl):
+        pipe = self.client.pipeline()
+        pipe.incr(self.prefix + key)
+        pipe.expire(self.prefix + key, int(ttl))
+        return pipe.execute()[0]
+
+
+class RateLimit:
+    """At most `limit` hits per key in any `window` seconds."""
+
+    def __init__(self, name, limit, window, store, clock=time.time):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.store = store
+        self.clock = clock
+
+    def _count(self, key, now):
+        current = int(now // self.window)
+        elapsed = now - current * self.window
+        previous = self.store.get(f'{self.name}:{key}:{current - 1}')
+        count = self.store.get(f'{self.name}:{key}:{current}')
+        return previous * (1 - elapsed / self.window) + count, current, elapsed
+
+    def _decide(self, key, record):
+        now = self.clock()
+        count, current, elapsed = self._count(key, now)
+        if count >= self.limit:
+            return Decision(False, 0, max(math.ceil(self.window - elapsed), 1))
+        if record:
+            # Kept for two windows, the next one still weighs this one in
+            self.store.incr(f'{self.name}:{key}:{current}', self.window * 2)
+            count += 1
+        return Decision(True, max(int(self.limit - count), 0), 0)
+
+    def hit(self, key):
+        """Count one request against key, unless it's already over the limit."""
+        return self._decide(key, record=True)
+
+    def peek(self, key):
+        """Whether key is over the limit, without counting anything."""
+        return self._decide(key, record=False)
+
+    def record(self, key):
+        """Count one more (e.g. a failed login) without checking first."""
+        self.store.incr(f'{self.name}:{key}:{int(self.clock() // self.window)}', self.window * 2)
@@ -0,0 +1,90 @@
+"""
+Per user, per subject study totals and hour-of-day histograms, kept current
+by the session logging path so /time and /performance read one small doc
+per subject instead of every weekly sessions doc.
+
+    python rollups.py backfill [--user USER_ID]   # rebuild from sessions
+"""
+import argparse
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ReplaceOne, UpdateOne
+
+from time_buckets import DAYS, HOURS
+
+
+def rollup_updates(user_id, increments, subject_names):
+    """
+    Upserts adding weekly increments ({(subject_id, week_start): {field: minutes}},
+    see session_log.weekly_increments) to the subject rollups.
+    """
+    per_subject = {}
+    for (subject_id, _), inc in increments.items():
+        totals = per_subject.setdefault(subject_id, {'total_minutes': 0})
+        for field, minutes in inc.items():
+            if field in DAYS:
+                totals['total_minutes'] += minutes
+            else:
+                totals[field] = totals.get(field, 0) + minutes
+
+    return [
+        UpdateOne(
+            {'user_id': ObjectId(user_id), 'subject_id': subject_id},
+            {'$inc': inc, '$set': {'subject_name': subject_names[subject_id], 'updated_at': datetime.utcnow()}},
+            upsert=True
+        )
+        for subject_id, inc in per_subject.items()
+    ]
+
+
+def get_rollups(db, user_id):
+    return list(db.study_rollups.find(
+        {'user_id': ObjectId(user_id)},
+        {'_id': 0, 'subject_id': 1, 'subject_name': 1, 'total_minutes': 1, 'productive_hours': 1}
+    ))
+
+
+def backfill_rollups(db, user_id=None, batch_size=500):
+    """Rebuild rollups from the weekly sessions docs. Returns how many were written."""
+    query = {'user_id': ObjectId(user_id)} if user_id else {}
+    projection = {'user_id': 1, 'subject_id': 1, 'subject_name': 1, 'productive_hours': 1, **{d: 1 for d in DAYS}}
+
+    rollups = {}
+    for doc in db.sessions.find(query, projection).batch_size(batch_size):
+        key = (doc['user_id'], doc.get('subject_id'))
+        rollup = rollups.setdefault(key, {
+            'user_id': doc['user_id'],
+            'subject_id': doc.get('subject_id'),
+            'subject_name': doc.get('subject_name'),
+            'total_minutes': 0,
+            'productive_hours': {hour: 0 for hour in HOURS},
+        })
+        rollup['total_minutes'] += sum(doc.get(day, 0) for day in DAYS)
+        for hour, minutes in doc.get('productive_hours', {}).items():
+            rollup['productive_hours'][hour] = rollup['productive_hours'].get(hour, 0) + minutes
+
+    ops = []
+    for (doc_user_id, subject_id), rollup in rollups.items():
+        rollup['updated_at'] = datetime.utcnow()
+        ops.append(ReplaceOne({'user_id': doc_user_id, 'subject_id': subject_id}, rollup, upsert=True))
+    for start in range(0, len(ops), batch_size):
+        db.study_rollups.bulk_write(ops[start:start + batch_size], ordered=False)
+
+    return len(ops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage study time rollups.')
+    parser.add_argument('command', choices=['backfill'])
+    parser.add_argument('--user', help='only rebuild this user id')
+    args = parser.parse_args()
+
+    from database import get_database
+    db = get_database()
+
+    print(f"Rebuilt {backfill_rollups(db, args.user)} subject rollups")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Full-text search over a user's subjects, todos, reminders and uploaded files,
+in a local SQLite FTS5 index next to the app.
+
+The routes that write those things keep the index current as they go;
+entries for things that expire on their own (todos, reminders) carry an
+expires_at and stop matching once it has passed.
+
+    python search_index.py rebuild   # reindex everything from Mongo
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from bson import ObjectId
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    parent TEXT,
+    expires_at TEXT,
+    UNIQUE (kind, ref)
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    title, body, tokenize = 'porter unicode61'
+);
+"""
+
+
+def match_query(text):
+    """
+    Turn what a user typed into an FTS5 query: every word must match, the
+    last one as a prefix so results show up while typing. Quoting each word
+    keeps FTS5 syntax (AND, NEAR, quotes, ...) from leaking through.
+    """
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads (the artifact
+        # workers write here too), so each thread gets its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, user_id, kind, ref, title, body='', parent=None, expires_at=None):
+        expires = expires_at.isoformat() if expires_at else None
+        with self._connect() as conn:
+            row = conn.execute('SELECT id FROM entries WHERE kind = ? AND ref = ?', (kind, str(ref))).fetchone()
+            if row:
+                conn.execute('UPDATE entries SET user_id = ?, parent = ?, expires_at = ? WHERE id = ?',
+                             (str(user_id), parent and str(parent), expires, row[0]))
+                conn.execute('DELETE FROM entries_fts WHERE rowid = ?', (row[0],))
+                entry_id = row[0]
+            else:
+                entry_id = conn.execute(
+                    'INSERT INTO entries (user_id, kind, ref, parent, expires_at) VALUES (?, ?, ?, ?, ?)',
+                    (str(user_id), kind, str(ref), parent and str(parent), expires)
+                ).lastrowid
+            conn.execute('INSERT INTO entries_fts (rowid, title, body) VALUES (?, ?, ?)',
+                         (entry_id, title or '', body or ''))
+
+    def set_body(self, kind, ref, body):
+        """Replace the body of an existing entry, e.g. once a file's text has been extracted."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT id FROM entries WHERE kind = ? AND ref = ?', (kind, str(ref))).fetchone()
+            if not row:
+                return False
+            title = conn.execute('SELECT title FROM entries_fts WHERE rowid = ?', (row[0],)).fetchone()
+            conn.execute('DELETE FROM entries_fts WHERE rowid = ?', (row[0],))
+            conn.execute('INSERT INTO entries_fts (rowid, title, body) VALUES (?, ?, ?)',
+                         (row[0], title[0] if title else '', body or ''))
+            return True
+
+    def delete(self, kind, refs):
+        """Remove entries, along with anything indexed under them (a subject's files)."""
+        refs = [str(ref) for ref in refs]
+        if not refs:
+            return
+        marks = ','.join('?' * len(refs))
+        with self._connect() as conn:
+            ids = [row[0] for row in conn.execute(
+                f'SELECT id FROM entries WHERE (kind = ? AND ref IN ({marks})) OR parent IN ({marks})',
+                [kind, *refs, *refs]
+            )]
+            self._delete_ids(conn, ids)
+
+    def purge_expired(self, now=None):
+        now = (now or datetime.utcnow()).isoformat()
+        with self._connect() as conn:
+            ids = [row[0] for row in conn.execute('SELECT id FROM entries WHERE expires_at < ?', (now,))]
+            self._delete_ids(conn, ids)
+        return len(ids)
+
+    def _delete_ids(self, conn, ids):
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            marks = ','.join('?' * len(batch))
+            conn.execute(f'DELETE FROM entries_fts WHERE rowid IN ({marks})', batch)
+            conn.execute(f'DELETE FROM entries WHERE id IN ({marks})', batch)
+
+    def search(self, user_id, text, limit=20, offset=0, now=None):
+        """Best matches first. Returns (results, total)."""
+        query = match_query(text)
+        if not query:
+            return [], 0
+        now = (now or datetime.utcnow()).isoformat()
+        where = """entries_fts MATCH ? AND e.user_id = ?
+                   AND (e.expires_at IS NULL OR e.expires_at >= ?)"""
+        params = (query, str(user_id), now)
+
+        conn = self._connect()
+        total = conn.execute(
+            f'SELECT count(*) FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid WHERE {where}', params
+        ).fetchone()[0]
+        rows = conn.execute(
+            f"""SELECT e.kind, e.ref, e.parent, entries_fts.title,
+                       snippet(entries_fts, 1, '[', ']', '...', 12)
+                FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid
+                WHERE {where}
+                ORDER BY bm25(entries_fts, 4.0, 1.0)
+                LIMIT ? OFFSET ?""",
+            (*params, limit, offset)
+        ).fetchall()
+        results = [
+            {'kind': kind, 'id': ref, 'parent': parent, 'title': title, 'snippet': snippet}
+            for kind, ref, parent, title, snippet in rows
+        ]
+        return results, total
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries_fts')
+            conn.execute('DELETE FROM entries')
+
+
+# --- What gets indexed, shared by the routes and rebuild() ---
+
+def index_subject(index, subject):
+    index.upsert(subject['owner_id'], 'subject', subject['_id'], subject.get('subject'),
+                 subject.get('description') or '')
+
+
+def index_todo(index, todo):
+    # Expired todos are deleted by the app, they drop out of search at their deadline
+    index.upsert(todo['user_id'], 'todo', todo['_id'], todo.get('task'), expires_at=todo.get('deadline'))
+
+
+def index_reminder(index, reminder):
+    index.upsert(reminder['user_id'], 'reminder', reminder['_id'], reminder.get('title'),
+                 expires_at=reminder.get('expires_at'))
+
+
+def index_file(index, file_doc, text=''):
+    index.upsert(file_doc['user_id'], 'file', file_doc['_id'], file_doc.get('original_filename'),
+                 text or '', parent=file_doc.get('subject_id'))
+
+
+def rebuild(index, db, artifacts=None, user_id=None):
+    """
+    Reindex everything from Mongo, or just one user's things (e.g. after an
+    import) without clearing anyone else's. Returns how many entries were written.
+    """
+    def owned(field):
+        if user_id is None:
+            return {}
+        return {field: {'$in': [str(user_id), ObjectId(user_id)]}}
+
+    if user_id is None:
+        index.clear()
+    count = 0
+    for subject in db.subjects.find(owned('owner_id'), {'owner_id': 1, 'subject': 1, 'description': 1}):
+        index_subject(index, subject)
+        count += 1
+    for todo in db.goals.find({'goal_type': 'task', **owned('user_id')}, {'user_id': 1, 'task': 1, 'deadline': 1}):
+        index_todo(index, todo)
+        count += 1
+    for reminder in db.reminders.find(owned('user_id'), {'user_id': 1, 'title': 1, 'expires_at': 1}):
+        index_reminder(index, reminder)
+        count += 1
+    projection = {'user_id': 1, 'subject_id': 1, 'original_filename': 1, 'sha256': 1}
+    for file_doc in db.files.find(owned('user_id'), projection):
+        text = artifacts.read_text(file_doc['sha256']) if artifacts and 'sha256' in file_doc else None
+        index_file(index, file_doc, text)
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the search index.')
+    parser.add_argument('command', choices=['rebuild', 'purge'])
+    parser.add_argument('--path', default=os.getenv('SEARCH_INDEX_PATH', 'search_index.db'))
+    parser.add_argument('--uploads', default='uploads', help='upload folder the app uses')
+    args = parser.parse_args()
+
+    index = SearchIndex(args.path)
+    if args.command == 'purge':
+        print(f"Removed {index.purge_expired()} expired entries")
+        return
+
+    from artifacts import ArtifactStore
+    from database import get_database
+    artifacts = ArtifactStore(os.path.join(args.uploads, 'derived'))
+    print(f"Indexed {rebuild(index, get_database(), artifacts)} entries")
+
+
+if __name__ == '__main__':
+    main()
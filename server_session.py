@@ -0,0 +1,232 @@
+"""
+Server-side sessions: the cookie only carries a random session id, the
+data lives in a store.
+
+    MemorySessionStore   one process (dev, tests), an LRU
+    MongoSessionStore    the web_sessions collection, expired by a TTL index
+    RedisSessionStore    anything with redis-py's get/set/delete
+    CachedSessionStore   a short-lived MemorySessionStore in front of either
+
+Stores keep (payload, expires_at) per id. Payloads are Flask's tagged JSON,
+the same serializer the cookie sessions use, so flashes and datetimes come
+back as they went in.
+"""
+import json
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+
+class MemorySessionStore:
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= datetime.utcnow():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return entry
+
+    def set(self, sid, payload, expires_at):
+        with self._lock:
+            self._entries[sid] = (payload, expires_at)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MongoSessionStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get(self, sid):
+        # The TTL index only runs about once a minute, so check expiry here too
+        doc = self.collection.find_one({'_id': sid, 'expires_at': {'$gt': datetime.utcnow()}})
+        return (doc['data'], doc['expires_at']) if doc else None
+
+    def set(self, sid, payload, expires_at):
+        self.collection.replace_one({'_id': sid}, {'data': payload, 'expires_at': expires_at}, upsert=True)
+
+    def delete(self, sid):
+        self.collection.delete_one({'_id': sid})
+
+
+class RedisSessionStore:
+    def __init__(self, client, prefix='session:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, sid):
+        value = self.client.get(self.prefix + sid)
+        if value is None:
+            return None
+        entry = json.loads(value)
+        return entry['data'], datetime.utcfromtimestamp(entry['expires_at'])
+
+    def set(self, sid, payload, expires_at):
+        seconds = max(int((expires_at - datetime.utcnow()).total_seconds()), 1)
+        # expires_at goes in too, Redis would need a second round trip (TTL) to say
+        value = json.dumps({'data': payload, 'expires_at': (expires_at - datetime(1970, 1, 1)).total_seconds()})
+        self.client.set(self.prefix + sid, value, ex=seconds)
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+
+class CachedSessionStore:
+    """
+    Read-through cache for a shared store: each worker reads a session from
+    Mongo or Redis at most once every `ttl` seconds instead of on every
+    request. Writes go to both. A change made by another worker (a logout,
+    say) is seen here once the cached copy runs out.
+    """
+
+    def __init__(self, store, ttl=5, maxsize=10000):
+        self.store = store
+        self.ttl = timedelta(seconds=ttl)
+        # Holds ((payload, expires_at), cached until)
+        self.cache = MemorySessionStore(maxsize=maxsize)
+
+    def cached(self, sid):
+        entry = self.cache.get(sid)
+        return entry[0] if entry else None
+
+    def remember(self, sid, stored):
+        self.cache.set(sid, stored, min(stored[1], datetime.utcnow() + self.ttl))
+
+    def get(self, sid):
+        stored = self.cached(sid)
+        if stored is None:
+            stored = self.store.get(sid)
+            if stored is not None:
+                self.remember(sid, stored)
+        return stored
+
+    def set(self, sid, payload, expires_at):
+        self.store.set(sid, payload, expires_at)
+        self.remember(sid, (payload, expires_at))
+
+    def delete(self, sid):
+        self.store.delete(sid)
+        self.cache.delete(sid)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.previous_sid = None
+        self.modified = False
+        self.accessed = False
+
+    # Reading the session makes the response depend on the cookie, as in Flask's own session
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+    def regenerate(self):
+        """Keep the data under a new id, dropping the old one."""
+        if self.sid and not self.previous_sid:
+            self.previous_sid = self.sid
+        self.sid = None
+        self.modified = True
+
+
+def rotate_session(session):
+    """New session id at login, so an id planted on the browser beforehand is worthless."""
+    if isinstance(session, ServerSession):
+        session.regenerate()
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = session_json_serializer
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        # Static files never use the session, don't look it up for them
+        if app.static_url_path and request.path.startswith(app.static_url_path + '/'):
+            return self.make_null_session(app)
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            stored = self.store.get(sid)
+            if stored is not None:
+                payload, expires_at = stored
+                try:
+                    return ServerSession(self.serializer.loads(payload), sid, expires_at)
+                except ValueError:
+                    pass
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+
+        if not session:
+            if session.modified and (session.sid or session.previous_sid):
+                if session.sid:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        # Unchanged sessions are only written again once half their lifetime is used up
+        now = datetime.utcnow()
+        lifetime = app.permanent_session_lifetime
+        stale = session.expires_at is None or session.expires_at - now < lifetime / 2
+        if not session.modified and not stale:
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        session.expires_at = now + lifetime
+        self.store.set(session.sid, self.serializer.dumps(dict(session)), session.expires_at)
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
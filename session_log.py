@@ -0,0 +1,243 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from rollups import rollup_updates
+from time_buckets import DAYS, HOURS, bucket_intervals, sum_buckets
+
+EPOCH = date(1970, 1, 1)
+
+# Lets the goal and rollup updates run while the session upsert is in flight
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='session-log')
+
+
+def weekly_increments(intervals):
+    """
+    Turn (subject_id, start_time, duration_seconds) intervals into minutes to
+    add per weekly doc: {(subject_id, week_start): {field: minutes}}.
+    Time is split at every hour, so a session running past midnight or into
+    a new week is credited to the right day and the right weekly doc.
+    """
+    group_of = {}
+    groups = [group_of.setdefault(subject_id, len(group_of)) for subject_id, _, _ in intervals]
+    subject_ids = list(group_of)
+
+    buckets = bucket_intervals([start for _, start, _ in intervals],
+                               [duration for _, _, duration in intervals])
+
+    seconds = {}
+    for group, week_start, weekday, hour, total in sum_buckets(groups, buckets):
+        doc_seconds = seconds.setdefault((subject_ids[group], _epoch_day(week_start)), {})
+        day_key = DAYS[weekday]
+        hour_key = f"productive_hours.{str(hour).zfill(2)}"
+        doc_seconds[day_key] = doc_seconds.get(day_key, 0) + total
+        doc_seconds[hour_key] = doc_seconds.get(hour_key, 0) + total
+
+    return {key: {field: total // 60 for field, total in doc_seconds.items()}
+            for key, doc_seconds in seconds.items()}
+
+
+def weekly_end_times(intervals):
+    """
+    When the last run in each weekly doc ended, {(subject_id, week_start): end},
+    for /history to sort on. A run crossing into a new week ends the old
+    week's doc at midnight.
+    """
+    end_times = {}
+    for subject_id, start_time, duration_seconds in intervals:
+        if duration_seconds <= 0:
+            continue
+        end_time = start_time + timedelta(seconds=duration_seconds)
+        week_start = start_time.date() - timedelta(days=start_time.weekday())
+        while datetime.combine(week_start, datetime.min.time()) < end_time:
+            week_end = datetime.combine(week_start + timedelta(days=7), datetime.min.time())
+            key = (subject_id, week_start.isoformat())
+            week_end_time = min(end_time, week_end)
+            end_times[key] = max(end_times.get(key, week_end_time), week_end_time)
+            week_start += timedelta(days=7)
+    return end_times
+
+
+def _epoch_day(days):
+    return (EPOCH + timedelta(days=days)).isoformat()
+
+
+def _weekly_update(subject_name, inc, end_time=None):
+    # Fields not being incremented are zeroed on insert so every weekly doc
+    # has all seven days and 24 hours
+    set_on_insert = {
+        "subject_name": subject_name,
+        'created_at': datetime.utcnow()
+    }
+    for day in DAYS:
+        if day not in inc:
+            set_on_insert[day] = 0
+    for hour in HOURS:
+        if f"productive_hours.{hour}" not in inc:
+            set_on_insert[f"productive_hours.{hour}"] = 0
+
+    update = {"$inc": inc, "$setOnInsert": set_on_insert}
+    if end_time:
+        update["$max"] = {"end_time": end_time}
+    return update
+
+
+def _active_goal_filter(user_id, subject_id, now):
+    return {
+        'user_id': ObjectId(user_id),
+        'subject_id': subject_id,
+        'goal_type': 'time',
+        'status': 'active',
+        'start_date': {'$lte': now},
+        'end_date': {'$gte': now}
+    }
+
+
+def _write_rollups(rollups_collection, user_id, increments, subject_names):
+    ops = rollup_updates(user_id, increments, subject_names)
+    if ops:
+        rollups_collection.bulk_write(ops, ordered=False)
+
+
+def _weekly_updates(user_id, increments, subject_names, end_times):
+    return [
+        ({"user_id": ObjectId(user_id), "subject_id": subject_id, "week_start": week_start},
+         _weekly_update(subject_names[subject_id], inc, end_times.get((subject_id, week_start))))
+        for (subject_id, week_start), inc in increments.items()
+    ]
+
+
+def _lost_upserts(error, updates):
+    # Only lost upsert races are expected here; replay those as plain updates
+    errors = error.details['writeErrors']
+    if any(err['code'] != 11000 for err in errors):
+        raise error
+    return [UpdateOne(*updates[err['index']]) for err in errors]
+
+
+def _write_weekly_docs(sessions_collection, user_id, increments, subject_names, end_times):
+    updates = _weekly_updates(user_id, increments, subject_names, end_times)
+    if not updates:
+        return
+
+    try:
+        sessions_collection.bulk_write([UpdateOne(f, u, upsert=True) for f, u in updates], ordered=False)
+    except BulkWriteError as e:
+        sessions_collection.bulk_write(_lost_upserts(e, updates), ordered=False)
+
+
+def log_study_session(db, user_id, subject, subject_name, duration_seconds, start_time=None):
+    """Add a finished timer run to the weekly totals and any active time goal."""
+    start_time = start_time or datetime.now()
+    interval = [(subject['_id'], start_time, duration_seconds)]
+    increments = weekly_increments(interval)
+
+    subject_names = {subject['_id']: subject_name}
+
+    goal_update = _executor.submit(
+        db.goals.update_one,
+        _active_goal_filter(user_id, subject['_id'], datetime.utcnow()),
+        {'$inc': {'current_duration_minutes': duration_seconds / 60}}
+    )
+    rollup_update = _executor.submit(_write_rollups, db.study_rollups, user_id, increments, subject_names)
+
+    _write_weekly_docs(db.sessions, user_id, increments, subject_names, weekly_end_times(interval))
+    goal_update.result()
+    rollup_update.result()
+
+    return start_time.strftime("%a").lower()
+
+
+def log_study_sessions(db, user_id, intervals):
+    """
+    Apply many timer runs at once. intervals are (subject_id, subject_name,
+    start_time, duration_seconds) tuples, possibly across subjects and weeks.
+    Runs landing in the same weekly doc are merged first, so this is one
+    bulk write per collection however many intervals there are.
+    """
+    if not intervals:
+        return
+
+    subject_names = {}
+    goal_minutes = {}
+    for subject_id, subject_name, _, duration_seconds in intervals:
+        subject_names.setdefault(subject_id, subject_name)
+        goal_minutes[subject_id] = goal_minutes.get(subject_id, 0) + duration_seconds / 60
+
+    runs = [(subject_id, start_time, duration_seconds)
+            for subject_id, _, start_time, duration_seconds in intervals]
+    increments = weekly_increments(runs)
+    _write_weekly_docs(db.sessions, user_id, increments, subject_names, weekly_end_times(runs))
+    _write_rollups(db.study_rollups, user_id, increments, subject_names)
+
+    now = datetime.utcnow()
+    db.goals.bulk_write([
+        UpdateOne(_active_goal_filter(user_id, subject_id, now),
+                  {'$inc': {'current_duration_minutes': minutes}})
+        for subject_id, minutes in goal_minutes.items()
+    ], ordered=False)
+
+
+def claim_intervals(collection, user_id, interval_ids):
+    """
+    Record client-generated interval ids as logged and return the ones that
+    weren't already, so a run sent twice (a retry, or two tabs sharing the
+    queue) is only counted once.
+    """
+    interval_ids = list(dict.fromkeys(interval_ids))
+    if not interval_ids:
+        return set()
+
+    now = datetime.utcnow()
+    try:
+        collection.insert_many([{'_id': f'{user_id}:{interval_id}', 'user_id': user_id, 'logged_at': now}
+                                for interval_id in interval_ids], ordered=False)
+    except BulkWriteError as e:
+        errors = e.details['writeErrors']
+        if any(err['code'] != 11000 for err in errors):
+            raise
+        return set(interval_ids) - {interval_ids[err['index']] for err in errors}
+    return set(interval_ids)
+
+
+def release_intervals(collection, user_id, interval_ids):
+    """Undo claim_intervals for runs that couldn't be logged."""
+    if interval_ids:
+        collection.delete_many({'_id': {'$in': [f'{user_id}:{interval_id}' for interval_id in interval_ids]}})
+
+
+async def _write_weekly_docs_async(sessions_collection, user_id, increments, subject_names, end_times):
+    updates = _weekly_updates(user_id, increments, subject_names, end_times)
+    if not updates:
+        return
+
+    try:
+        await sessions_collection.bulk_write([UpdateOne(f, u, upsert=True) for f, u in updates], ordered=False)
+    except BulkWriteError as e:
+        await sessions_collection.bulk_write(_lost_upserts(e, updates), ordered=False)
+
+
+async def _write_rollups_async(rollups_collection, user_id, increments, subject_names):
+    ops = rollup_updates(user_id, increments, subject_names)
+    if ops:
+        await rollups_collection.bulk_write(ops, ordered=False)
+
+
+async def log_study_session_async(db, user_id, subject_id, subject_name, duration_seconds, start_time=None):
+    """log_study_session for a Motor database, the three writes go out concurrently."""
+    start_time = start_time or datetime.now()
+    interval = [(subject_id, start_time, duration_seconds)]
+    increments = weekly_increments(interval)
+    subject_names = {subject_id: subject_name}
+
+    await asyncio.gather(
+        _write_weekly_docs_async(db.sessions, user_id, increments, subject_names, weekly_end_times(interval)),
+        db.goals.update_one(_active_goal_filter(user_id, subject_id, datetime.utcnow()),
+                            {'$inc': {'current_duration_minutes': duration_seconds / 60}}),
+        _write_rollups_async(db.study_rollups, user_id, increments, subject_names),
+    )
+    return start_time.strftime("%a").lower()
@@ -1,719 +1,956 @@
-// Dashboard and Todo List JavaScript Functions
-let subjectToDelete = '';
-let todoItems = [];
-let todoIdCounter = 1;
- let subjectIndexToDelete = '';
-
-// ========== DASHBOARD FUNCTIONS ==========
-
-// Subject Management Functions
-function showUpdateForm(index) {
-    document.querySelectorAll('.update-form').forEach(form => form.style.display = 'none');
-    document.getElementById('update-form-' + index).style.display = 'block';
-}
-
-function hideUpdateForm(index) {
-    document.getElementById('update-form-' + index).style.display = 'none';
-}
-
-function updateSubject(index, subject) {
-    const newMarks = document.getElementById('marks-input-' + index).value;
-    const newTime = parseInt(document.getElementById('time-input-' + index).value) || 0; // ✅ ensure integer minutes
-    const newPriority = document.getElementById('priority-input-' + index).value;
-    const newCategory = document.getElementById('category-input-' + index).value;
-
-    const formData = new FormData();
-    formData.append('subject', subject.toLowerCase());
-    formData.append('marks', newMarks);
-    formData.append('time_spent', newTime);  // ✅ now always minutes
-    formData.append('priority', newPriority);
-    formData.append('category', newCategory);
-
-    fetch("{{ url_for('update_subject') }}", { method: 'POST', body: formData })
-    .then(response => {
-        if (response.ok) {
-            const hours = Math.floor(newTime / 60);
-            const minutes = newTime % 60;
-            document.getElementById('marks-display-' + index).textContent = newMarks;
-            document.getElementById('time-display-' + index).textContent = `${hours}h ${minutes}m`; // ✅ fixed template literal
-            document.getElementById('priority' + index).textContent = newPriority;
-            document.getElementById('category' + index).textContent = newCategory;
-            hideUpdateForm(index);
-        } else {
-            alert('Failed to update subject.');
-        }
-    })
-    .catch(err => console.error("Update failed:", err));
-}
-
-
-
-    function confirmDelete(subject, index) {
-        subjectToDelete = subject;
-        subjectIndexToDelete = index;
-        document.getElementById('deleteSubjectName').textContent = subject;
-        document.getElementById('deleteModal').style.display = 'block';
-    }
-
-    function closeDeleteModal() {
-        document.getElementById('deleteModal').style.display = 'none';
-    }
-
-    function deleteSubject() {
-        const formData = new FormData();
-        formData.append('subject', subjectToDelete.toLowerCase());
-
-        fetch("{{ url_for('delete_subject') }}", { method: 'POST', body: formData })
-        .then(response => {
-            if (response.ok) {
-                document.getElementById('subject-item-' + subjectIndexToDelete).remove();
-            } else {
-                alert('Failed to delete subject.');
-            }
-        });
-        closeDeleteModal();
-    }
-
-    // Close modal if user clicks outside of it
-    window.onclick = function(event) {
-        if (event.target == document.getElementById('deleteModal')) {
-            closeDeleteModal();
-        }
-    }
-
-// ========== TODO LIST FUNCTIONS ==========
-
-
-// Todo Sidebar Functions
-let todoOpen = false; // variable to track sidebar state
-
-// Ensure functions are available globally
-window.openTodoSidebar = openTodoSidebar;
-window.closeTodoSidebar = closeTodoSidebar;
-window.addTodoItem = addTodoItem;
-window.handleTodoKeyPress = handleTodoKeyPress;
-
-// Test if script is loaded
-console.log("Todo functions script loaded successfully");
-
-function openTodoSidebar() {
-    const sidebar = document.getElementById('todoSidebar');
-    const overlay = document.getElementById('todoOverlay');
-    const input = document.getElementById('todoInput');
-
-    if (!todoOpen) {
-        // open sidebar
-        sidebar.classList.add('open');
-        overlay.classList.add('active');
-        if (input) input.focus();
-        loadTodoItems();   // load items from server
-        todoOpen = true;
-    } else {
-        // close sidebar
-        sidebar.classList.remove('open');
-        overlay.classList.remove('active');
-        todoOpen = false;
-    }
-}
-
-function closeTodoSidebar(){
-    const sidebar = document.getElementById('todoSidebar');
-    const overlay = document.getElementById('todoOverlay');
-     sidebar.classList.remove('open');
-     overlay.classList.remove('active');
-     todoOpen = false;
-}
-
-
-function loadTodoItems() {
-    console.log("loadTodoItems called");
-
-    fetch("/todo")
-        .then(response => {
-            console.log("Load todos response status:", response.status);
-            return response.json();
-        })
-        .then(data => {
-            console.log("Load todos response data:", data);
-            const todoList = document.getElementById("todoList");
-            todoList.innerHTML = "";
-
-            if (data.todos && data.todos.length > 0) {
-                // Group todos by goal_period
-                const grouped = data.todos.reduce((acc, todo) => {
-                    const period = todo.goal_period || 'no-period';
-                    if (!acc[period]) acc[period] = [];
-                    acc[period].push(todo);
-                    return acc;
-                }, {});
-
-                console.log("Grouped todos:", grouped);
-
-                // Display groups in order: daily, weekly, monthly, no-period
-                const order = ['daily', 'weekly', 'monthly', 'no-period'];
-                order.forEach((period, index) => {
-                    if (grouped[period] && grouped[period].length > 0) {
-                        // Add separator line if not first group
-                        if (index > 0 && todoList.children.length > 0) {
-                            const separator = document.createElement("div");
-                            separator.style.cssText = "height: 1px; background-color: #e0e0e0; margin: 15px 0 10px 0;";
-                            todoList.appendChild(separator);
-                        }
-
-                        // Group header with better styling
-                        const groupHeader = document.createElement("div");
-                        groupHeader.className = "todo-group-header";
-                        groupHeader.style.cssText = `
-                            color: #999;
-                            font-size: 0.75em;
-                            font-style: italic;
-                            font-weight: 500;
-                            text-transform: uppercase;
-                            letter-spacing: 0.5px;
-                            margin-bottom: 8px;
-                            padding-left: 4px;
-                        `;
-
-                        if (period === 'no-period') {
-                            groupHeader.textContent = 'Other Tasks';
-                        } else {
-                            groupHeader.textContent = period.charAt(0).toUpperCase() + period.slice(1) + ' Goals';
-                        }
-                        todoList.appendChild(groupHeader);
-
-                        grouped[period].forEach(todo => {
-                            const todoDiv = document.createElement("div");
-                            todoDiv.className = "todo-item";
-                            todoDiv.setAttribute("data-id", todo._id);
-                            todoDiv.style.cssText = "display: flex; align-items: center; padding: 8px 4px; margin-bottom: 4px;";
-
-                            // checkbox
-                            const checkbox = document.createElement("input");
-                            checkbox.type = "checkbox";
-                            checkbox.className = "todo-checkbox";
-                            checkbox.checked = Boolean(todo.completion_status);
-                            checkbox.style.cssText = "margin-right: 10px; cursor: pointer;";
-                            checkbox.addEventListener('change', function(e) {
-                                e.preventDefault();
-                                console.log("Checkbox changed for todo ID:", todo._id);
-                                markTodoDone(todo._id);
-                            });
-
-                            // text span
-                            const textSpan = document.createElement("span");
-                            textSpan.className = "todo-text";
-                            textSpan.textContent = todo.task;
-                            textSpan.style.cssText = "flex: 1; cursor: pointer;";
-
-                            // Apply strikethrough and opacity based on completion status
-                            if (todo.completion_status) {
-                                textSpan.style.textDecoration = "line-through";
-                                textSpan.style.opacity = "0.6";
-                                textSpan.style.color = "#888";
-                                todoDiv.style.opacity = "0.7";
-                            } else {
-                                textSpan.style.textDecoration = "none";
-                                textSpan.style.opacity = "1";
-                                textSpan.style.color = "inherit";
-                                todoDiv.style.opacity = "1";
-                            }
-
-                            todoDiv.appendChild(checkbox);
-                            todoDiv.appendChild(textSpan);
-                            todoList.appendChild(todoDiv);
-                        });
-                    }
-                });
-            } else {
-                const emptyDiv = document.createElement("div");
-                emptyDiv.className = "todo-empty";
-                emptyDiv.textContent = "No tasks yet. Add one above!";
-                todoList.appendChild(emptyDiv);
-            }
-        })
-        .catch(err => {
-            console.error("Error loading todos:", err);
-            const todoList = document.getElementById("todoList");
-            todoList.innerHTML = '<div class="todo-empty">Error loading todos. Check console.</div>';
-        });
-}
-
-
-function addTodoItem() {
-    console.log("addTodoItem called");
-
-    const taskInput = document.getElementById("todoInput");
-    const goalPeriodSelect = document.getElementById("todoGoalPeriod");
-
-    if (!taskInput) {
-        console.error("todoInput element not found");
-        alert("Error: Task input not found");
-        return;
-    }
-
-    if (!goalPeriodSelect) {
-        console.error("todoGoalPeriod element not found");
-        alert("Error: Goal period dropdown not found");
-        return;
-    }
-
-    const task = taskInput.value;
-    const goal_period = goalPeriodSelect.value;
-
-    console.log("Task:", task, "Goal period:", goal_period);
-
-    if (!task || !task.trim()) {
-        alert("Task cannot be empty");
-        return;
-    }
-
-    if (!goal_period) {
-        alert("Please select a goal period");
-        return;
-    }
-
-    console.log("Sending request to /todo/add");
-
-    fetch("/todo/add", {
-        method: "POST",
-        headers: {"Content-Type": "application/json"},
-        body: JSON.stringify({
-            task: task.trim(),
-            goal_period: goal_period
-        })
-    })
-    .then(res => {
-        console.log("Response status:", res.status);
-        if (!res.ok) {
-            throw new Error(`HTTP error! status: ${res.status}`);
-        }
-        return res.json();
-    })
-    .then(data => {
-        console.log("Response data:", data);
-        if (data.success) {
-            taskInput.value = "";
-            goalPeriodSelect.value = "";
-            console.log("Task added successfully, reloading list");
-            loadTodoItems();
-        } else {
-            alert("Failed to add task: " + (data.error || "Unknown error"));
-        }
-    })
-    .catch(error => {
-        console.error("Fetch error:", error);
-        alert("Error adding task: " + error.message);
-    });
-}
-
-// Function to check for deadline warnings
-function checkDeadlineWarnings() {
-    fetch("/todo/check-deadlines", {
-        method: "GET",
-        headers: {"Content-Type": "application/json"}
-    })
-    .then(res => res.json())
-    .then(data => {
-        if (data.expiredTasks && data.expiredTasks.length > 0) {
-            const taskNames = data.expiredTasks.map(task => `• ${task.task}`).join('\n');
-            const confirmed = confirm(`⚠️ WARNING: These tasks have reached their deadline and will be deleted:\n\n${taskNames}\n\nPress OK to acknowledge and delete these tasks.`);
-
-            if (confirmed) {
-                // Refresh the todo list to show updated data
-                loadTodoItems();
-            }
-        }
-    })
-    .catch(error => {
-        console.error("Error checking deadlines:", error);
-    });
-}
-
-function openTodoSidebar() {
-    const sidebar = document.getElementById('todoSidebar');
-    const overlay = document.getElementById('todoOverlay');
-    const input = document.getElementById('todoInput');
-
-    if (!todoOpen) {
-        sidebar.classList.add('open');
-        overlay.classList.add('active');
-        if (input) input.focus();
-        loadTodoItems();
-        checkDeadlineWarnings(); // Check for expired tasks
-        todoOpen = true;
-    } else {
-        sidebar.classList.remove('open');
-        overlay.classList.remove('active');
-        todoOpen = false;
-    }
-}
-
-// delete todo
-function markTodoDone(id) {
-    console.log("markTodoDone called with ID:", id); // Debug log
-
-    // Find the checkbox to prevent visual flicker
-    const todoItem = document.querySelector(`[data-id="${id}"]`);
-    const checkbox = todoItem ? todoItem.querySelector('.todo-checkbox') : null;
-
-    fetch("/todo/done", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ id: id })
-    })
-    .then(res => {
-        console.log("Mark done response status:", res.status); // Debug log
-        return res.json();
-    })
-    .then(data => {
-        console.log("Mark done response data:", data); // Debug log
-        if (data.success) {
-            // Immediately reload to get the updated state from server
-            loadTodoItems();
-        } else {
-            console.error("Failed to mark todo done:", data.error);
-            // Revert checkbox if there was an error
-            if (checkbox) {
-                checkbox.checked = !checkbox.checked;
-            }
-        }
-    })
-    .catch(err => {
-        console.error("Error marking todo done:", err);
-        // Revert checkbox if there was an error
-        if (checkbox) {
-            checkbox.checked = !checkbox.checked;
-        }
-    });
-}
-async function loadCharts() {
-    try {
-        // Fetch stats from the backend
-        const response = await fetch('/todo_stats');
-        const stats = await response.json();
-
-        if (!response.ok) {
-            console.error('Failed to fetch stats:', stats.error);
-            return;
-        }
-
-        const ctx = document.getElementById('goalChart').getContext('2d');
-
-        new Chart(ctx, {
-            type: 'doughnut',
-            data: {
-                datasets: [
-                    {
-                        label: 'Daily Goals',
-                        data: [stats.daily.completed, Math.max(0, stats.daily.total - stats.daily.completed)],
-                        backgroundColor: ['#6A994E', '#D9D9D9'],
-                        borderColor: ['#5A8A3E', '#C9C9C9'],
-                        borderWidth: 2,
-                        circumference: 360,
-                        cutout: '70%'   // innermost ring
-                    },
-                    {
-                        label: 'Weekly Goals',
-                        data: [stats.weekly.completed, Math.max(0, stats.weekly.total - stats.weekly.completed)],
-                        backgroundColor: ['#F2B705', '#ECECEC'],
-                        borderColor: ['#E2A705', '#DCDCDC'],
-                        borderWidth: 2,
-                        circumference: 360,
-                        cutout: '55%'   // middle ring
-                    },
-                    {
-                        label: 'Monthly Goals',
-                        data: [stats.monthly.completed, Math.max(0, stats.monthly.total - stats.monthly.completed)],
-                        backgroundColor: ['#3A86FF', '#E5E5E5'],
-                        borderColor: ['#2A76EF', '#D5D5D5'],
-                        borderWidth: 2,
-                        circumference: 360,
-                        cutout: '40%'   // outermost ring
-                    }
-                ]
-            },
-            options: {
-                responsive: true,
-                maintainAspectRatio: true,
-                plugins: {
-                    legend: {
-                        position: 'bottom',
-                        labels: {
-                            usePointStyle: true,
-                            pointStyle: 'circle',
-                            color: '#F5F3F0',
-                            font: {
-                                size: 12,
-                                weight: '600'
-                            },
-                            padding: 15
-                        }
-                    },
-                    tooltip: {
-                        callbacks: {
-                            label: function(context) {
-                                const dataset = context.dataset;
-                                const total = dataset.data[0] + dataset.data[1];
-                                const current = context.parsed;
-                                const percentage = total > 0 ? Math.round((current / total) * 100) : 0;
-
-                                if (context.dataIndex === 0) {
-                                    return `${dataset.label}: ${current}/${total} (${percentage}%)`;
-                                }
-                                return null; // Don't show tooltip for incomplete portion
-                            }
-                        },
-                        backgroundColor: 'rgba(62, 63, 41, 0.9)',
-                        titleColor: '#F5F3F0',
-                        bodyColor: '#BCA88D',
-                        borderColor: '#BCA88D',
-                        borderWidth: 1
-                    }
-                },
-                animation: {
-                    animateRotate: true,
-                    animateScale: true,
-                    duration: 1000
-                }
-            }
-        });
-
-        // Display stats summary
-        displayStatsSummary(stats);
-
-    } catch (error) {
-        console.error('Error loading charts:', error);
-    }
-}
-
-function displayStatsSummary(stats) {
-    const summaryContainer = document.getElementById('stats-summary');
-    if (!summaryContainer) return;
-
-    const totalGoals = stats.daily.total + stats.weekly.total + stats.monthly.total;
-    const totalCompleted = stats.daily.completed + stats.weekly.completed + stats.monthly.completed;
-    const overallPercentage = totalGoals > 0 ? Math.round((totalCompleted / totalGoals) * 100) : 0;
-
-    summaryContainer.innerHTML = `
-        <div class="stats-grid">
-            <div class="stat-item">
-                <span class="stat-number">${stats.daily.completed}/${stats.daily.total}</span>
-                <span class="stat-label">Daily</span>
-            </div>
-            <div class="stat-item">
-                <span class="stat-number">${stats.weekly.completed}/${stats.weekly.total}</span>
-                <span class="stat-label">Weekly</span>
-            </div>
-            <div class="stat-item">
-                <span class="stat-number">${stats.monthly.completed}/${stats.monthly.total}</span>
-                <span class="stat-label">Monthly</span>
-            </div>
-            <div class="stat-item overall">
-                <span class="stat-number">${overallPercentage}%</span>
-                <span class="stat-label">Overall</span>
-            </div>
-        </div>
-    `;
-}
-
-// Load charts when DOM is ready
-document.addEventListener("DOMContentLoaded", loadCharts);
-
-// Reload charts when todo sidebar closes to update stats
-function closeTodoSidebar(){
-    const sidebar = document.getElementById('todoSidebar');
-    const overlay = document.getElementById('todoOverlay');
-    sidebar.classList.remove('open');
-    overlay.classList.remove('active');
-    todoOpen = false;
-
-    // Reload charts to update progress
-    loadCharts();
-}
-// allow Enter key to add
-function handleTodoKeyPress(event) {
-    if (event.key === "Enter") {
-        addTodoItem();
-    }
-}
-
-// Test function - you can call this in console to test if functions work
-window.testTodoFunctions = function() {
-    console.log("Testing todo functions...");
-
-    // Test if elements exist
-    const elements = {
-        todoInput: document.getElementById("todoInput"),
-        todoGoalPeriod: document.getElementById("todoGoalPeriod"),
-        todoAddBtn: document.getElementById("todoAddBtn"),
-        todoList: document.getElementById("todoList")
-    };
-
-    console.log("Elements found:", elements);
-
-    // Test if functions exist
-    const functions = {
-        addTodoItem: typeof window.addTodoItem,
-        loadTodoItems: typeof loadTodoItems,
-        markTodoDone: typeof markTodoDone
-    };
-
-    console.log("Function types:", functions);
-
-    return { elements, functions };
-};
-// Test function - you can call this in console to test if functions work
-window.testTodoFunctions = function() {
-    console.log("Testing todo functions...");
-
-    // Test if elements exist
-    const elements = {
-        todoInput: document.getElementById("todoInput"),
-        todoGoalPeriod: document.getElementById("todoGoalPeriod"),
-        todoAddBtn: document.getElementById("todoAddBtn"),
-        todoList: document.getElementById("todoList")
-    };
-
-    console.log("Elements found:", elements);
-
-    // Test if functions exist
-    const functions = {
-        addTodoItem: typeof window.addTodoItem,
-        loadTodoItems: typeof loadTodoItems,
-        markTodoDone: typeof markTodoDone
-    };
-
-    console.log("Function types:", functions);
-
-    return { elements, functions };
-};
-
-
-// ========== UTILITY FUNCTIONS ==========
-
-// Escape HTML to prevent XSS
-function escapeHtml(unsafe) {
-    return unsafe
-         .replace(/&/g, "&amp;")
-         .replace(/</g, "&lt;")
-         .replace(/>/g, "&gt;")
-         .replace(/"/g, "&quot;")
-         .replace(/'/g, "&#039;");
-}
-
-// Format time for display
-function formatTime(minutes) {
-    if (minutes >= 60) {
-        const hours = Math.floor(minutes / 60);
-        const remainingMinutes = minutes % 60;
-        return hours + 'h ' + remainingMinutes + 'm';
-    }
-    return minutes + 'm';
-}
-
-// ========== EVENT LISTENERS ==========
-
-// Close modal when clicking outside
-window.onclick = function(event) {
-    const modal = document.getElementById('deleteModal');
-    if (event.target === modal) {
-        closeDeleteModal();
-    }
-}
-//Calender
-let calendar;
-let calendarInitialized = false;
-
-// Calendar Functions
-function toggleCalendar() {
-    const popup = document.getElementById("calendar");
-    const overlay = document.getElementById("calendarOverlay");
-
-    if (popup.classList.contains("calendar-open")) {
-        closeCalendar();
-    } else {
-        popup.classList.add("calendar-open");
-        if (overlay) overlay.classList.add("calendar-active");
-
-        if (!calendarInitialized) {
-            initializeCalendar();
-        }
-    }
-}
-
-function closeCalendar() {
-    const popup = document.getElementById("calendar");
-    const overlay = document.getElementById("calendarOverlay");
-
-    popup.classList.remove("calendar-open");
-    if (overlay) overlay.classList.remove("calendar-active");
-}
-
-// Initialize Simple Calendar
-function initializeCalendar() {
-    const calendarEl = document.getElementById("calendarContent");
-
-    calendar = new FullCalendar.Calendar(calendarEl, {
-        initialView: 'dayGridMonth',
-        height: 'auto',
-        selectable: true,
-        headerToolbar: {
-            left: 'prev,next',
-            center: 'title',
-            right: 'today'
-        },
-        events: "/reminders",
-        dateClick: function(info) {
-            // Only allow adding reminders for today or future dates
-            const today = new Date();
-            const selectedDate = new Date(info.dateStr);
-
-            if (selectedDate >= today.setHours(0,0,0,0)) {
-                const title = prompt("Enter reminder:");
-                if (title && title.trim()) {
-                    addReminder(title.trim(), info.dateStr);
-                }
-            } else {
-                alert("Cannot add reminders for past dates!");
-            }
-        }
-    });
-
-    calendar.render();
-    calendarInitialized = true;
-}
-
-// Add new reminder
-function addReminder(title, date) {
-    fetch("/reminders", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ title: title, date: date })
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            calendar.refetchEvents();
-            alert("Reminder added successfully!");
-        } else {
-            alert("Failed to add reminder");
-        }
-    })
-    .catch(error => {
-        console.error('Error:', error);
-        alert("Network error occurred");
-    });
-}
-
-// Close calendar when clicking overlay
-window.addEventListener('click', function(event) {
-    const calendarOverlay = document.getElementById('calendarOverlay');
-    if (event.target === calendarOverlay) {
-        closeCalendar();
-    }
-});
-// Initialize on page load
-document.addEventListener('DOMContentLoaded', function() {
-    console.log('Dashboard loaded successfully');
-    loadTodoItems();
-});
\ No newline at end of file
+// Dashboard and Todo List JavaScript Functions
+let subjectToDelete = '';
+let todoItems = [];
+let todoIdCounter = 1;
+ let subjectIndexToDelete = '';
+
+// ========== DASHBOARD FUNCTIONS ==========
+
+// Subject Management Functions
+function showUpdateForm(index) {
+    document.querySelectorAll('.update-form').forEach(form => form.style.display = 'none');
+    document.getElementById('update-form-' + index).style.display = 'block';
+}
+
+function hideUpdateForm(index) {
+    document.getElementById('update-form-' + index).style.display = 'none';
+}
+
+function updateSubject(index, subject) {
+    const newMarks = document.getElementById('marks-input-' + index).value;
+    const newTime = parseInt(document.getElementById('time-input-' + index).value) || 0; // ✅ ensure integer minutes
+    const newPriority = document.getElementById('priority-input-' + index).value;
+    const newCategory = document.getElementById('category-input-' + index).value;
+
+    const formData = new FormData();
+    formData.append('subject', subject.toLowerCase());
+    formData.append('marks', newMarks);
+    formData.append('time_spent', newTime);  // ✅ now always minutes
+    formData.append('priority', newPriority);
+    formData.append('category', newCategory);
+
+    fetch("{{ url_for('update_subject') }}", { method: 'POST', body: formData })
+    .then(response => {
+        if (response.ok) {
+            const hours = Math.floor(newTime / 60);
+            const minutes = newTime % 60;
+            document.getElementById('marks-display-' + index).textContent = newMarks;
+            document.getElementById('time-display-' + index).textContent = `${hours}h ${minutes}m`; // ✅ fixed template literal
+            document.getElementById('priority' + index).textContent = newPriority;
+            document.getElementById('category' + index).textContent = newCategory;
+            hideUpdateForm(index);
+        } else {
+            alert('Failed to update subject.');
+        }
+    })
+    .catch(err => console.error("Update failed:", err));
+}
+
+
+
+    function confirmDelete(subject, index) {
+        subjectToDelete = subject;
+        subjectIndexToDelete = index;
+        document.getElementById('deleteSubjectName').textContent = subject;
+        document.getElementById('deleteModal').style.display = 'block';
+    }
+
+    function closeDeleteModal() {
+        document.getElementById('deleteModal').style.display = 'none';
+    }
+
+    function deleteSubject() {
+        const formData = new FormData();
+        formData.append('subject', subjectToDelete.toLowerCase());
+
+        fetch("{{ url_for('delete_subject') }}", { method: 'POST', body: formData })
+        .then(response => {
+            if (response.ok) {
+                document.getElementById('subject-item-' + subjectIndexToDelete).remove();
+            } else {
+                alert('Failed to delete subject.');
+            }
+        });
+        closeDeleteModal();
+    }
+
+    // Close modal if user clicks outside of it
+    window.onclick = function(event) {
+        if (event.target == document.getElementById('deleteModal')) {
+            closeDeleteModal();
+        }
+    }
+
+// ========== TODO LIST FUNCTIONS ==========
+
+
+// Todo Sidebar Functions
+let todoOpen = false; // variable to track sidebar state
+
+// Ensure functions are available globally
+window.openTodoSidebar = openTodoSidebar;
+window.closeTodoSidebar = closeTodoSidebar;
+window.addTodoItem = addTodoItem;
+window.handleTodoKeyPress = handleTodoKeyPress;
+
+// Test if script is loaded
+console.log("Todo functions script loaded successfully");
+
+function openTodoSidebar() {
+    const sidebar = document.getElementById('todoSidebar');
+    const overlay = document.getElementById('todoOverlay');
+    const input = document.getElementById('todoInput');
+
+    if (!todoOpen) {
+        // open sidebar
+        sidebar.classList.add('open');
+        overlay.classList.add('active');
+        if (input) input.focus();
+        loadTodoItems();   // load items from server
+        todoOpen = true;
+    } else {
+        // close sidebar
+        sidebar.classList.remove('open');
+        overlay.classList.remove('active');
+        todoOpen = false;
+    }
+}
+
+function closeTodoSidebar(){
+    const sidebar = document.getElementById('todoSidebar');
+    const overlay = document.getElementById('todoOverlay');
+     sidebar.classList.remove('open');
+     overlay.classList.remove('active');
+     todoOpen = false;
+}
+
+
+// /todo is paginated, follow next_cursor until every page is in
+async function fetchAllTodos() {
+    let todos = [];
+    let cursor = null;
+    do {
+        const response = await fetch("/todo" + (cursor ? "?cursor=" + encodeURIComponent(cursor) : ""));
+        console.log("Load todos response status:", response.status);
+        const page = await response.json();
+        todos = todos.concat(page.todos || []);
+        cursor = page.next_cursor;
+    } while (cursor);
+    return { todos: todos };
+}
+
+function loadTodoItems() {
+    console.log("loadTodoItems called");
+
+    fetchAllTodos()
+        .then(data => {
+            console.log("Load todos response data:", data);
+            renderTodos(data.todos);
+        })
+        .catch(err => {
+            console.error("Error loading todos:", err);
+            const todoList = document.getElementById("todoList");
+            todoList.innerHTML = '<div class="todo-empty">Error loading todos. Check console.</div>';
+        });
+}
+
+function renderTodos(todos) {
+    const todoList = document.getElementById("todoList");
+    todoList.innerHTML = "";
+
+    if (todos && todos.length > 0) {
+        // Group todos by goal_period
+        const grouped = todos.reduce((acc, todo) => {
+            const period = todo.goal_period || 'no-period';
+            if (!acc[period]) acc[period] = [];
+            acc[period].push(todo);
+            return acc;
+        }, {});
+
+        console.log("Grouped todos:", grouped);
+
+        // Display groups in order: daily, weekly, monthly, no-period
+        const order = ['daily', 'weekly', 'monthly', 'no-period'];
+        order.forEach((period, index) => {
+            if (grouped[period] && grouped[period].length > 0) {
+                // Add separator line if not first group
+                if (index > 0 && todoList.children.length > 0) {
+                    const separator = document.createElement("div");
+                    separator.style.cssText = "height: 1px; background-color: #e0e0e0; margin: 15px 0 10px 0;";
+                    todoList.appendChild(separator);
+                }
+
+                // Group header with better styling
+                const groupHeader = document.createElement("div");
+                groupHeader.className = "todo-group-header";
+                groupHeader.style.cssText = `
+                    color: #999;
+                    font-size: 0.75em;
+                    font-style: italic;
+                    font-weight: 500;
+                    text-transform: uppercase;
+                    letter-spacing: 0.5px;
+                    margin-bottom: 8px;
+                    padding-left: 4px;
+                `;
+
+                if (period === 'no-period') {
+                    groupHeader.textContent = 'Other Tasks';
+                } else {
+                    groupHeader.textContent = period.charAt(0).toUpperCase() + period.slice(1) + ' Goals';
+                }
+                todoList.appendChild(groupHeader);
+
+                grouped[period].forEach(todo => {
+                    const todoDiv = document.createElement("div");
+                    todoDiv.className = "todo-item";
+                    todoDiv.setAttribute("data-id", todo._id);
+                    todoDiv.style.cssText = "display: flex; align-items: center; padding: 8px 4px; margin-bottom: 4px;";
+
+                    // checkbox
+                    const checkbox = document.createElement("input");
+                    checkbox.type = "checkbox";
+                    checkbox.className = "todo-checkbox";
+                    checkbox.checked = Boolean(todo.completion_status);
+                    checkbox.style.cssText = "margin-right: 10px; cursor: pointer;";
+                    checkbox.addEventListener('change', function(e) {
+                        e.preventDefault();
+                        console.log("Checkbox changed for todo ID:", todo._id);
+                        markTodoDone(todo._id);
+                    });
+
+                    // text span
+                    const textSpan = document.createElement("span");
+                    textSpan.className = "todo-text";
+                    textSpan.textContent = todo.task;
+                    textSpan.style.cssText = "flex: 1; cursor: pointer;";
+
+                    // Apply strikethrough and opacity based on completion status
+                    if (todo.completion_status) {
+                        textSpan.style.textDecoration = "line-through";
+                        textSpan.style.opacity = "0.6";
+                        textSpan.style.color = "#888";
+                        todoDiv.style.opacity = "0.7";
+                    } else {
+                        textSpan.style.textDecoration = "none";
+                        textSpan.style.opacity = "1";
+                        textSpan.style.color = "inherit";
+                        todoDiv.style.opacity = "1";
+                    }
+
+                    todoDiv.appendChild(checkbox);
+                    todoDiv.appendChild(textSpan);
+                    todoList.appendChild(todoDiv);
+                });
+            }
+        });
+    } else {
+        const emptyDiv = document.createElement("div");
+        emptyDiv.className = "todo-empty";
+        emptyDiv.textContent = "No tasks yet. Add one above!";
+        todoList.appendChild(emptyDiv);
+    }
+}
+
+
+function addTodoItem() {
+    console.log("addTodoItem called");
+
+    const taskInput = document.getElementById("todoInput");
+    const goalPeriodSelect = document.getElementById("todoGoalPeriod");
+
+    if (!taskInput) {
+        console.error("todoInput element not found");
+        alert("Error: Task input not found");
+        return;
+    }
+
+    if (!goalPeriodSelect) {
+        console.error("todoGoalPeriod element not found");
+        alert("Error: Goal period dropdown not found");
+        return;
+    }
+
+    const task = taskInput.value;
+    const goal_period = goalPeriodSelect.value;
+
+    console.log("Task:", task, "Goal period:", goal_period);
+
+    if (!task || !task.trim()) {
+        alert("Task cannot be empty");
+        return;
+    }
+
+    if (!goal_period) {
+        alert("Please select a goal period");
+        return;
+    }
+
+    console.log("Sending request to /todo/add");
+
+    fetch("/todo/add", {
+        method: "POST",
+        headers: {"Content-Type": "application/json"},
+        body: JSON.stringify({
+            task: task.trim(),
+            goal_period: goal_period
+        })
+    })
+    .then(res => {
+        console.log("Response status:", res.status);
+        if (!res.ok) {
+            throw new Error(`HTTP error! status: ${res.status}`);
+        }
+        return res.json();
+    })
+    .then(data => {
+        console.log("Response data:", data);
+        if (data.success) {
+            taskInput.value = "";
+            goalPeriodSelect.value = "";
+            // With a live stream open the new task arrives as a 'todo' event
+            if (!liveUpdates) loadTodoItems();
+        } else {
+            alert("Failed to add task: " + (data.error || "Unknown error"));
+        }
+    })
+    .catch(error => {
+        console.error("Fetch error:", error);
+        alert("Error adding task: " + error.message);
+    });
+}
+
+// Function to check for deadline warnings
+function checkDeadlineWarnings() {
+    // The live stream's snapshot already has them
+    if (liveUpdates) {
+        showDeadlineWarning(expiredTasks);
+        return;
+    }
+    fetch("/todo/check-deadlines", {
+        method: "GET",
+        headers: {"Content-Type": "application/json"}
+    })
+    .then(res => res.json())
+    .then(data => showDeadlineWarning(data.expiredTasks))
+    .catch(error => {
+        console.error("Error checking deadlines:", error);
+    });
+}
+
+function showDeadlineWarning(tasks) {
+    if (tasks && tasks.length > 0) {
+        const taskNames = tasks.map(task => `• ${task.task}`).join('\n');
+        const confirmed = confirm(`⚠️ WARNING: These tasks have reached their deadline and will be deleted:\n\n${taskNames}\n\nPress OK to acknowledge and delete these tasks.`);
+
+        if (confirmed && !liveUpdates) {
+            // Refresh the todo list to show updated data
+            loadTodoItems();
+        }
+    }
+}
+
+function openTodoSidebar() {
+    const sidebar = document.getElementById('todoSidebar');
+    const overlay = document.getElementById('todoOverlay');
+    const input = document.getElementById('todoInput');
+
+    if (!todoOpen) {
+        sidebar.classList.add('open');
+        overlay.classList.add('active');
+        if (input) input.focus();
+        if (!liveUpdates) loadTodoItems();
+        checkDeadlineWarnings(); // Check for expired tasks
+        todoOpen = true;
+    } else {
+        sidebar.classList.remove('open');
+        overlay.classList.remove('active');
+        todoOpen = false;
+    }
+}
+
+// delete todo
+function markTodoDone(id) {
+    console.log("markTodoDone called with ID:", id); // Debug log
+
+    // Find the checkbox to prevent visual flicker
+    const todoItem = document.querySelector(`[data-id="${id}"]`);
+    const checkbox = todoItem ? todoItem.querySelector('.todo-checkbox') : null;
+
+    fetch("/todo/done", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ id: id })
+    })
+    .then(res => {
+        console.log("Mark done response status:", res.status); // Debug log
+        return res.json();
+    })
+    .then(data => {
+        console.log("Mark done response data:", data); // Debug log
+        if (data.success) {
+            // Immediately reload to get the updated state from server,
+            // unless the live stream is about to send it
+            if (!liveUpdates) loadTodoItems();
+        } else {
+            console.error("Failed to mark todo done:", data.error);
+            // Revert checkbox if there was an error
+            if (checkbox) {
+                checkbox.checked = !checkbox.checked;
+            }
+        }
+    })
+    .catch(err => {
+        console.error("Error marking todo done:", err);
+        // Revert checkbox if there was an error
+        if (checkbox) {
+            checkbox.checked = !checkbox.checked;
+        }
+    });
+}
+async function loadCharts() {
+    try {
+        // Fetch stats from the backend
+        const response = await fetch('/todo_stats');
+        const stats = await response.json();
+
+        if (!response.ok) {
+            console.error('Failed to fetch stats:', stats.error);
+            return;
+        }
+
+        renderStats(stats);
+
+    } catch (error) {
+        console.error('Error loading charts:', error);
+    }
+}
+
+let goalChart = null;
+
+// [completed, still to do] for one ring
+function goalRingData(period) {
+    return [period.completed, Math.max(0, period.total - period.completed)];
+}
+
+function renderStats(stats) {
+    const canvas = document.getElementById('goalChart');
+    if (!canvas) return;
+
+    // Later updates (from the live stream) redraw the existing chart
+    if (goalChart) {
+        [stats.daily, stats.weekly, stats.monthly].forEach((period, i) => {
+            goalChart.data.datasets[i].data = goalRingData(period);
+        });
+        goalChart.update();
+        displayStatsSummary(stats);
+        return;
+    }
+
+    const ctx = canvas.getContext('2d');
+
+    goalChart = new Chart(ctx, {
+        type: 'doughnut',
+        data: {
+            datasets: [
+                {
+                    label: 'Daily Goals',
+                    data: goalRingData(stats.daily),
+                    backgroundColor: ['#6A994E', '#D9D9D9'],
+                    borderColor: ['#5A8A3E', '#C9C9C9'],
+                    borderWidth: 2,
+                    circumference: 360,
+                    cutout: '70%'   // innermost ring
+                },
+                {
+                    label: 'Weekly Goals',
+                    data: goalRingData(stats.weekly),
+                    backgroundColor: ['#F2B705', '#ECECEC'],
+                    borderColor: ['#E2A705', '#DCDCDC'],
+                    borderWidth: 2,
+                    circumference: 360,
+                    cutout: '55%'   // middle ring
+                },
+                {
+                    label: 'Monthly Goals',
+                    data: goalRingData(stats.monthly),
+                    backgroundColor: ['#3A86FF', '#E5E5E5'],
+                    borderColor: ['#2A76EF', '#D5D5D5'],
+                    borderWidth: 2,
+                    circumference: 360,
+                    cutout: '40%'   // outermost ring
+                }
+            ]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: true,
+            plugins: {
+                legend: {
+                    position: 'bottom',
+                    labels: {
+                        usePointStyle: true,
+                        pointStyle: 'circle',
+                        color: '#F5F3F0',
+                        font: {
+                            size: 12,
+                            weight: '600'
+                        },
+                        padding: 15
+                    }
+                },
+                tooltip: {
+                    callbacks: {
+                        label: function(context) {
+                            const dataset = context.dataset;
+                            const total = dataset.data[0] + dataset.data[1];
+                            const current = context.parsed;
+                            const percentage = total > 0 ? Math.round((current / total) * 100) : 0;
+
+                            if (context.dataIndex === 0) {
+                                return `${dataset.label}: ${current}/${total} (${percentage}%)`;
+                            }
+                            return null; // Don't show tooltip for incomplete portion
+                        }
+                    },
+                    backgroundColor: 'rgba(62, 63, 41, 0.9)',
+                    titleColor: '#F5F3F0',
+                    bodyColor: '#BCA88D',
+                    borderColor: '#BCA88D',
+                    borderWidth: 1
+                }
+            },
+            animation: {
+                animateRotate: true,
+                animateScale: true,
+                duration: 1000
+            }
+        }
+    });
+
+    // Display stats summary
+    displayStatsSummary(stats);
+}
+
+function displayStatsSummary(stats) {
+    const summaryContainer = document.getElementById('stats-summary');
+    if (!summaryContainer) return;
+
+    const totalGoals = stats.daily.total + stats.weekly.total + stats.monthly.total;
+    const totalCompleted = stats.daily.completed + stats.weekly.completed + stats.monthly.completed;
+    const overallPercentage = totalGoals > 0 ? Math.round((totalCompleted / totalGoals) * 100) : 0;
+
+    summaryContainer.innerHTML = `
+        <div class="stats-grid">
+            <div class="stat-item">
+                <span class="stat-number">${stats.daily.completed}/${stats.daily.total}</span>
+                <span class="stat-label">Daily</span>
+            </div>
+            <div class="stat-item">
+                <span class="stat-number">${stats.weekly.completed}/${stats.weekly.total}</span>
+                <span class="stat-label">Weekly</span>
+            </div>
+            <div class="stat-item">
+                <span class="stat-number">${stats.monthly.completed}/${stats.monthly.total}</span>
+                <span class="stat-label">Monthly</span>
+            </div>
+            <div class="stat-item overall">
+                <span class="stat-number">${overallPercentage}%</span>
+                <span class="stat-label">Overall</span>
+            </div>
+        </div>
+    `;
+}
+
+
+// Reload charts when todo sidebar closes to update stats
+function closeTodoSidebar(){
+    const sidebar = document.getElementById('todoSidebar');
+    const overlay = document.getElementById('todoOverlay');
+    sidebar.classList.remove('open');
+    overlay.classList.remove('active');
+    todoOpen = false;
+
+    // Reload charts to update progress, the live stream already pushes them
+    if (!liveUpdates) loadCharts();
+}
+// allow Enter key to add
+function handleTodoKeyPress(event) {
+    if (event.key === "Enter") {
+        addTodoItem();
+    }
+}
+
+// Test function - you can call this in console to test if functions work
+window.testTodoFunctions = function() {
+    console.log("Testing todo functions...");
+
+    // Test if elements exist
+    const elements = {
+        todoInput: document.getElementById("todoInput"),
+        todoGoalPeriod: document.getElementById("todoGoalPeriod"),
+        todoAddBtn: document.getElementById("todoAddBtn"),
+        todoList: document.getElementById("todoList")
+    };
+
+    console.log("Elements found:", elements);
+
+    // Test if functions exist
+    const functions = {
+        addTodoItem: typeof window.addTodoItem,
+        loadTodoItems: typeof loadTodoItems,
+        markTodoDone: typeof markTodoDone
+    };
+
+    console.log("Function types:", functions);
+
+    return { elements, functions };
+};
+// Test function - you can call this in console to test if functions work
+window.testTodoFunctions = function() {
+    console.log("Testing todo functions...");
+
+    // Test if elements exist
+    const elements = {
+        todoInput: document.getElementById("todoInput"),
+        todoGoalPeriod: document.getElementById("todoGoalPeriod"),
+        todoAddBtn: document.getElementById("todoAddBtn"),
+        todoList: document.getElementById("todoList")
+    };
+
+    console.log("Elements found:", elements);
+
+    // Test if functions exist
+    const functions = {
+        addTodoItem: typeof window.addTodoItem,
+        loadTodoItems: typeof loadTodoItems,
+        markTodoDone: typeof markTodoDone
+    };
+
+    console.log("Function types:", functions);
+
+    return { elements, functions };
+};
+
+
+// ========== UTILITY FUNCTIONS ==========
+
+// Escape HTML to prevent XSS
+function escapeHtml(unsafe) {
+    return unsafe
+         .replace(/&/g, "&amp;")
+         .replace(/</g, "&lt;")
+         .replace(/>/g, "&gt;")
+         .replace(/"/g, "&quot;")
+         .replace(/'/g, "&#039;");
+}
+
+// Format time for display
+function formatTime(minutes) {
+    if (minutes >= 60) {
+        const hours = Math.floor(minutes / 60);
+        const remainingMinutes = minutes % 60;
+        return hours + 'h ' + remainingMinutes + 'm';
+    }
+    return minutes + 'm';
+}
+
+// ========== EVENT LISTENERS ==========
+
+// Close modal when clicking outside
+window.onclick = function(event) {
+    const modal = document.getElementById('deleteModal');
+    if (event.target === modal) {
+        closeDeleteModal();
+    }
+}
+//Calender
+let calendar;
+let calendarInitialized = false;
+
+// Calendar Functions
+function toggleCalendar() {
+    const popup = document.getElementById("calendar");
+    const overlay = document.getElementById("calendarOverlay");
+
+    if (popup.classList.contains("calendar-open")) {
+        closeCalendar();
+    } else {
+        popup.classList.add("calendar-open");
+        if (overlay) overlay.classList.add("calendar-active");
+
+        if (!calendarInitialized) {
+            initializeCalendar();
+        }
+    }
+}
+
+function closeCalendar() {
+    const popup = document.getElementById("calendar");
+    const overlay = document.getElementById("calendarOverlay");
+
+    popup.classList.remove("calendar-open");
+    if (overlay) overlay.classList.remove("calendar-active");
+}
+
+// Initialize Simple Calendar
+function initializeCalendar() {
+    const calendarEl = document.getElementById("calendarContent");
+
+    calendar = new FullCalendar.Calendar(calendarEl, {
+        initialView: 'dayGridMonth',
+        height: 'auto',
+        selectable: true,
+        headerToolbar: {
+            left: 'prev,next',
+            center: 'title',
+            right: 'today'
+        },
+        events: "/reminders",
+        dateClick: function(info) {
+            // Only allow adding reminders for today or future dates
+            const today = new Date();
+            const selectedDate = new Date(info.dateStr);
+
+            if (selectedDate >= today.setHours(0,0,0,0)) {
+                const title = prompt("Enter reminder:");
+                if (title && title.trim()) {
+                    addReminder(title.trim(), info.dateStr);
+                }
+            } else {
+                alert("Cannot add reminders for past dates!");
+            }
+        }
+    });
+
+    calendar.render();
+    calendarInitialized = true;
+}
+
+// Add new reminder
+function addReminder(title, date) {
+    fetch("/reminders", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ title: title, date: date })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // The live stream adds it to the calendar
+            if (!liveUpdates) calendar.refetchEvents();
+            alert("Reminder added successfully!");
+        } else {
+            alert("Failed to add reminder");
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert("Network error occurred");
+    });
+}
+
+// Close calendar when clicking overlay
+window.addEventListener('click', function(event) {
+    const calendarOverlay = document.getElementById('calendarOverlay');
+    if (event.target === calendarOverlay) {
+        closeCalendar();
+    }
+});
+// ========== LIVE UPDATES ==========
+
+// One /events stream per dashboard tab pushes todo, stats and reminder
+// changes, instead of re-fetching /todo, /todo_stats, /todo/check-deadlines
+// and /reminders after every action. Browsers without EventSource, and
+// servers without the stream (the Flask app answers 204), fetch.
+let liveUpdates = null;
+let liveTodos = new Map();
+let expiredTasks = [];
+
+function startLiveUpdates() {
+    if (!window.EventSource) return false;
+
+    const source = new EventSource('/events');
+    liveUpdates = source;
+
+    // Dropped connections reconnect by themselves; CLOSED means the server said no
+    source.onerror = function() {
+        if (source.readyState !== EventSource.CLOSED || liveUpdates !== source) return;
+        liveUpdates = null;
+        loadTodoItems();
+        loadCharts();
+    };
+
+    // Sent when the stream opens and again after any reconnect
+    source.addEventListener('snapshot', function(event) {
+        const data = JSON.parse(event.data);
+        liveTodos = new Map(data.todos.map(todo => [todo._id, todo]));
+        expiredTasks = data.expiredTasks;
+        renderTodos(Array.from(liveTodos.values()));
+        renderStats(data.stats);
+        // Reminders added while disconnected; pushed ones come back with the refetch
+        if (calendar) {
+            calendar.getEvents().forEach(reminder => { if (!reminder.source) reminder.remove(); });
+            calendar.refetchEvents();
+        }
+    });
+
+    source.addEventListener('todo', function(event) {
+        const todo = JSON.parse(event.data);
+        liveTodos.set(todo._id, todo);
+        renderTodos(Array.from(liveTodos.values()));
+    });
+
+    source.addEventListener('stats', function(event) {
+        renderStats(JSON.parse(event.data));
+    });
+
+    source.addEventListener('reminder', function(event) {
+        if (calendar) calendar.addEvent(JSON.parse(event.data));
+    });
+
+    return true;
+}
+
+// Initialize on page load
+document.addEventListener('DOMContentLoaded', function() {
+    // Only the dashboard has the todo list and goal chart
+    if (!document.getElementById('todoList')) return;
+    console.log('Dashboard loaded successfully');
+    if (!startLiveUpdates()) {
+        loadTodoItems();
+        loadCharts();
+    }
+});
+
+// Resumable uploads for big files: sent in chunks, and an interrupted
+// upload of the same file picks up where the server says it stopped
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+
+function uploadKey(file) {
+    return 'upload:' + file.name + ':' + file.size + ':' + file.lastModified;
+}
+
+async function startOrResumeUpload(form, file) {
+    const key = uploadKey(file);
+    const savedId = localStorage.getItem(key);
+    if (savedId) {
+        const response = await fetch('/upload/chunked/' + savedId);
+        if (response.ok) {
+            const data = await response.json();
+            return { uploadId: savedId, offset: data.offset, chunkSize: data.chunk_size };
+        }
+        localStorage.removeItem(key);
+    }
+
+    const source = form.querySelector('input[name="source"]');
+    const response = await fetch(form.dataset.chunkedUrl, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            filename: file.name,
+            size: file.size,
+            mimetype: file.type,
+            source: source ? source.value : null
+        })
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'Upload failed');
+    }
+    localStorage.setItem(key, data.upload_id);
+    return { uploadId: data.upload_id, offset: data.offset, chunkSize: data.chunk_size };
+}
+
+async function chunkedUpload(form, file) {
+    const button = form.querySelector('button[type="submit"]');
+    const buttonText = button.textContent;
+    let { uploadId, offset, chunkSize } = await startOrResumeUpload(form, file);
+
+    while (true) {
+        const end = Math.min(offset + chunkSize, file.size);
+        button.textContent = Math.floor(offset / file.size * 100) + '%';
+
+        const response = await fetch('/upload/chunked/' + uploadId, {
+            method: 'PUT',
+            headers: { 'Content-Range': 'bytes ' + offset + '-' + (end - 1) + '/' + file.size },
+            body: file.slice(offset, end)
+        });
+        const data = await response.json();
+
+        if (response.status === 201) {
+            localStorage.removeItem(uploadKey(file));
+            window.location.href = data.redirect;
+            return;
+        }
+        if (response.ok || response.status === 409) {
+            // 409: the server has a different offset (e.g. a retried chunk), continue from there
+            offset = data.offset;
+            continue;
+        }
+        button.textContent = buttonText;
+        throw new Error(data.error || 'Upload failed');
+    }
+}
+
+document.addEventListener('submit', function(event) {
+    const form = event.target;
+    if (!form.dataset || !form.dataset.chunkedUrl) {
+        return;
+    }
+    const input = form.querySelector('input[type="file"]');
+    const file = input && input.files[0];
+    if (!file || file.size < CHUNKED_UPLOAD_THRESHOLD) {
+        return;  // small files go through the normal form post
+    }
+
+    event.preventDefault();
+    chunkedUpload(form, file).catch(error => {
+        console.error('Upload error:', error);
+        alert(error.message + '. Submit the file again to resume.');
+    });
+});
+
+
+// Search box on the dashboard
+const SEARCH_KINDS = { subject: 'Subject', todo: 'Todo', reminder: 'Reminder', file: 'File' };
+let searchTimer = null;
+
+function renderSearchResults(data) {
+    const list = document.getElementById('searchResults');
+    if (!data.results.length) {
+        list.innerHTML = '<li class="search-empty">No results</li>';
+    } else {
+        list.innerHTML = data.results.map(result => {
+            const title = escapeHtml(result.title || '');
+            const snippet = result.snippet ? '<div class="search-snippet">' + escapeHtml(result.snippet) + '</div>' : '';
+            const label = '<span class="search-kind">' + SEARCH_KINDS[result.kind] + '</span> ';
+            const inner = label + title + snippet;
+            return '<li>' + (result.url ? '<a href="' + result.url + '">' + inner + '</a>' : inner) + '</li>';
+        }).join('');
+    }
+    list.style.display = 'block';
+}
+
+function runSearch(query) {
+    const list = document.getElementById('searchResults');
+    if (!query.trim()) {
+        list.style.display = 'none';
+        return;
+    }
+    fetch('/search?q=' + encodeURIComponent(query))
+        .then(response => response.json())
+        .then(renderSearchResults)
+        .catch(error => console.error('Search error:', error));
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const input = document.getElementById('searchInput');
+    if (!input) {
+        return;
+    }
+    input.addEventListener('input', function() {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => runSearch(input.value), 200);
+    });
+});
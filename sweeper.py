@@ -0,0 +1,140 @@
+"""
+Removes expired todos and reminders for every user in one pass, so the
+endpoints that list them can stay plain reads.
+
+The TTL indexes in indexes.py are the backstop (Mongo checks them about once
+a minute), this applies the app's exact rules: unfinished todos go at their
+deadline, finished ones a day later, reminders once their day is over.
+
+main.py runs one every SWEEP_EVERY seconds (default 300) in each worker.
+To sweep from one place instead, set SWEEP_EVERY=0 and run:
+
+    python sweeper.py                # one sweep, e.g. from cron: */5 * * * *
+    python sweeper.py --every 300    # keep sweeping every 5 minutes
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+COMPLETED_TODO_GRACE = timedelta(days=1)
+
+
+def expired_todo_filter(now):
+    return {'deadline': {'$lt': now}, 'completion_status': False}
+
+
+def finished_todo_filter(now):
+    return {'deadline': {'$lt': now - COMPLETED_TODO_GRACE}, 'completion_status': True}
+
+
+def expired_reminder_filter(now):
+    return {'$or': [
+        {'expires_at': {'$lte': now}},
+        # Saved before reminders had expires_at (see indexes.backfill_reminder_expiry)
+        {'expires_at': {'$exists': False}, 'date': {'$lt': now.strftime('%Y-%m-%d')}},
+    ]}
+
+
+def _delete_in_batches(collection, query, batch_size, owners=None):
+    """
+    delete_many by _id in batches, so a big backlog doesn't become one huge
+    write. The user_id of every doc deleted is added to owners, if given.
+    """
+    deleted = 0
+    while True:
+        docs = list(collection.find(query, {'_id': 1, 'user_id': 1}).limit(batch_size))
+        if not docs:
+            return deleted
+        if owners is not None:
+            owners.update(str(doc['user_id']) for doc in docs if doc.get('user_id'))
+        ids = [doc['_id'] for doc in docs]
+        deleted += collection.delete_many({'_id': {'$in': ids}}).deleted_count
+        if len(ids) < batch_size:
+            return deleted
+
+
+def sweep(db, now=None, batch_size=1000, search_index=None, owners=None):
+    """
+    One sweep across all users. Returns how many documents went, and how
+    long it took. Pass a set as owners to collect whose documents went.
+    """
+    started = time.monotonic()
+    now = now or datetime.utcnow()
+
+    report = {
+        'expired_todos': _delete_in_batches(db.goals, expired_todo_filter(now), batch_size, owners),
+        'finished_todos': _delete_in_batches(db.goals, finished_todo_filter(now), batch_size, owners),
+        'reminders': _delete_in_batches(db.reminders, expired_reminder_filter(now), batch_size, owners),
+    }
+    if search_index is not None:
+        report['search_entries'] = search_index.purge_expired(now)
+    report['seconds'] = round(time.monotonic() - started, 3)
+    return report
+
+
+class SweepTimer:
+    """
+    sweep() every `every` seconds on a daemon thread. Every worker runs one;
+    the deletes are idempotent, so overlapping sweeps only repeat the reads.
+    """
+
+    def __init__(self, db, every, search_index=None, batch_size=1000, on_sweep=None):
+        self.db = db
+        self.every = every
+        self.search_index = search_index
+        self.batch_size = batch_size
+        # Called with the ids of users whose todos or reminders were deleted
+        self.on_sweep = on_sweep
+        self.last_report = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def run_once(self):
+        owners = set()
+        try:
+            self.last_report = sweep(self.db, batch_size=self.batch_size, search_index=self.search_index,
+                                     owners=owners)
+            if owners and self.on_sweep:
+                self.on_sweep(owners)
+        except Exception as e:
+            print(f"Sweep failed, trying again in {self.every}s: {e}")
+        return self.last_report
+
+    def _run(self):
+        while not self._stop.wait(self.every):
+            self.run_once()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete expired todos and reminders.')
+    parser.add_argument('--every', type=int, help='keep running, sweeping every EVERY seconds')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    from database import get_database
+    from search_index import SearchIndex
+    db = get_database()
+    search_index = SearchIndex(os.getenv('SEARCH_INDEX_PATH', 'search_index.db'))
+
+    while True:
+        report = sweep(db, batch_size=args.batch_size, search_index=search_index)
+        removed = ', '.join(f"{report[key]} {key.replace('_', ' ')}" for key in report if key != 'seconds')
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S} removed {removed} in {report['seconds']}s")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import io
+import threading
+import zipfile
+
+import pytest
+
+import artifacts
+import main
+from artifacts import ArtifactPipeline, backfill
+
+# Smallest valid PNG, 1x1
+PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082'
+)
+
+
+def make_docx(text, thumbnail=None):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as docx:
+        docx.writestr('word/document.xml', (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            + ''.join(f'<w:p><w:r><w:t>{line}</w:t></w:r></w:p>' for line in text.split('\n'))
+            + '</w:body></w:document>'
+        ))
+        if thumbnail:
+            docx.writestr('docProps/thumbnail.png', thumbnail)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pipeline(store):
+    return main.artifact_pipeline
+
+
+def upload(client, subject_id, data, name):
+    response = client.post(f'/upload/{subject_id}', data={'file': (io.BytesIO(data), name)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 302
+
+
+def test_upload_builds_text_and_thumbnail(client, db, pipeline, subject_id):
+    upload(client, subject_id, make_docx('Krebs cycle\nGlycolysis', thumbnail=PNG), 'bio.docx')
+    pipeline.join()
+
+    file_doc = db.files.find_one()
+    assert file_doc['preview'] == {'thumbnail': True, 'text_chars': len('Krebs cycle\nGlycolysis')}
+    assert pipeline.artifacts.read_text(file_doc['sha256']) == 'Krebs cycle\nGlycolysis'
+
+    response = client.get(f"/thumbnail/{file_doc['_id']}")
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+
+
+def test_oversized_document_is_not_inflated(client, db, pipeline, subject_id, monkeypatch):
+    # Stands in for a zip bomb: document.xml inflates past the limit
+    monkeypatch.setattr(artifacts, 'MAX_UNZIPPED_BYTES', 1000)
+    upload(client, subject_id, make_docx('x' * 2000, thumbnail=PNG), 'bomb.docx')
+    pipeline.join()
+
+    assert db.files.find_one()['preview'] == {'thumbnail': True, 'text_chars': 0}
+
+
+def test_file_without_thumbnail(client, db, pipeline, subject_id):
+    upload(client, subject_id, b'plain notes', 'notes.txt')
+    pipeline.join()
+
+    file_doc = db.files.find_one()
+    assert file_doc['preview'] == {'thumbnail': False, 'text_chars': 11}
+    assert client.get(f"/thumbnail/{file_doc['_id']}").status_code == 404
+
+
+def test_failures_are_retried(db, store, pipeline, monkeypatch):
+    sha256, _ = store.save_stream(io.BytesIO(b'flaky'))
+    db.files.insert_one({'sha256': sha256, 'original_filename': 'flaky.txt'})
+
+    calls = []
+    build = pipeline.artifacts.build
+
+    def flaky_build(*args):
+        calls.append(args)
+        if len(calls) < 3:
+            raise OSError('disk hiccup')
+        return build(*args)
+
+    monkeypatch.setattr(pipeline.artifacts, 'build', flaky_build)
+    assert pipeline.process(sha256, 'flaky.txt') == {'thumbnail': False, 'text_chars': 5}
+    assert len(calls) == 3
+
+    monkeypatch.setattr(pipeline, 'retries', 1)
+    calls.clear()
+    pipeline.artifacts.delete(sha256)
+    assert pipeline.process(sha256, 'flaky.txt')['failed'] is True
+    assert len(calls) == 2
+
+
+def test_full_queue_drops_jobs_for_backfill(db, store, pipeline):
+    release = threading.Event()
+    blocked = ArtifactPipeline(db, store, pipeline.artifacts, workers=1, queue_size=1)
+    blocked.process = lambda *args: release.wait()
+
+    assert blocked.submit('a' * 64, 'a.txt')
+    # The worker may or may not have taken the first job yet
+    blocked.submit('b' * 64, 'b.txt')
+    assert not blocked.submit('c' * 64, 'c.txt')
+    assert blocked.dropped >= 1
+    release.set()
+    blocked.join()
+
+    sha256, _ = store.save_stream(io.BytesIO(b'missed'))
+    db.files.insert_one({'sha256': sha256, 'original_filename': 'missed.txt'})
+    assert backfill(pipeline) == 1
+    assert db.files.find_one({'sha256': sha256})['preview']['text_chars'] == 6
@@ -0,0 +1,208 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+from metrics import MetricsRegistry
+from server_session import CachedSessionStore, MongoSessionStore, ServerSessionInterface
+
+pytest.importorskip('motor')
+pytest.importorskip('a2wsgi')
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+import asgi  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def async_db(db, monkeypatch):
+    # Same mongomock data main.py sees, through Motor's API
+    client = mongomock_motor.AsyncMongoMockClient(mock_mongo_client=main.client)
+    async_db = client.get_database(db.name)
+    monkeypatch.setattr(asgi, 'db', async_db)
+    # Keep these requests out of the registry test_metrics.py reads
+    monkeypatch.setattr(main, 'metrics', MetricsRegistry())
+    return async_db
+
+
+def make_scope(client, method, path, body=None):
+    path, _, query = path.partition('?')
+    cookie = client.get_cookie('session')
+    headers = [(b'cookie', f'session={cookie.value}'.encode())] if cookie else []
+    data = b''
+    if body is not None:
+        data = json.dumps(body).encode()
+        headers += [(b'content-type', b'application/json'), (b'content-length', str(len(data)).encode())]
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'root_path': '', 'query_string': query.encode(), 'headers': headers,
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 5000),
+    }
+    return scope, [{'type': 'http.request', 'body': data, 'more_body': False}]
+
+
+async def request(client, method, path, body=None):
+    """Run one request through the ASGI app with the test client's session cookie."""
+    scope, messages = make_scope(client, method, path, body)
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app(scope, receive, send)
+    start = sent[0]
+    body = b''.join(m.get('body', b'') for m in sent[1:])
+    return start['status'], {k.decode(): v.decode() for k, v in start['headers']}, body
+
+
+def call(client, method, path, body=None):
+    return asyncio.run(request(client, method, path, body))
+
+
+def test_json_routes_match_flask(client, db, user_id):
+    now = datetime.utcnow()
+    for i in range(3):
+        client.post('/todo/add', json={'task': f'task {i}', 'goal_period': 'daily'})
+    db.goals.insert_one({'user_id': user_id, 'task': 'late', 'goal_type': 'task',
+                         'deadline': now - timedelta(hours=1), 'completion_status': False})
+    for day in range(3):
+        client.post('/reminders', json={'title': f'r{day}', 'date': (now + timedelta(days=day + 1)).strftime('%Y-%m-%d')})
+
+    for path in ['/todo', '/todo?limit=2', '/todo_stats', '/todo/check-deadlines',
+                 '/reminders', '/reminders?limit=2', '/todo?cursor=bad']:
+        expected = client.get(path)
+        status, headers, body = call(client, 'GET', path)
+        assert status == expected.status_code, path
+        assert json.loads(body) == expected.get_json(), path
+        assert headers.get('link') == expected.headers.get('Link'), path
+
+
+def test_log_session(client, db, user_id, subject_id):
+    status, _, body = call(client, 'POST', '/log_session', {'subject_name': 'Maths', 'duration_seconds': 1800})
+    assert status == 200
+    assert json.loads(body)['status'] == 'success'
+
+    week = db.sessions.find_one({'user_id': main.ObjectId(user_id)})
+    assert sum(week[day] for day in main.DAYS) == 30
+    assert db.study_rollups.count_documents({}) > 0
+    assert db.users.find_one({'_id': main.ObjectId(user_id)})['data_version'] == 1
+
+    status, _, _ = call(client, 'POST', '/log_session', {'subject_name': 'physics', 'duration_seconds': 60})
+    assert status == 404
+    status, _, _ = call(client, 'POST', '/log_session', {'subject_name': 'maths'})
+    assert status == 400
+
+
+def test_add_reminder_is_searchable(client, db, user_id, search_index):
+    date = (datetime.utcnow() + timedelta(days=2)).strftime('%Y-%m-%d')
+    status, _, body = call(client, 'POST', '/reminders', {'title': 'Dentist', 'date': date})
+    assert (status, json.loads(body)) == (200, {'success': True})
+    assert db.reminders.find_one({'title': 'Dentist'})['user_id'] == user_id
+    assert client.get('/search?q=dentist').get_json()['results']
+
+
+def test_signed_out_and_html_routes(client, db):
+    with client.session_transaction() as sess:
+        sess.clear()
+    assert call(client, 'GET', '/todo')[2] == b'{"todos":[]}\n'
+    assert call(client, 'GET', '/todo_stats')[0] == 401
+
+    # Not one of the async routes: served by the Flask app
+    status, headers, _ = call(client, 'GET', '/login')
+    assert status == 200
+    assert headers['content-type'].startswith('text/html')
+
+
+def test_session_from_cached_mongo_store(client, db, user_id, monkeypatch):
+    store = CachedSessionStore(MongoSessionStore(db.web_sessions), ttl=60)
+    store.set('abc', main.app.session_interface.serializer.dumps({'user_id': user_id}),
+              datetime.utcnow() + timedelta(hours=1))
+    store.cache.delete('abc')
+    monkeypatch.setattr(main.app, 'session_interface', ServerSessionInterface(store))
+    client.set_cookie('session', 'abc')
+
+    assert call(client, 'GET', '/todo_stats')[0] == 200
+    assert store.cached('abc') is not None
+
+
+def open_stream(client):
+    """Start /events on the app. Returns its task, the messages it sends and an event that disconnects it."""
+    scope, messages = make_scope(client, 'GET', '/events')
+    chunks = asyncio.Queue()
+    closed = asyncio.Event()
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await closed.wait()
+        return {'type': 'http.disconnect'}
+
+    return asyncio.ensure_future(asgi.app(scope, receive, chunks.put)), chunks, closed
+
+
+def test_events_stream(client, db, user_id, monkeypatch):
+    client.post('/todo/add', json={'task': 'read', 'goal_period': 'daily'})
+    monkeypatch.setattr(main, 'LIVE_HEARTBEAT_SECONDS', 0.05)
+
+    async def scenario():
+        stream, chunks, closed = open_stream(client)
+
+        async def next_chunk(heartbeat=False):
+            while True:
+                chunk = (await asyncio.wait_for(chunks.get(), 5))['body'].decode()
+                if chunk.startswith(':') == heartbeat:
+                    return chunk
+
+        start = await chunks.get()
+        snapshot = await next_chunk()
+
+        await request(client, 'POST', '/reminders', {'title': 'Exam', 'date': '2999-01-01'})
+        reminder = await next_chunk()
+        heartbeat = await next_chunk(heartbeat=True)
+
+        closed.set()
+        await asyncio.wait_for(stream, 5)
+        return start, snapshot, reminder, heartbeat
+
+    start, snapshot, reminder, heartbeat = asyncio.run(scenario())
+    assert (start['status'], dict(start['headers'])[b'content-type']) == (200, b'text/event-stream')
+    assert snapshot.startswith('event: snapshot\n')
+    assert json.loads(snapshot.split('data: ')[1])['todos'][0]['task'] == 'read'
+    name, data = reminder.strip().split('\n')
+    assert name == 'event: reminder'
+    assert json.loads(data[len('data: '):]) == {'title': 'Exam', 'date': '2999-01-01', 'user_id': user_id}
+    assert heartbeat == ': keep-alive\n\n'
+    assert not main.live_events.has_subscribers(user_id)
+
+
+def test_events_stream_resyncs_changes_made_elsewhere(client, db, user_id, monkeypatch):
+    monkeypatch.setattr(main, 'LIVE_HEARTBEAT_SECONDS', 0.01)
+    monkeypatch.setattr(main, 'LIVE_RESYNC_SECONDS', 0.05)
+
+    async def scenario():
+        stream, chunks, closed = open_stream(client)
+
+        async def next_snapshot():
+            while True:
+                chunk = (await asyncio.wait_for(chunks.get(), 5)).get('body', b'').decode()
+                if chunk.startswith('event: snapshot'):
+                    return json.loads(chunk.split('data: ')[1])
+
+        first = await next_snapshot()
+        # Written by another worker: nothing is published to this process
+        db.goals.insert_one({'user_id': user_id, 'task': 'elsewhere', 'goal_type': 'task', 'goal_period': 'daily',
+                             'deadline': datetime.utcnow() + timedelta(days=1), 'completion_status': False})
+        second = await next_snapshot()
+
+        closed.set()
+        await asyncio.wait_for(stream, 5)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first['todos'] == []
+    assert [todo['task'] for todo in second['todos']] == ['elsewhere']
@@ -0,0 +1,115 @@
+import hashlib
+import io
+import os
+
+import pytest
+from bson import ObjectId
+
+import main
+from blob_store import OffsetMismatch, UploadTooLarge
+
+
+def test_save_stream_hashes_and_dedupes(store):
+    data = b'x' * 3_000_000
+    sha256, size = store.save_stream(io.BytesIO(data))
+
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    assert size == len(data)
+    assert store.save_stream(io.BytesIO(data)) == (sha256, size)
+    with open(store.path(sha256), 'rb') as f:
+        assert f.read() == data
+
+
+@pytest.mark.parametrize('sha256', ['/etc/hostname', '../' * 4 + 'a' * 52, 'A' * 64, 'a' * 63, None])
+def test_path_rejects_anything_but_a_digest(store, sha256):
+    with pytest.raises(ValueError):
+        store.path(sha256)
+    with pytest.raises(ValueError):
+        store.delete(sha256)
+
+
+def test_save_stream_rejects_oversized_upload(store, tmp_path):
+    with pytest.raises(UploadTooLarge):
+        store.save_stream(io.BytesIO(b'x' * 100), max_size=10)
+    assert list((tmp_path / 'blobs' / 'tmp').iterdir()) == []
+
+
+def test_append_chunk_checks_offset(store):
+    assert store.append_chunk('u1', 0, io.BytesIO(b'hello '), 11) == 6
+    with pytest.raises(OffsetMismatch) as e:
+        store.append_chunk('u1', 0, io.BytesIO(b'hello '), 11)
+    assert e.value.offset == 6
+    with pytest.raises(UploadTooLarge):
+        store.append_chunk('u1', 6, io.BytesIO(b'world!!'), 11)
+    assert store.partial_size('u1') == 6
+
+    assert store.append_chunk('u1', 6, io.BytesIO(b'world'), 11) == 11
+    sha256, size = store.commit_partial('u1')
+    assert sha256 == hashlib.sha256(b'hello world').hexdigest()
+    assert size == 11
+    assert store.partial_size('u1') == 0
+
+
+def test_upload_stores_blob_and_hash(client, db, store, subject_id):
+    for _ in range(2):
+        response = client.post(f'/upload/{subject_id}',
+                               data={'file': (io.BytesIO(b'notes'), 'notes.txt')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 302
+
+    files = list(db.files.find())
+    assert len(files) == 1
+    assert files[0]['sha256'] == hashlib.sha256(b'notes').hexdigest()
+    assert files[0]['size'] == 5
+    assert files[0]['file_path'] == store.path(files[0]['sha256'])
+
+    assert client.get(f"/download/{files[0]['_id']}").data == b'notes'
+
+
+def test_delete_keeps_blob_still_used_by_another_subject(client, db, store, subject_id, user_id):
+    other_id = str(db.subjects.insert_one({'owner_id': user_id, 'subject': 'physics', 'marks': 70}).inserted_id)
+    for sid in (subject_id, other_id):
+        client.post(f'/upload/{sid}', data={'file': (io.BytesIO(b'shared'), 'notes.txt')},
+                    content_type='multipart/form-data')
+    sha256 = hashlib.sha256(b'shared').hexdigest()
+    first, second = db.files.find()
+    # Old enough that no upload can be about to reuse it
+    os.utime(store.path(sha256), (0, 0))
+
+    client.post(f"/delete_file/{first['_id']}")
+    assert store.exists(sha256)
+    client.post(f"/delete_file/{second['_id']}")
+    assert not store.exists(sha256)
+
+
+def test_chunked_upload_resumes(client, db, store, subject_id):
+    data = b'0123456789' * 100
+    upload = client.post(f'/upload/{subject_id}/chunked',
+                         json={'filename': 'big.pdf', 'size': len(data), 'mimetype': 'application/pdf'}).get_json()
+    url = f"/upload/chunked/{upload['upload_id']}"
+
+    def put(start, end):
+        return client.put(url, data=data[start:end],
+                          headers={'Content-Range': f'bytes {start}-{end - 1}/{len(data)}'})
+
+    assert put(0, 400).get_json()['offset'] == 400
+    # The client lost track, e.g. after a reload: resend from 0 and get told where to continue
+    conflict = put(0, 400)
+    assert conflict.status_code == 409
+    assert conflict.get_json()['offset'] == 400
+    assert client.get(url).get_json()['offset'] == 400
+
+    done = put(400, len(data))
+    assert done.status_code == 201
+
+    file_doc = db.files.find_one()
+    assert file_doc['sha256'] == hashlib.sha256(data).hexdigest()
+    assert file_doc['original_filename'] == 'big.pdf'
+    assert file_doc['subject_id'] == ObjectId(subject_id)
+    assert db.upload_sessions.count_documents({}) == 0
+
+
+def test_chunked_upload_rejects_bad_files(client, store, subject_id, monkeypatch):
+    assert client.post(f'/upload/{subject_id}/chunked', json={'filename': 'run.exe', 'size': 10}).status_code == 400
+    monkeypatch.setitem(main.app.config, 'MAX_CHUNKED_UPLOAD_BYTES', 5)
+    assert client.post(f'/upload/{subject_id}/chunked', json={'filename': 'a.pdf', 'size': 10}).status_code == 413
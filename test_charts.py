@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+from bson import ObjectId
+
+import chart_figures
+from charts import ChartCache
+
+
+def add_rollup(db, user_id, name, minutes):
+    subject_id = db.subjects.insert_one({'owner_id': user_id, 'subject': name, 'marks': 80}).inserted_id
+    db.study_rollups.insert_one({'user_id': ObjectId(user_id), 'subject_id': subject_id,
+                                 'subject_name': name, 'total_minutes': minutes})
+
+
+def test_chart_cache_evicts_least_recently_used():
+    cache = ChartCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 2, 'misses': 1}
+
+
+def test_chart_api_returns_series(client, db, user_id):
+    add_rollup(db, user_id, 'maths', 90)
+
+    assert client.get('/api/charts/time').get_json() == {'labels': ['maths'], 'values': [1.5]}
+    assert client.get('/api/charts/performance').get_json() == {
+        'labels': ['maths'], 'values': [80], 'minutes': [90]
+    }
+    assert client.get('/api/charts/pie').status_code == 404
+
+
+def test_chart_is_rendered_once_per_data_version(client, db, user_id, monkeypatch):
+    add_rollup(db, user_id, 'maths', 90)
+    renders = []
+    real_figure = chart_figures.FIGURES['time']
+
+    def counting_figure(series):
+        renders.append(series)
+        return real_figure(series)
+
+    monkeypatch.setitem(chart_figures.FIGURES, 'time', counting_figure)
+
+    client.get('/time')
+    client.get('/time')
+    assert len(renders) == 1
+
+    client.post('/update', data={'subject': 'maths', 'marks': '90'})
+    response = client.get('/time')
+
+    assert len(renders) == 2
+    assert b'maths (1.5 hrs)' in response.data
+
+
+def test_main_does_not_import_pandas_or_plotly():
+    code = "import sys, main; print('pandas' in sys.modules, 'plotly' in sys.modules)"
+    env = {**os.environ, 'url': 'mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=1'}
+
+    result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True)
+
+    assert result.stdout.split()[-2:] == ['False', 'False']
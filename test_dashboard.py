@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from dashboard_data import load_dashboard
+
+
+def seed_subjects(db, user_id, count, files_per_subject=2):
+    now = datetime.utcnow()
+    for i in range(count):
+        subject_id = db.subjects.insert_one({
+            'owner_id': user_id,
+            'subject': f'subject{i}',
+            'marks': 50 + i,
+            'created_at': now
+        }).inserted_id
+        db.files.insert_many([{
+            'user_id': ObjectId(user_id),
+            'subject_id': subject_id,
+            'subject_name': f'subject{i}',
+            'original_filename': f'notes{j}.pdf',
+            'secure_filename': f'notes{j}.pdf'
+        } for j in range(files_per_subject)])
+        db.goals.insert_one({
+            'user_id': ObjectId(user_id),
+            'subject_id': subject_id,
+            'goal_type': 'time',
+            'target_duration_minutes': 120,
+            'current_duration_minutes': 30,
+            'start_date': now - timedelta(days=1),
+            'end_date': now + timedelta(days=6),
+            'status': 'active'
+        })
+        db.goals.insert_one({
+            'user_id': user_id,
+            'task': f'revise subject{i}',
+            'goal_type': 'task',
+            'goal_period': ['daily', 'weekly', 'monthly'][i % 3],
+            'deadline': now + timedelta(days=1),
+            'completion_status': i % 2 == 0,
+            'created_at': now
+        })
+
+
+def test_load_dashboard_attaches_files_names_and_stats(db, user_id):
+    seed_subjects(db, user_id, 3)
+
+    data = load_dashboard(db, user_id)
+
+    assert [s['subject'] for s in data['subjects']] == ['subject0', 'subject1', 'subject2']
+    assert all(len(s['files']) == 2 for s in data['subjects'])
+    assert sorted(g['subject_name'] for g in data['time_goals']) == ['subject0', 'subject1', 'subject2']
+    assert data['stats'] == {
+        'daily': {'total': 1, 'completed': 1},
+        'weekly': {'total': 1, 'completed': 0},
+        'monthly': {'total': 1, 'completed': 1}
+    }
+
+
+def test_load_dashboard_names_goals_for_subjects_not_owned(db, user_id):
+    other_subject = db.subjects.insert_one({'owner_id': 'someone-else', 'subject': 'shared'}).inserted_id
+    db.goals.insert_one({
+        'user_id': ObjectId(user_id),
+        'subject_id': other_subject,
+        'goal_type': 'time',
+        'status': 'active'
+    })
+
+    data = load_dashboard(db, user_id)
+
+    assert data['time_goals'][0]['subject_name'] == 'shared'
+
+
+def test_dashboard_query_count_does_not_grow_with_subjects(client, db, user_id, query_counter):
+    seed_subjects(db, user_id, 2)
+    query_counter.reset()
+    assert client.get('/dashboard').status_code == 200
+    few_subjects = query_counter.total
+
+    seed_subjects(db, user_id, 40)
+    query_counter.reset()
+    response = client.get('/dashboard')
+    assert response.status_code == 200
+    assert response.data.count(b'class="subject-item"') == 42
+
+    assert query_counter.total == few_subjects
+    assert query_counter.total <= 3
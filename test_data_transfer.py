@@ -0,0 +1,92 @@
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+from data_transfer import export_docs, import_docs, ndjson_export, parse_ndjson
+
+
+def seed(db, user_id):
+    subject_id = db.subjects.insert_one({'owner_id': user_id, 'subject': 'maths', 'marks': 80}).inserted_id
+    db.sessions.insert_one({'user_id': ObjectId(user_id), 'subject_id': subject_id, 'week_start': '2024-03-04',
+                            'monday': 30, 'end_time': datetime(2024, 3, 4, 10)})
+    db.goals.insert_one({'user_id': user_id, 'goal_type': 'task', 'task': 'read chapter 3',
+                         'deadline': datetime(2030, 1, 1), 'completion_status': False})
+    db.goals.insert_one({'user_id': ObjectId(user_id), 'goal_type': 'time', 'subject_id': subject_id, 'minutes': 120})
+    db.reminders.insert_one({'user_id': user_id, 'title': 'exam', 'date': '2030-01-01'})
+
+
+def test_round_trip_is_idempotent(db, user_id):
+    seed(db, user_id)
+    db.subjects.insert_one({'owner_id': str(ObjectId()), 'subject': 'not mine'})
+    lines = list(ndjson_export(export_docs(db, user_id)))
+    before = {name: list(db[name].find()) for name in ('users', 'sessions', 'goals', 'reminders')}
+
+    assert len(lines) == 6  # the account, one subject, one week, two goals, one reminder
+    for name in ('users', 'subjects', 'sessions', 'goals', 'reminders'):
+        db[name].drop()
+
+    report = import_docs(db, parse_ndjson(lines), batch_size=2)
+    assert report['goals'] == {'upserted': 2, 'replaced': 0, 'failed': 0, 'skipped': 0}
+    for name, docs in before.items():
+        assert list(db[name].find()) == docs  # ObjectIds and dates come back as they were
+
+    again = import_docs(db, parse_ndjson(lines))
+    assert sum(counts['upserted'] for counts in again.values()) == 0
+    assert db.goals.count_documents({}) == 2
+
+
+def test_import_endpoint_only_writes_own_documents(client, db, user_id):
+    seed(db, user_id)
+    export = client.get('/export')
+    records = [json.loads(line) for line in export.data.decode().splitlines()]
+    assert export.mimetype == 'application/x-ndjson'
+    assert 'password' not in next(r['doc'] for r in records if r['collection'] == 'users')
+
+    someone_else = {'collection': 'subjects', 'doc': {'_id': {'$oid': str(ObjectId())},
+                                                      'owner_id': str(ObjectId()), 'subject': 'sneaky'}}
+    db.goals.delete_many({})
+    body = export.data + (json.dumps(someone_else) + '\n').encode()
+    response = client.post('/import', data=body, content_type='application/x-ndjson')
+
+    imported = response.get_json()['imported']
+    assert imported['goals']['upserted'] == 2
+    assert imported['users']['skipped'] == 1
+    assert imported['subjects'] == {'upserted': 0, 'replaced': 0, 'failed': 0, 'skipped': 1}
+    assert db.subjects.count_documents({'subject': 'sneaky'}) == 0
+    assert client.get('/search?q=chapter').get_json()['total'] == 1
+
+    assert client.post('/import', data=b'{not json', content_type='application/x-ndjson').status_code == 400
+
+
+def test_import_cannot_overwrite_another_users_document(client, db, user_id):
+    victim_goal = db.goals.insert_one({'user_id': str(ObjectId()), 'goal_type': 'task', 'task': 'theirs'}).inserted_id
+    attack = {'collection': 'goals', 'doc': {'_id': {'$oid': str(victim_goal)}, 'user_id': user_id, 'task': 'pwned'}}
+
+    response = client.post('/import', data=json.dumps(attack) + '\n', content_type='application/x-ndjson')
+
+    assert response.get_json()['imported']['goals'] == {'upserted': 0, 'replaced': 0, 'failed': 1, 'skipped': 0}
+    assert db.goals.find_one({'_id': victim_goal})['task'] == 'theirs'
+
+
+def test_import_endpoint_skips_files_docs(client, db, user_id, subject_id):
+    # A files doc names a blob and a path on the server, e.g. to read /etc/hostname
+    planted = {'collection': 'files', 'doc': {'_id': {'$oid': str(ObjectId())}, 'user_id': {'$oid': user_id},
+                                              'subject_id': {'$oid': subject_id}, 'sha256': '/etc/hostname',
+                                              'file_path': '/etc/hostname', 'secure_filename': 'hostname.txt'}}
+    reminder = {'collection': 'reminders', 'doc': {'_id': {'$oid': str(ObjectId())}, 'user_id': user_id,
+                                                   'title': 'exam', 'date': '2030-01-01'}}
+    body = json.dumps(reminder) + '\n' + json.dumps(planted) + '\n'
+
+    response = client.post('/import', data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    assert response.get_json()['imported']['files'] == {'upserted': 0, 'replaced': 0, 'failed': 0, 'skipped': 1}
+    assert db.files.count_documents({}) == 0
+    assert client.get(f"/download/{planted['doc']['_id']['$oid']}").status_code == 404
+
+    # A bad line anywhere means nothing is written
+    db.reminders.delete_many({})
+    response = client.post('/import', data=body + '{"doc": 5}\n', content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert db.reminders.count_documents({}) == 0
@@ -0,0 +1,93 @@
+import io
+import os
+
+from bson import ObjectId
+
+import main
+from file_gc import collect_garbage, delete_subject_files
+
+
+def upload(client, subject_id, data, name='notes.txt'):
+    client.post(f'/upload/{subject_id}', data={'file': (io.BytesIO(data), name)},
+                content_type='multipart/form-data')
+    # The preview job writes to the same files doc the test is about to change
+    main.artifact_pipeline.join()
+
+
+def age_blobs(store):
+    for sha256, _, _ in store.iter_blobs():
+        os.utime(store.path(sha256), (0, 0))
+
+
+def test_dry_run_reports_without_deleting(client, db, store, subject_id, user_id):
+    upload(client, subject_id, b'kept')
+    upload(client, subject_id, b'orphaned')
+    # Files of a subject deleted before deletes cascaded
+    db.files.update_one({'original_filename': 'notes.txt', 'size': 8},
+                        {'$set': {'subject_id': ObjectId()}})
+    # A blob with no files doc at all
+    store.save_stream(io.BytesIO(b'stray'))
+    age_blobs(store)
+
+    report = collect_garbage(db, store, dry_run=True)
+    assert report['orphan_files'] == 1
+    assert report['orphan_blobs'] == 2
+    assert report['bytes'] == len(b'orphaned') + len(b'stray')
+    assert db.files.count_documents({}) == 2
+    assert len(list(store.iter_blobs())) == 3
+
+    assert collect_garbage(db, store, batch_size=1)['orphan_blobs'] == 2
+    assert db.files.count_documents({}) == 1
+    assert len(list(store.iter_blobs())) == 1
+    assert collect_garbage(db, store)['orphan_blobs'] == 0
+
+
+def test_recent_blobs_are_left_alone(db, store):
+    store.save_stream(io.BytesIO(b'just uploaded'))
+    assert collect_garbage(db, store)['orphan_blobs'] == 0
+    assert collect_garbage(db, store, grace=0)['orphan_blobs'] == 1
+
+
+def test_missing_blob_drops_files_doc(client, db, store, subject_id):
+    upload(client, subject_id, b'lost')
+    db.files.update_one({}, {'$set': {'upload_date': db.files.find_one()['upload_date'].replace(year=2000)}})
+    for sha256, _, _ in list(store.iter_blobs()):
+        store.delete(sha256)
+
+    assert collect_garbage(db, store)['orphan_files'] == 1
+    assert db.files.count_documents({}) == 0
+
+
+def test_subject_delete_cascades(client, db, store, subject_id, user_id, monkeypatch):
+    other_id = str(db.subjects.insert_one({'owner_id': user_id, 'subject': 'physics', 'marks': 70}).inserted_id)
+    upload(client, subject_id, b'maths notes')
+    upload(client, subject_id, b'shared')
+    upload(client, other_id, b'shared')
+    age_blobs(store)
+    # Its blob stays for the other subject, so only the cache could still serve it
+    file_id = str(db.files.find_one({'subject_id': ObjectId(subject_id), 'size': len(b'shared')})['_id'])
+    assert client.get(f'/download/{file_id}').status_code == 200
+
+    deleted = []
+    monkeypatch.setattr(main, 'delete_subject_files_async',
+                        lambda *args, **kwargs: deleted.append(delete_subject_files(*args, **kwargs)))
+    assert client.post('/delete', data={'subject': 'maths'}).status_code == 200
+
+    assert deleted == [2]
+    assert client.get(f'/download/{file_id}').status_code == 404
+    assert [f['subject_name'] for f in db.files.find()] == ['physics']
+    assert len(list(store.iter_blobs())) == 1
+
+
+def test_previews_of_deleted_blobs_are_removed(db, store):
+    artifacts = main.artifact_store
+    sha256, _ = store.save_stream(io.BytesIO(b'gone soon'))
+    artifacts.build(sha256, store.path(sha256), 'notes.txt')
+    age_blobs(store)
+
+    assert collect_garbage(db, store, dry_run=True, artifacts=artifacts)['orphan_artifacts'] == 1
+    assert artifacts.manifest(sha256) is not None
+    report = collect_garbage(db, store, artifacts=artifacts)
+    assert report['orphan_blobs'] == 1
+    assert report['orphan_artifacts'] == 1
+    assert artifacts.manifest(sha256) is None
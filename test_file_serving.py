@@ -0,0 +1,95 @@
+import hashlib
+import io
+
+import main
+from file_serving import FileMetaCache
+
+PDF = b'%PDF-1.4 ' + b'x' * 5000
+
+
+def upload(client, db, subject_id, data=PDF, name='notes.pdf'):
+    client.post(f'/upload/{subject_id}', data={'file': (io.BytesIO(data), name)},
+                content_type='multipart/form-data')
+    # Let the preview job finish, its writes would otherwise land in query counts
+    main.artifact_pipeline.join()
+    return str(db.files.find_one({'original_filename': name})['_id'])
+
+
+def test_etag_is_the_content_hash(client, db, store, subject_id):
+    file_id = upload(client, db, subject_id)
+
+    response = client.get(f'/view_file/{file_id}')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{hashlib.sha256(PDF).hexdigest()}"'
+    assert 'private' in response.headers['Cache-Control']
+
+    cached = client.get(f'/view_file/{file_id}', headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+
+def test_range_request(client, db, store, subject_id):
+    file_id = upload(client, db, subject_id)
+
+    response = client.get(f'/download/{file_id}', headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert response.data == PDF[:100]
+    assert response.headers['Content-Range'] == f'bytes 0-99/{len(PDF)}'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+
+def test_content_type_comes_from_the_filename(client, db, store, subject_id):
+    client.post(f'/upload/{subject_id}', data={'file': (io.BytesIO(b'<script>alert(1)</script>'), 'notes.txt', 'text/html')},
+                content_type='multipart/form-data')
+    main.artifact_pipeline.join()
+    file_id = str(db.files.find_one({'original_filename': 'notes.txt'})['_id'])
+
+    response = client.get(f'/view_file/{file_id}')
+    assert response.mimetype == 'text/plain'
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+    assert response.headers['Content-Disposition'].startswith('inline')
+
+    file_id = upload(client, db, subject_id, data=b'PK', name='slides.docx')
+    response = client.get(f'/view_file/{file_id}')
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    assert response.headers['Content-Disposition'].startswith('attachment')
+
+
+def test_repeat_views_skip_mongo(client, db, store, subject_id, query_counter):
+    file_id = upload(client, db, subject_id)
+    client.get(f'/view_file/{file_id}')
+
+    query_counter.reset()
+    assert client.get(f'/view_file/{file_id}').status_code == 200
+    assert query_counter.total == 0
+
+
+def test_deleted_file_is_not_served_from_cache(client, db, store, subject_id):
+    file_id = upload(client, db, subject_id)
+    client.get(f'/download/{file_id}')
+
+    client.post(f'/delete_file/{file_id}')
+    assert client.get(f'/download/{file_id}').status_code == 404
+
+
+def test_x_accel_redirect(client, db, store, subject_id, monkeypatch):
+    monkeypatch.setitem(main.app.config, 'X_ACCEL_REDIRECT', '/internal-uploads')
+    monkeypatch.setitem(main.app.config, 'UPLOAD_FOLDER', store.root.rsplit('/', 1)[0])
+    file_id = upload(client, db, subject_id)
+    sha256 = hashlib.sha256(PDF).hexdigest()
+
+    response = client.get(f'/view_file/{file_id}')
+    assert response.headers['X-Accel-Redirect'] == f'/internal-uploads/blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+    assert response.data == b''
+    assert response.mimetype == 'application/pdf'
+    assert client.get(f'/view_file/{file_id}', headers={'If-None-Match': f'"{sha256}"'}).status_code == 304
+
+
+def test_meta_cache_expires():
+    now = [0]
+    cache = FileMetaCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.put('a', {'path': 'a'})
+    assert cache.get('a') == {'path': 'a'}
+    now[0] = 11
+    assert cache.get('a') is None
+    assert cache.stats() == {'size': 0, 'maxsize': 2, 'hits': 1, 'misses': 1}
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from goal_stats import get_goal_summary, get_task_stats
+
+
+def add_todo(db, user_id, period, done):
+    db.goals.insert_one({
+        'user_id': user_id,
+        'task': 'task',
+        'goal_type': 'task',
+        'goal_period': period,
+        'deadline': datetime.utcnow() + timedelta(days=1),
+        'completion_status': done
+    })
+
+
+def test_task_stats_counts_per_period(db, user_id):
+    add_todo(db, user_id, 'daily', True)
+    add_todo(db, user_id, 'daily', False)
+    add_todo(db, user_id, 'weekly', True)
+    add_todo(db, user_id, 'no-period', True)
+    add_todo(db, 'someone-else', 'daily', True)
+
+    assert get_task_stats(db, user_id) == {
+        'daily': {'total': 2, 'completed': 1},
+        'weekly': {'total': 1, 'completed': 1},
+        'monthly': {'total': 0, 'completed': 0}
+    }
+
+
+def test_goal_summary_includes_active_time_goals(db, user_id):
+    add_todo(db, user_id, 'monthly', False)
+    db.goals.insert_many([
+        {'user_id': ObjectId(user_id), 'goal_type': 'time', 'status': 'active'},
+        {'user_id': ObjectId(user_id), 'goal_type': 'time', 'status': 'done'}
+    ])
+
+    stats, time_goals = get_goal_summary(db, user_id)
+
+    assert stats['monthly'] == {'total': 1, 'completed': 0}
+    assert len(time_goals) == 1
+    assert time_goals[0]['status'] == 'active'
+
+
+def test_todo_stats_endpoint_is_one_query(client, db, user_id, query_counter):
+    for _ in range(50):
+        add_todo(db, user_id, 'weekly', False)
+    query_counter.reset()
+
+    response = client.get('/todo_stats')
+
+    assert response.get_json()['weekly'] == {'total': 50, 'completed': 0}
+    assert query_counter.total == 1
@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from google_oauth import DiscoveryCache, TimeoutSession, max_age
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.hits += 1
+        if server.delay:
+            time.sleep(server.delay)
+        if server.status != 200:
+            self.send_response(server.status)
+            self.end_headers()
+            return
+        body = json.dumps({'token_endpoint': f'https://example.com/token/{server.hits}'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', server.cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.hits = 0
+    server.status = 200
+    server.delay = 0
+    server.cache_control = 'public, max-age=60'
+    server.handle_error = lambda request, address: None  # clients that time out hang up on us
+    server.url = f'http://127.0.0.1:{server.server_port}/.well-known/openid-configuration'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_max_age():
+    assert max_age('public, max-age=3600, must-revalidate', 10) == 3600
+    assert max_age('no-cache', 10) == 0
+    assert max_age(None, 10) == 10
+
+
+def test_document_is_cached_for_max_age(stub):
+    clock = Clock()
+    cache = DiscoveryCache(stub.url, TimeoutSession(), clock=clock)
+
+    first = cache.get()
+    clock.now += 59
+    assert cache.get() == first
+    assert stub.hits == 1
+
+
+def test_expired_document_is_served_while_refreshing(stub):
+    clock = Clock()
+    cache = DiscoveryCache(stub.url, TimeoutSession(), clock=clock)
+    first = cache.get()
+
+    clock.now += 61
+    assert cache.get() == first
+    assert wait_for(lambda: cache.get()['token_endpoint'].endswith('/2'))
+    assert stub.hits == 2
+
+
+def test_stale_document_is_kept_when_refresh_fails(stub):
+    clock = Clock()
+    cache = DiscoveryCache(stub.url, TimeoutSession(), retry_after=30, clock=clock)
+    first = cache.get()
+    stub.status = 500
+
+    clock.now += 61
+    cache.get()
+    assert wait_for(lambda: stub.hits == 2)
+    assert wait_for(lambda: not cache._refreshing)
+    assert cache.get() == first
+    assert stub.hits == 2  # not retried before retry_after
+
+
+def test_fallback_until_first_success(stub):
+    clock = Clock()
+    stub.status = 404
+    cache = DiscoveryCache(stub.url, TimeoutSession(), fallback={'token_endpoint': 'fallback'},
+                           retry_after=30, clock=clock)
+
+    assert cache.get() == {'token_endpoint': 'fallback'}
+    assert cache.get() == {'token_endpoint': 'fallback'}
+    assert stub.hits == 1
+
+    stub.status = 200
+    clock.now += 31
+    assert cache.get()['token_endpoint'].endswith('/2')
+
+
+def test_session_applies_default_timeout(stub):
+    stub.delay = 0.5
+
+    with pytest.raises(requests.Timeout):
+        TimeoutSession(timeout=0.1).get(stub.url)
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from indexes import INDEXES, backfill_reminder_expiry, ensure_indexes
+
+
+def test_ensure_indexes_is_idempotent(db):
+    first = ensure_indexes(db)
+    second = ensure_indexes(db)
+
+    assert {result for _, _, result in first} == {'created'}
+    assert {result for _, _, result in second} == {'unchanged'}
+    assert len(second) == sum(len(models) for models in INDEXES.values())
+    assert db.users.index_information()['email_unique']['unique'] is True
+    assert db.reminders.index_information()['reminder_ttl']['expireAfterSeconds'] == 0
+
+
+def test_ensure_indexes_rebuilds_changed_definition(db):
+    db.users.create_index('email', name='email_unique')
+
+    report = dict(((c, n), r) for c, n, r in ensure_indexes(db))
+
+    assert report[('users', 'email_unique')] == 'rebuilt'
+    assert db.users.index_information()['email_unique']['unique'] is True
+
+
+def test_ensure_indexes_reports_duplicate_emails(db):
+    db.users.insert_many([{'email': 'dup@example.com'}, {'email': 'dup@example.com'}])
+
+    report = dict(((c, n), r) for c, n, r in ensure_indexes(db))
+
+    assert report[('users', 'email_unique')].startswith('failed')
+    assert report[('subjects', 'owner_subject')] == 'created'
+
+
+def test_backfill_reminder_expiry(db):
+    db.reminders.insert_many([
+        {'user_id': 'u', 'title': 'exam', 'date': '2024-03-05'},
+        {'user_id': 'u', 'title': 'broken', 'date': 'soon'},
+    ])
+
+    assert backfill_reminder_expiry(db) == 1
+    assert db.reminders.find_one({'title': 'exam'})['expires_at'] == datetime(2024, 3, 6)
+
+
+def test_new_reminders_get_expiry(client, db, user_id):
+    client.post('/reminders', json={'title': 'exam', 'date': '2099-01-31'})
+
+    assert db.reminders.find_one({'title': 'exam'})['expires_at'] == datetime(2099, 2, 1)
+    assert client.get('/reminders').get_json() == [{'user_id': user_id, 'title': 'exam', 'date': '2099-01-31'}]
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from pymongo.errors import OperationFailure
+
+import main
+from live_events import RESYNC, ChangeStreamRelay, EventBroker
+
+
+def open_stream(broker, user_id):
+    """Subscribe on a private loop. Returns the subscription and a next() for its next event, or None."""
+    loop = asyncio.new_event_loop()
+    subscription = broker.subscribe(user_id, loop)
+
+    def next_event():
+        # Runs the deliveries published so far
+        loop.run_until_complete(asyncio.sleep(0))
+        return None if subscription.events.empty() else subscription.events.get_nowait()
+
+    return subscription, next_event
+
+
+@pytest.fixture
+def next_event(user_id):
+    subscription, next_event = open_stream(main.live_events, user_id)
+    yield next_event
+    main.live_events.unsubscribe(subscription)
+    subscription.loop.close()
+
+
+def test_flask_app_leaves_the_stream_to_asgi(client, user_id):
+    response = client.get('/events')
+    assert (response.status_code, response.data) == (204, b'')
+
+
+def test_writes_are_published_to_open_streams(client, db, user_id, next_event):
+    client.post('/todo/add', json={'task': 'write', 'goal_period': 'weekly'})
+    name, todo = next_event()
+    assert (name, todo['task'], todo['completion_status']) == ('todo', 'write', False)
+    assert next_event() == ('stats', {'daily': {'total': 0, 'completed': 0},
+                                      'weekly': {'total': 1, 'completed': 0},
+                                      'monthly': {'total': 0, 'completed': 0}})
+
+    client.post('/todo/done', json={'id': todo['_id']})
+    name, done = next_event()
+    assert (done['_id'], done['completion_status']) == (todo['_id'], True)
+    assert next_event()[1]['weekly'] == {'total': 1, 'completed': 1}
+
+    client.post('/reminders', json={'title': 'Exam', 'date': '2999-01-01'})
+    assert next_event() == ('reminder', {'title': 'Exam', 'date': '2999-01-01', 'user_id': user_id})
+    assert next_event() is None
+
+
+def test_swept_users_get_a_snapshot(user_id, next_event):
+    main.resync_streams({user_id, 'someone-else'})
+    assert next_event() == RESYNC
+    assert next_event() is None
+
+
+def test_nothing_is_counted_without_open_streams(client, db, user_id, query_counter):
+    client.post('/todo/add', json={'task': 'read', 'goal_period': 'daily'})
+    assert query_counter.calls[('goals', 'aggregate')] == 0
+
+
+def test_slow_stream_gets_a_resync():
+    broker = EventBroker(max_queue=2)
+    subscription, next_event = open_stream(broker, 'u1')
+    for i in range(3):
+        broker.publish('u1', 'todo', {'i': i})
+    assert next_event() == RESYNC
+    assert next_event() is None
+
+    broker.unsubscribe(subscription)
+    broker.publish('u1', 'todo', {})
+    assert broker.open_streams == 0
+    subscription.loop.close()
+
+
+class FakeStream:
+    def __init__(self, changes, on_end):
+        self.changes = list(changes)
+        self.on_end = on_end
+        self.alive = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def try_next(self):
+        if self.changes:
+            return self.changes.pop(0)
+        self.on_end(self)
+        return None
+
+
+class FakeDatabase:
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.resumed_after = []
+
+    def watch(self, pipeline, resume_after=None, **kwargs):
+        self.resumed_after.append(resume_after)
+        stream = self.streams.pop(0)
+        if isinstance(stream, Exception):
+            raise stream
+        return stream
+
+
+def test_change_stream_relay_publishes_and_resumes():
+    seen = []
+    relay = ChangeStreamRelay(None, lambda name, doc: seen.append((name, doc['task'])), retry=0)
+    todo = {'_id': {'token': 1}, 'ns': {'coll': 'goals'}, 'fullDocument': {'task': 'read'}}
+    gone = {'_id': {'token': 2}, 'ns': {'coll': 'goals'}, 'fullDocument': None}
+    relay.db = FakeDatabase(
+        # Closed by the server: watched again from the last token
+        FakeStream([todo], lambda stream: setattr(stream, 'alive', False)),
+        # The token fell off the oplog: watched again from now
+        OperationFailure('history lost', code=286),
+        FakeStream([gone], lambda stream: relay._stop.set()),
+    )
+
+    relay._run()
+    assert seen == [('goals', 'read')]
+    assert relay.db.resumed_after == [None, {'token': 1}, None]
+    assert relay.resume_token == {'token': 2}
+
+
+def test_change_stream_mode_leaves_publishing_to_the_relay(client, db, user_id, next_event, monkeypatch):
+    monkeypatch.setattr(main, 'change_relay', object())
+    client.post('/todo/add', json={'task': 'read', 'goal_period': 'daily'})
+    assert next_event() is None
+
+    main.publish_change('goals', db.goals.find_one({'task': 'read'}))
+    name, todo = next_event()
+    assert (name, todo['task']) == ('todo', 'read')
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from bson import ObjectId
+from pymongo.monitoring import CommandStartedEvent, CommandSucceededEvent
+
+import main
+from metrics import CommandMetrics, MetricsRegistry, query_shape
+
+
+def run_command(listener, command, request_id, micros):
+    name = next(iter(command))
+    address = ('localhost', 27017)
+    listener.started(CommandStartedEvent(command, 'pathfinderDB', request_id, address, request_id))
+    listener.succeeded(CommandSucceededEvent(timedelta(microseconds=micros), {'ok': 1}, name,
+                                             request_id, address, request_id))
+
+
+def test_query_shape_hides_values():
+    query = {'user_id': ObjectId(), 'deadline': {'$gte': 5},
+             '_id': {'$in': [ObjectId(), ObjectId()]}, '$or': [{'a': 1}, {'b': 2}]}
+    assert query_shape(query) == {'user_id': '?', 'deadline': {'$gte': '?'},
+                                  '_id': {'$in': ['?']}, '$or': [{'a': '?'}, {'b': '?'}]}
+
+
+def test_command_listener_counts_per_request_and_samples_slow_ones():
+    registry = MetricsRegistry(slow_query_ms=50)
+    stats = {'route': '/dashboard', 'commands': 0, 'mongo_seconds': 0.0}
+    listener = CommandMetrics(registry, lambda: stats)
+
+    for i in range(3):
+        run_command(listener, {'find': 'subjects', 'filter': {'_id': ObjectId()}}, i, 2000)
+    run_command(listener, {'aggregate': 'goals', 'pipeline': [{'$match': {'user_id': 'x'}}]}, 3, 80000)
+    run_command(listener, {'ping': 1}, 4, 100)
+
+    assert stats['commands'] == 4
+    assert round(stats['mongo_seconds'], 3) == 0.086
+    assert registry.command_seconds.count('find', 'subjects') == 3
+    assert list(registry.slow_queries) == [{
+        'command': 'aggregate', 'collection': 'goals', 'shape': {'user_id': '?'},
+        'ms': 80.0, 'route': '/dashboard', 'at': registry.slow_queries[0]['at']
+    }]
+    assert "pathfinder_mongo_slow_commands_total{command=\"aggregate\",collection=\"goals\"," in registry.render()
+
+
+def test_metrics_endpoint(client, monkeypatch, capsys):
+    monkeypatch.setattr(main, 'SLOW_REQUEST_MS', 0.000001)
+    client.get('/todo')
+    client.get('/todo')
+    assert 'Slow request: GET /todo' in capsys.readouterr().out
+
+    body = client.get('/metrics').data.decode()
+    assert 'pathfinder_request_duration_seconds_count{route="/todo",method="GET",status="200"} 2' in body
+    assert 'pathfinder_request_mongo_commands_bucket{route="/todo",le="+Inf"} 2' in body
+    assert 'pathfinder_artifact_queue_depth 0' in body
+
+    monkeypatch.setenv('METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
@@ -0,0 +1,107 @@
+import json
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from indexes import backfill_session_end_time
+from pagination import after, decode_cursor, encode_cursor
+from session_log import log_study_session, weekly_end_times
+
+
+def test_cursor_round_trip():
+    sort = [('end_time', -1), ('_id', -1)]
+    doc = {'end_time': datetime(2025, 3, 1, 10, 30), '_id': ObjectId()}
+    values = decode_cursor(encode_cursor(doc, sort), sort)
+
+    assert values == [doc['end_time'], doc['_id']]
+    assert after(sort, values) == {'$or': [
+        {'end_time': {'$lt': doc['end_time']}},
+        {'end_time': doc['end_time'], '_id': {'$lt': doc['_id']}},
+    ]}
+    assert decode_cursor('not a cursor', sort) is None
+
+
+def test_week_crossing_session_ends_each_week():
+    subject_id = ObjectId()
+    # Sunday 23:00 for two hours
+    end_times = weekly_end_times([(subject_id, datetime(2024, 3, 10, 23), 7200)])
+    assert end_times == {
+        (subject_id, '2024-03-04'): datetime(2024, 3, 11),
+        (subject_id, '2024-03-11'): datetime(2024, 3, 11, 1),
+    }
+
+
+def test_history_pages_newest_first(client, db, user_id):
+    subject = {'_id': ObjectId()}
+    start = datetime(2024, 1, 1, 9)
+    for week in range(45):
+        log_study_session(db, user_id, subject, 'maths', 1800, start + timedelta(weeks=week))
+
+    first = client.get('/history')
+    assert first.status_code == 200
+    html = first.get_data(as_text=True)
+    assert html.count('class="history-item"') == 20
+    assert '2024-11-04' in html  # the newest week
+    assert '0h 30m' in html
+
+    seen = html.count('class="history-item"')
+    cursor = html.split('cursor=')[1].split('"')[0]
+    while cursor:
+        page = client.get(f'/history?cursor={cursor}').get_data(as_text=True)
+        seen += page.count('class="history-item"')
+        cursor = page.split('cursor=')[1].split('"')[0] if 'cursor=' in page else None
+    assert seen == 45
+
+    assert client.get('/history?cursor=garbage').status_code == 302
+
+
+def test_history_ndjson_export(client, db, user_id):
+    subject = {'_id': ObjectId()}
+    for week in range(3):
+        log_study_session(db, user_id, subject, 'maths', 600, datetime(2024, 1, 1, 9) + timedelta(weeks=week))
+
+    response = client.get('/history?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['week_start'] for row in rows] == ['2024-01-15', '2024-01-08', '2024-01-01']
+    assert rows[0]['end_time'] == '2024-01-15T09:10:00'
+    assert 'productive_hours' not in rows[0]
+
+
+def test_todo_pages(client, db, user_id):
+    deadline = datetime.utcnow() + timedelta(days=1)
+    db.goals.insert_many([{'user_id': user_id, 'task': f'task {i}', 'deadline': deadline,
+                           'completion_status': False} for i in range(7)])
+
+    tasks, cursor = [], None
+    while True:
+        body = client.get('/todo', query_string={'limit': 3, **({'cursor': cursor} if cursor else {})}).get_json()
+        tasks += [t['task'] for t in body['todos']]
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    assert tasks == [f'task {i}' for i in range(7)]
+    assert client.get('/todo?cursor=zzz').status_code == 400
+
+
+def test_reminders_range_and_link_header(client, db, user_id):
+    db.reminders.insert_many([{'user_id': user_id, 'title': f'r{i}', 'date': f'2099-01-{i + 10}'}
+                              for i in range(5)])
+
+    in_range = client.get('/reminders?start=2099-01-11T00:00:00Z&end=2099-01-13T00:00:00Z').get_json()
+    assert [r['title'] for r in in_range] == ['r1', 'r2']
+
+    first = client.get('/reminders?limit=2')
+    assert [r['title'] for r in first.get_json()] == ['r0', 'r1']
+    next_url = first.headers['Link'].split('<')[1].split('>')[0]
+    assert [r['title'] for r in client.get(next_url).get_json()] == ['r2', 'r3']
+
+
+def test_backfill_session_end_time(db):
+    db.sessions.insert_many([
+        {'week_start': '2024-03-04', 'mon': 30, 'wed': 10},
+        {'week_start': '2024-03-11'},
+    ])
+    assert backfill_session_end_time(db, now=datetime(2024, 3, 13)) == 2
+    assert db.sessions.find_one({'week_start': '2024-03-04'})['end_time'] == datetime(2024, 3, 7)
+    assert db.sessions.find_one({'week_start': '2024-03-11'})['end_time'] == datetime(2024, 3, 13)
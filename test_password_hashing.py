@@ -0,0 +1,44 @@
+import pytest
+
+import main
+from password_hashing import PasswordHasher, PasswordHasherBusy, hash_cost
+
+
+def test_hash_and_check_in_worker_processes():
+    hasher = PasswordHasher(rounds=4, workers=1)
+    try:
+        hashed = hasher.hash('correct horse')
+        assert hash_cost(hashed) == 4
+        assert hasher.check(hashed, 'correct horse')
+        assert not hasher.check(hashed, 'wrong horse')
+        # bcrypt only reads 72 bytes, longer passwords must not blow up
+        long_hash = hasher.hash('x' * 100)
+        assert hasher.check(long_hash, 'x' * 80)
+        assert not hasher.check(None, 'anything')  # Google accounts
+        assert hasher.queue_depth == 0
+    finally:
+        hasher.shutdown()
+
+
+def test_full_queue_turns_requests_away(client, db, monkeypatch):
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=1, wait=0.01)
+    monkeypatch.setattr(main, 'password_hasher', hasher)
+    hasher._slots.acquire()  # one login already hashing
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash('pw')
+    response = client.post('/register', data={'username': 'a', 'email': 'a@example.com', 'password': 'pw'})
+    assert response.status_code == 503
+    assert db.users.count_documents({'email': 'a@example.com'}) == 0
+    assert hasher.rejected == 2
+
+
+def test_login_rehashes_at_the_new_cost(db, monkeypatch):
+    old = PasswordHasher(rounds=4, workers=0)
+    db.users.insert_one({'username': 'kim', 'email': 'kim@example.com', 'password': old.hash('pw')})
+    monkeypatch.setattr(main, 'password_hasher', PasswordHasher(rounds=5, workers=0))
+
+    with main.app.test_client() as client:
+        response = client.post('/login', data={'email': 'kim@example.com', 'password': 'pw'})
+    assert response.headers['Location'] == '/dashboard'
+    assert hash_cost(db.users.find_one({'email': 'kim@example.com'})['password']) == 5
@@ -0,0 +1,52 @@
+import main
+from rate_limit import MemoryCounterStore, RateLimit
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_sliding_window_weighs_the_previous_window():
+    clock = Clock(600.0)  # the start of a 60s window
+    limit = RateLimit('test', 10, 60, MemoryCounterStore(), clock)
+
+    assert all(limit.hit('ip').allowed for _ in range(10))
+    rejected = limit.hit('ip')
+    assert not rejected.allowed and rejected.retry_after == 60
+
+    # Half way into the next window, half of the last one still counts
+    clock.now += 90
+    assert [limit.hit('ip').allowed for _ in range(6)] == [True] * 5 + [False]
+    assert limit.hit('other ip').remaining == 9
+
+
+def test_login_limits_reject_before_mongo(db, query_counter, monkeypatch):
+    monkeypatch.setattr(main, 'login_ip_limit', RateLimit('login_ip', 3, 60, main.rate_limit_store))
+    form = {'email': 'nobody@example.com', 'password': 'guess'}
+
+    with main.app.test_client() as client:
+        for _ in range(3):
+            assert client.post('/login', data=form).status_code == 302
+        query_counter.reset()
+        response = client.post('/login', data=form)
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert query_counter.total == 0
+    assert main.rate_limit_decisions.value('login_ip', 'rejected') >= 1
+
+
+def test_failed_logins_lock_the_email_not_the_ip(db, monkeypatch):
+    monkeypatch.setattr(main, 'login_email_limit', RateLimit('login_email', 2, 900, main.rate_limit_store))
+    db.users.insert_one({'username': 'kim', 'email': 'kim@example.com', 'password': main.password_hasher.hash('pw')})
+
+    with main.app.test_client() as client:
+        for _ in range(2):
+            client.post('/login', data={'email': 'kim@example.com', 'password': 'wrong'})
+        assert client.post('/login', data={'email': 'Kim@example.com', 'password': 'pw'}).status_code == 429
+        # Someone else from the same address is fine
+        assert client.post('/login', data={'email': 'sam@example.com', 'password': 'x'}).status_code == 302
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from indexes import ensure_indexes
+from rollups import backfill_rollups, get_rollups
+
+
+def add_subject(db, user_id, name):
+    return db.subjects.insert_one({'owner_id': user_id, 'subject': name, 'marks': 70}).inserted_id
+
+
+def test_logging_keeps_rollups_current(client, db, user_id):
+    ensure_indexes(db)
+    maths = add_subject(db, user_id, 'maths')
+    add_subject(db, user_id, 'physics')
+
+    client.post('/log_session/batch', json={'intervals': [
+        {'subject_name': 'maths', 'start': '2024-03-06T10:30:00', 'duration_seconds': 3600},
+        {'subject_name': 'maths', 'start': '2024-04-20T10:00:00', 'duration_seconds': 600},
+        {'subject_name': 'physics', 'start': '2024-03-06T08:00:00', 'duration_seconds': 1200},
+    ]})
+    client.post('/log_session', json={'subject_name': 'maths', 'duration_seconds': 120})
+
+    rollups = {r['subject_name']: r for r in get_rollups(db, user_id)}
+    assert rollups['maths']['subject_id'] == maths
+    assert rollups['maths']['total_minutes'] == 72
+    assert rollups['maths']['productive_hours']['10'] == 40
+    assert rollups['physics']['total_minutes'] == 20
+    assert db.study_rollups.count_documents({}) == 2
+
+
+def test_backfill_rollups_from_sessions(db):
+    user = ObjectId()
+    subject = ObjectId()
+    db.sessions.insert_many([
+        {'user_id': user, 'subject_id': subject, 'subject_name': 'maths', 'week_start': week,
+         'mon': 30, 'tue': 15, 'wed': 0, 'thu': 0, 'fri': 0, 'sat': 0, 'sun': 0,
+         'productive_hours': {'09': 30, '20': 15}}
+        for week in ('2024-03-04', '2024-03-11')
+    ])
+
+    assert backfill_rollups(db) == 1
+    assert backfill_rollups(db) == 1
+
+    rollup = get_rollups(db, str(user))[0]
+    assert rollup['total_minutes'] == 90
+    assert rollup['productive_hours']['09'] == 60
+    assert rollup['productive_hours']['00'] == 0
+
+
+def test_time_page_reads_rollups(client, db, user_id, query_counter):
+    for i in range(3):
+        db.study_rollups.insert_one({
+            'user_id': ObjectId(user_id), 'subject_id': ObjectId(), 'subject_name': f'subject{i}',
+            'total_minutes': 60 * (i + 1), 'updated_at': datetime.utcnow()
+        })
+    query_counter.reset()
+
+    response = client.get('/time')
+
+    # data version for the chart cache, then the rollups
+    assert query_counter.total == 2
+    assert b'subject2 (3.0 hrs)' in response.data
+    assert b'subject0 (1.0 hrs)' in response.data
+
+
+def test_performance_shows_time_spent(client, db, user_id):
+    maths = add_subject(db, user_id, 'maths')
+    db.study_rollups.insert_one({'user_id': ObjectId(user_id), 'subject_id': maths,
+                                 'subject_name': 'maths', 'total_minutes': 45})
+
+    response = client.get('/performance')
+
+    assert b'maths - 70% - 45m' in response.data
@@ -0,0 +1,83 @@
+import io
+from datetime import datetime, timedelta
+
+import main
+from search_index import match_query
+
+
+def add_subject(client, name, description=''):
+    client.post('/add', data={'subject': name, 'marks': 70, 'description': description})
+
+
+def search(client, q, **params):
+    return client.get('/search', query_string={'q': q, **params}).get_json()
+
+
+def test_match_query_escapes_fts_syntax():
+    assert match_query('cell "bio" NEAR') == '"cell" "bio" "near"*'
+    assert match_query('  ?! ') is None
+
+
+def test_finds_subjects_todos_and_reminders(client, db):
+    add_subject(client, 'biology', 'Cells, genetics and the Krebs cycle')
+    client.post('/todo/add', json={'task': 'Revise krebs cycle diagrams', 'goal_period': 'daily'})
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    client.post('/reminders', json={'title': 'Krebs quiz', 'date': tomorrow})
+
+    body = search(client, 'krebs')
+    assert body['total'] == 3
+    assert {r['kind'] for r in body['results']} == {'subject', 'todo', 'reminder'}
+    subject = next(r for r in body['results'] if r['kind'] == 'subject')
+    assert subject['url'] == '/study_session/biology'
+    assert '[Krebs]' in subject['snippet']
+
+    # Prefix match on the last word, while typing
+    assert search(client, 'gene')['total'] == 1
+
+
+def test_results_are_per_user(client, db, search_index):
+    search_index.upsert('someone-else', 'subject', 'x', 'chemistry')
+    add_subject(client, 'chemistry')
+    assert search(client, 'chemistry')['total'] == 1
+
+
+def test_deletes_and_expiry_update_the_index(client, db, search_index):
+    add_subject(client, 'history')
+    client.post('/todo/add', json={'task': 'history essay', 'goal_period': 'daily'})
+    assert search(client, 'history')['total'] == 2
+
+    # Todo deadlines pass without any request touching them
+    db.goals.update_one({}, {'$set': {'deadline': datetime.utcnow() - timedelta(hours=1)}})
+    later = datetime.utcnow() + timedelta(days=2)
+    assert search_index.search(db.users.find_one()['_id'], 'essay', now=later) == ([], 0)
+    assert search_index.purge_expired(now=later) == 1
+
+    client.post('/delete', data={'subject': 'history'})
+    assert search(client, 'history')['total'] == 0
+
+
+def test_file_text_is_indexed(client, db, store, subject_id):
+    client.post(f'/upload/{subject_id}', data={'file': (io.BytesIO(b'Mitochondria make ATP'), 'cells.txt')},
+                content_type='multipart/form-data')
+    assert search(client, 'cells')['total'] == 1
+
+    main.artifact_pipeline.join()
+    result = search(client, 'mitochondria')['results'][0]
+    assert result['kind'] == 'file'
+    assert result['url'] == f"/view_file/{result['id']}"
+
+    client.post(f"/delete_file/{result['id']}")
+    assert search(client, 'mitochondria')['total'] == 0
+
+
+def test_pagination(client, search_index, user_id):
+    for i in range(2000):
+        search_index.upsert(user_id, 'todo', f'todo-{i}', f'practice problem set {i}',
+                            'integration by parts' if i % 4 == 0 else 'limits and series')
+
+    pages = [search(client, 'integration', page=page, per_page=150) for page in (1, 2, 3, 4, 5)]
+    assert pages[0]['total'] == 500
+    # per_page is capped at 100
+    assert [len(p['results']) for p in pages] == [100, 100, 100, 100, 100]
+    assert search(client, 'integration', page=6, per_page=100)['results'] == []
+    assert len({r['id'] for p in pages for r in p['results']}) == 500
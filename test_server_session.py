@@ -0,0 +1,126 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+from server_session import CachedSessionStore, MemorySessionStore, MongoSessionStore, RedisSessionStore, ServerSessionInterface
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+@pytest.fixture
+def mongo_sessions(db, monkeypatch):
+    monkeypatch.setattr(main.app, 'session_interface', ServerSessionInterface(MongoSessionStore(db.web_sessions)))
+    return db.web_sessions
+
+
+def test_login_rotates_id_and_keeps_data_server_side(db, mongo_sessions):
+    password = main.password_hasher.hash('hunter22')
+    db.users.insert_one({'username': 'sam', 'email': 'sam@example.com', 'password': password})
+
+    with main.app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['oauth_state'] = 'planted'
+        planted = client.get_cookie('session').value
+
+        client.post('/login', data={'email': 'sam@example.com', 'password': 'hunter22'})
+        sid = client.get_cookie('session').value
+        assert sid != planted
+        assert mongo_sessions.find_one({'_id': planted}) is None
+        assert 'sam' in mongo_sessions.find_one({'_id': sid})['data']
+        assert 'sam' not in sid
+
+        assert client.get('/todo').status_code == 200
+        client.get('/logout')
+        assert mongo_sessions.count_documents({'_id': sid}) == 0
+
+
+def test_expired_sessions_are_not_loaded(mongo_sessions):
+    store = MongoSessionStore(mongo_sessions)
+    store.set('old', '{}', datetime.utcnow() - timedelta(seconds=1))
+    store.set('new', '{"a": 1}', datetime.utcnow() + timedelta(hours=1))
+    assert store.get('old') is None
+    assert store.get('new')[0] == '{"a": 1}'
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(maxsize=2)
+    later = datetime.utcnow() + timedelta(hours=1)
+    store.set('a', '1', later)
+    store.set('b', '2', later)
+    store.get('a')
+    store.set('c', '3', later)
+    assert store.get('b') is None
+    assert store.get('a') == ('1', later)
+    assert len(store) == 2
+
+
+def test_redis_store_round_trip():
+    redis = FakeRedis()
+    store = RedisSessionStore(redis)
+    expires_at = datetime(2030, 1, 1, 12, 30)
+    store.set('abc', '{"user_id": "1"}', expires_at)
+    assert list(redis.values) == ['session:abc']
+    assert store.get('abc') == ('{"user_id": "1"}', expires_at)
+    store.delete('abc')
+    assert store.get('abc') is None
+
+
+def test_cached_store_reads_mongo_once_per_ttl(db, mongo_sessions, user_id, query_counter, monkeypatch):
+    store = CachedSessionStore(MongoSessionStore(mongo_sessions), ttl=60)
+    monkeypatch.setattr(main.app, 'session_interface', ServerSessionInterface(store))
+    with main.app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        query_counter.reset()
+
+        for _ in range(3):
+            assert client.get('/todo').status_code == 200
+        client.get('/static/js/script.js')
+        assert query_counter.calls[('web_sessions', 'find_one')] == 0
+
+        sid = client.get_cookie('session').value
+        client.get('/logout')
+        assert mongo_sessions.count_documents({'_id': sid}) == 0
+        assert store.get(sid) is None
+
+
+def test_static_files_skip_the_session_store(mongo_sessions, user_id, query_counter):
+    with main.app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        query_counter.reset()
+
+        assert client.get('/static/js/script.js').status_code == 200
+        assert query_counter.calls[('web_sessions', 'find_one')] == 0
+        client.get('/todo')
+        assert query_counter.calls[('web_sessions', 'find_one')] == 1
+
+
+def test_logging_ignores_subjects_deleted_elsewhere(client, db, user_id, subject_id):
+    # This session's subject map still has physics after another device deleted it
+    physics = db.subjects.insert_one({'owner_id': user_id, 'subject': 'physics'}).inserted_id
+    with client.session_transaction() as sess:
+        sess['subjects'] = {'loaded_at': time.time(), 'ids': {'maths': str(subject_id), 'physics': str(physics)}}
+    db.subjects.delete_one({'_id': physics})
+
+    assert client.post('/log_session', json={'subject_name': 'physics', 'duration_seconds': 60}).status_code == 404
+    response = client.post('/log_session/batch', json={'intervals': [
+        {'subject_name': 'physics', 'start': '2024-03-06T10:00:00', 'duration_seconds': 60},
+        {'subject_name': 'maths', 'start': '2024-03-06T10:00:00', 'duration_seconds': 60},
+    ]})
+    assert (response.get_json()['logged'], response.get_json()['rejected']) == (1, 1)
+    assert db.sessions.count_documents({'subject_id': physics}) == 0
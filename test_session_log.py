@@ -0,0 +1,172 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from indexes import ensure_indexes, merge_duplicate_sessions
+from session_log import weekly_increments
+
+
+def add_subject(db, user_id, name='maths'):
+    return db.subjects.insert_one({'owner_id': user_id, 'subject': name}).inserted_id
+
+
+def test_weekly_increments_split_by_hour():
+    start = datetime(2024, 3, 6, 10, 50)  # a Wednesday
+
+    assert weekly_increments([('sid', start, 1200)]) == {
+        ('sid', '2024-03-04'): {'wed': 20, 'productive_hours.10': 10, 'productive_hours.11': 10}
+    }
+
+
+def test_weekly_increments_roll_over_midnight_and_weeks():
+    start = datetime(2024, 3, 10, 23, 30)  # Sunday night into Monday
+
+    assert weekly_increments([('sid', start, 3600)]) == {
+        ('sid', '2024-03-04'): {'sun': 30, 'productive_hours.23': 30},
+        ('sid', '2024-03-11'): {'mon': 30, 'productive_hours.00': 30},
+    }
+
+
+def test_log_session_upserts_one_weekly_doc(client, db, user_id, query_counter):
+    ensure_indexes(db)
+    add_subject(db, user_id)
+    query_counter.reset()
+
+    for _ in range(3):
+        response = client.post('/log_session', json={'subject_name': 'Maths', 'duration_seconds': 600})
+        assert response.get_json()['status'] == 'success'
+
+    # subject lookup, session upsert, rollup and goal update, data version bump per post
+    assert query_counter.total == 15
+    assert query_counter.calls[('subjects', 'find')] == 3
+    assert query_counter.calls[('sessions', 'bulk_write')] == 3
+
+    docs = list(db.sessions.find())
+    assert len(docs) == 1
+    assert sum(docs[0][day] for day in ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']) == 30
+    assert len(docs[0]['productive_hours']) == 24
+
+
+def test_log_session_rejects_bad_input(client, db, user_id):
+    add_subject(db, user_id)
+    for data in [{'subject_name': 'maths', 'duration_seconds': 10 ** 30},
+                 {'subject_name': 'maths', 'duration_seconds': 'long'},
+                 {'subject_name': 'maths', 'duration_seconds': -60},
+                 {'subject_name': 5, 'duration_seconds': 60}]:
+        assert client.post('/log_session', json=data).status_code == 400
+    assert db.sessions.count_documents({}) == 0
+
+
+def test_log_session_updates_active_time_goal(client, db, user_id):
+    subject_id = add_subject(db, user_id)
+    db.goals.insert_one({
+        'user_id': ObjectId(user_id),
+        'subject_id': subject_id,
+        'goal_type': 'time',
+        'status': 'active',
+        'current_duration_minutes': 0,
+        'start_date': datetime(2000, 1, 1),
+        'end_date': datetime(2999, 1, 1)
+    })
+
+    client.post('/log_session', json={'subject_name': 'maths', 'duration_seconds': 90})
+
+    assert db.goals.find_one()['current_duration_minutes'] == 1.5
+
+
+def test_log_session_unknown_subject(client):
+    response = client.post('/log_session', json={'subject_name': 'nope', 'duration_seconds': 60})
+    assert response.status_code == 404
+
+
+def test_merge_duplicate_sessions(db):
+    key = {'user_id': ObjectId(), 'subject_id': ObjectId(), 'week_start': '2024-03-04'}
+    db.sessions.insert_many([
+        {**key, 'mon': 10, 'tue': 0, 'productive_hours': {'09': 10}},
+        {**key, 'mon': 5, 'tue': 7, 'productive_hours': {'09': 5, '10': 7}},
+    ])
+
+    assert merge_duplicate_sessions(db) == 1
+
+    doc = db.sessions.find_one()
+    assert db.sessions.count_documents({}) == 1
+    assert (doc['mon'], doc['tue']) == (15, 7)
+    assert doc['productive_hours'] == {'09': 15, '10': 7}
+    assert dict(((c, n), r) for c, n, r in ensure_indexes(db))[('sessions', 'user_subject_week')] == 'created'
+
+
+def test_batch_logs_intervals_across_subjects_and_weeks(client, db, user_id, query_counter):
+    ensure_indexes(db)
+    add_subject(db, user_id, 'maths')
+    add_subject(db, user_id, 'physics')
+    query_counter.reset()
+
+    response = client.post('/log_session/batch', json={'intervals': [
+        {'subject_name': 'Maths', 'start': '2024-03-06T10:00:00', 'duration_seconds': 1200},
+        {'subject_name': 'Maths', 'start': '2024-03-06T18:00:00', 'duration_seconds': 600},
+        {'subject_name': 'Maths', 'start': '2024-03-11T09:00:00', 'duration_seconds': 300},
+        {'subject_name': 'physics', 'start': '2024-03-07T21:30:00', 'duration_seconds': 3600},
+        {'subject_name': 'history', 'start': '2024-03-07T21:30:00', 'duration_seconds': 60},
+        {'subject_name': 'physics', 'start': 'yesterday', 'duration_seconds': 60},
+    ]})
+
+    assert response.get_json() == {'status': 'success', 'logged': 4, 'duplicates': 0, 'rejected': 2}
+    # subject lookup, one bulk write each for sessions, rollups and goals, version bump
+    assert query_counter.total == 5
+
+    maths_week = db.sessions.find_one({'subject_name': 'Maths', 'week_start': '2024-03-04'})
+    assert maths_week['wed'] == 30
+    assert maths_week['productive_hours']['10'] == 20
+    assert maths_week['productive_hours']['18'] == 10
+    assert db.sessions.find_one({'week_start': '2024-03-11'})['mon'] == 5
+    physics_week = db.sessions.find_one({'subject_name': 'physics'})
+    assert physics_week['thu'] == 60
+    assert (physics_week['productive_hours']['21'], physics_week['productive_hours']['22']) == (30, 30)
+
+
+def test_batch_adds_to_existing_weekly_doc(client, db, user_id):
+    ensure_indexes(db)
+    add_subject(db, user_id)
+    interval = {'subject_name': 'maths', 'start': '2024-03-06T10:00:00', 'duration_seconds': 600}
+
+    client.post('/log_session/batch', json={'intervals': [interval]})
+    client.post('/log_session/batch', json={'intervals': [interval]})
+
+    assert db.sessions.count_documents({}) == 1
+    assert db.sessions.find_one()['wed'] == 20
+
+
+def test_batch_logs_each_interval_id_once(client, db, user_id):
+    ensure_indexes(db)
+    add_subject(db, user_id)
+    first = {'subject_name': 'maths', 'start': '2024-03-06T10:00:00', 'duration_seconds': 600, 'id': 'a'}
+    second = {'subject_name': 'maths', 'start': '2024-03-06T11:00:00', 'duration_seconds': 600, 'id': 'b'}
+
+    assert client.post('/log_session/batch', json={'intervals': [first]}).get_json()['logged'] == 1
+    # A retry of the first run, sent again by another tab, alongside a new one
+    response = client.post('/log_session/batch', json={'intervals': [first, second, second]})
+
+    assert response.get_json() == {'status': 'success', 'logged': 1, 'duplicates': 2, 'rejected': 0}
+    assert db.sessions.find_one()['wed'] == 20
+
+
+def test_batch_drops_out_of_range_intervals(client, db, user_id):
+    add_subject(db, user_id)
+    response = client.post('/log_session/batch', json={'intervals': [
+        {'subject_name': 5, 'start': '2024-03-06T10:00:00', 'duration_seconds': 60},
+        {'subject_name': 'maths', 'start': '2024-03-06T10:00:00', 'duration_seconds': 10 ** 30},
+        {'subject_name': 'maths', 'start': '2024-03-06T10:00:00', 'duration_seconds': 25 * 3600},
+        {'subject_name': 'maths', 'start': '1900-01-01T10:00:00', 'duration_seconds': 60},
+        {'subject_name': 'maths', 'start': '9999-12-31T23:00:00', 'duration_seconds': 7200},
+        {'subject_name': 'maths', 'start': '2024-03-06T10:00:00', 'duration_seconds': 60, 'id': 7},
+        'maths',
+    ]})
+
+    assert response.get_json() == {'status': 'success', 'logged': 0, 'duplicates': 0, 'rejected': 7}
+    assert db.sessions.count_documents({}) == 0
+
+
+def test_batch_rejects_bad_payloads(client):
+    assert client.post('/log_session/batch', json={}).status_code == 400
+    too_many = [{'subject_name': 'maths', 'start': '2024-03-06T10:00:00', 'duration_seconds': 1}] * 501
+    assert client.post('/log_session/batch', json={'intervals': too_many}).status_code == 413
@@ -0,0 +1,83 @@
+import time
+from datetime import datetime, timedelta
+
+from sweeper import SweepTimer, sweep
+
+NOW = datetime(2025, 3, 10, 12, 0)
+
+
+def add_todo(db, user_id, task, deadline, done=False):
+    db.goals.insert_one({'user_id': user_id, 'task': task, 'goal_type': 'task',
+                         'deadline': deadline, 'completion_status': done})
+
+
+def seed(db, user_id):
+    add_todo(db, user_id, 'current', NOW + timedelta(hours=5))
+    add_todo(db, user_id, 'overdue', NOW - timedelta(hours=1))
+    add_todo(db, user_id, 'done today', NOW - timedelta(hours=1), done=True)
+    add_todo(db, user_id, 'done long ago', NOW - timedelta(days=3), done=True)
+    add_todo(db, 'someone-else', 'their overdue', NOW - timedelta(days=1))
+    db.reminders.insert_many([
+        {'user_id': user_id, 'title': 'tomorrow', 'date': '2025-03-11', 'expires_at': datetime(2025, 3, 12)},
+        {'user_id': user_id, 'title': 'yesterday', 'date': '2025-03-09', 'expires_at': datetime(2025, 3, 10)},
+        {'user_id': user_id, 'title': 'legacy', 'date': '2025-03-01'},
+    ])
+
+
+def test_sweep_removes_expired_for_all_users(db, user_id, search_index):
+    seed(db, user_id)
+    search_index.upsert(user_id, 'todo', 'gone', 'overdue', expires_at=NOW - timedelta(hours=1))
+
+    report = sweep(db, now=NOW, batch_size=1, search_index=search_index)
+
+    assert {k: v for k, v in report.items() if k != 'seconds'} == {
+        'expired_todos': 2, 'finished_todos': 1, 'reminders': 2, 'search_entries': 1
+    }
+    assert report['seconds'] >= 0
+    assert sorted(t['task'] for t in db.goals.find()) == ['current', 'done today']
+    assert [r['title'] for r in db.reminders.find()] == ['tomorrow']
+    assert sweep(db, now=NOW)['expired_todos'] == 0
+
+
+def test_sweep_collects_owners(db, user_id):
+    seed(db, user_id)
+    owners = set()
+    sweep(db, now=NOW, owners=owners)
+    assert owners == {user_id, 'someone-else'}
+
+
+def test_reads_do_not_write(client, db, user_id, query_counter):
+    now = datetime.utcnow()
+    add_todo(db, user_id, 'current', now + timedelta(hours=5))
+    add_todo(db, user_id, 'overdue', now - timedelta(hours=1))
+    add_todo(db, user_id, 'done today', now - timedelta(hours=1), done=True)
+    add_todo(db, user_id, 'done long ago', now - timedelta(days=3), done=True)
+    db.reminders.insert_one({'user_id': user_id, 'title': 'old', 'date': '2000-01-01'})
+    query_counter.reset()
+
+    todos = client.get('/todo').get_json()['todos']
+    assert sorted(t['task'] for t in todos) == ['current', 'done today']
+    expired = client.get('/todo/check-deadlines').get_json()['expiredTasks']
+    assert [t['task'] for t in expired] == ['overdue']
+    assert client.get('/reminders').get_json() == []
+
+    assert set(query_counter.calls) == {('goals', 'find'), ('reminders', 'find')}
+    assert db.goals.count_documents({}) == 4
+
+
+def test_sweep_timer_runs_in_the_background(db, user_id):
+    add_todo(db, user_id, 'overdue', datetime.utcnow() - timedelta(hours=1))
+    swept = []
+    timer = SweepTimer(db, every=0.01, on_sweep=swept.append)
+    timer.start()
+    try:
+        for _ in range(200):
+            if timer.last_report:
+                break
+            time.sleep(0.01)
+    finally:
+        timer.stop()
+
+    assert timer.last_report['expired_todos'] == 1
+    assert db.goals.count_documents({}) == 0
+    assert swept[0] == {user_id}
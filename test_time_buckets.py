@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from time_buckets import bucket_intervals, sum_buckets
+
+
+def test_bucket_intervals_splits_at_hours():
+    buckets = bucket_intervals([datetime(2024, 3, 6, 10, 50, 30)], [1800])
+
+    assert buckets['hour'].tolist() == [10, 11]
+    assert buckets['seconds'].tolist() == [570, 1230]
+    assert buckets['weekday'].tolist() == [2, 2]
+
+
+def test_bucket_intervals_week_start_is_monday():
+    buckets = bucket_intervals([datetime(2024, 3, 10, 23, 0)], [7200])
+
+    mondays = (np.datetime64('1970-01-01') + buckets['week_start']).astype(str).tolist()
+    assert mondays == ['2024-03-04', '2024-03-11']
+    assert buckets['weekday'].tolist() == [6, 0]
+
+
+def test_bucket_intervals_skips_empty_intervals():
+    buckets = bucket_intervals([datetime(2024, 3, 6), datetime(2024, 3, 6)], [0, 60])
+
+    assert buckets['interval'].tolist() == [1]
+
+
+def test_bucket_seconds_add_up_to_durations():
+    rng = np.random.default_rng(0)
+    base = datetime(2024, 1, 1)
+    starts = [base + timedelta(seconds=int(s)) for s in rng.integers(0, 60 * 86400, 500)]
+    durations = rng.integers(0, 3 * 86400, 500)
+
+    buckets = bucket_intervals(starts, durations)
+
+    assert buckets['seconds'].min() > 0
+    assert buckets['seconds'].max() <= 3600
+    assert np.bincount(buckets['interval'], weights=buckets['seconds'], minlength=500).tolist() == durations.tolist()
+
+
+def test_sum_buckets_groups_intervals():
+    start = datetime(2024, 3, 6, 10, 0)
+    buckets = bucket_intervals([start, start, start], [600, 600, 600])
+
+    rows = sum_buckets([0, 0, 1], buckets)
+
+    week = (datetime(2024, 3, 4) - datetime(1970, 1, 1)).days
+    assert rows == [(0, week, 2, 10, 1200), (1, week, 2, 10, 600)]
+
+
+def test_sum_buckets_before_1970():
+    buckets = bucket_intervals([datetime(1900, 1, 1, 10, 0), datetime(2024, 3, 6, 10, 0)], [60, 60])
+
+    rows = sum_buckets([0, 1], buckets)
+
+    assert [(group, week) for group, week, _, _, _ in rows] == [
+        (0, (datetime(1900, 1, 1) - datetime(1970, 1, 1)).days),
+        (1, (datetime(2024, 3, 4) - datetime(1970, 1, 1)).days),
+    ]
+
+
+@pytest.mark.parametrize('start, duration', [
+    (datetime(2024, 3, 6), 10 ** 30),
+    (datetime(2024, 3, 6), 8 * 24 * 3600),
+    (datetime(9999, 12, 31, 23, 0), 7200),
+    (datetime(1800, 1, 1), 60),
+])
+def test_bucket_intervals_rejects_out_of_range(start, duration):
+    with pytest.raises(ValueError):
+        bucket_intervals([start], [duration])
@@ -0,0 +1,108 @@
+"""
+Split study intervals into hour buckets, rolling over days and weeks
+correctly, for many intervals at once.
+
+Times are naive local datetimes, the same clock the weekly session docs use.
+"""
+from datetime import datetime
+
+import numpy as np
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+HOURS = [str(h).zfill(2) for h in range(24)]
+
+HOUR = 3600
+EPOCH = datetime(1970, 1, 1)
+# 1970-01-01 was a Thursday, weekday() == 3
+EPOCH_WEEKDAY = 3
+
+# What bucket_intervals accepts. Every interval expands to one row per hour
+# it touches, and the weeks around it have to be valid dates.
+MAX_DURATION = 7 * 24 * HOUR
+EARLIEST_START = datetime(1900, 1, 1)
+LATEST_START = datetime(3000, 1, 1)
+
+# sum_buckets packs days since the epoch shifted by this, which covers every
+# date datetime can hold, so dates before 1970 decode too
+DAY_OFFSET = 800_000
+DAY_SPAN = 4_000_000
+
+
+def _epoch_seconds(starts):
+    if isinstance(starts, np.ndarray) and starts.dtype.kind == 'M':
+        return starts.astype('datetime64[s]').astype(np.int64)
+    # Much faster than letting numpy convert datetime objects itself
+    return np.fromiter(((start - EPOCH).total_seconds() for start in starts),
+                       dtype=np.float64, count=len(starts)).astype(np.int64)
+
+
+def bucket_intervals(starts, durations):
+    """
+    Split each (start, duration in seconds) interval at every hour boundary.
+
+    Returns parallel arrays with one entry per (interval, hour) piece:
+      interval   index of the interval the piece came from
+      week_start days since the epoch of the Monday of that piece's week
+      weekday    0 = Monday ... 6 = Sunday
+      hour       hour of the day, 0-23
+      seconds    seconds of the interval that fall in that hour
+
+    Raises ValueError for a duration over MAX_DURATION or a start outside
+    EARLIEST_START to LATEST_START.
+    """
+    start = _epoch_seconds(starts)
+    try:
+        duration = np.asarray(durations, dtype=np.int64)
+    except OverflowError:
+        raise ValueError(f'intervals can be at most {MAX_DURATION} seconds') from None
+    if (duration > MAX_DURATION).any():
+        raise ValueError(f'intervals can be at most {MAX_DURATION} seconds')
+    if ((start < (EARLIEST_START - EPOCH).total_seconds()).any()
+            or (start >= (LATEST_START - EPOCH).total_seconds()).any()):
+        raise ValueError(f'intervals must start between {EARLIEST_START:%Y} and {LATEST_START:%Y}')
+
+    keep = duration > 0
+    index = np.flatnonzero(keep)
+    start, end = start[keep], start[keep] + duration[keep]
+
+    first_hour = start // HOUR
+    last_hour = (end - 1) // HOUR
+    pieces = last_hour - first_hour + 1
+
+    # Expand every interval into the hours it touches without a Python loop
+    interval = np.repeat(np.arange(len(start)), pieces)
+    offsets = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    hour_index = first_hour[interval] + offsets
+
+    seconds = (np.minimum(end[interval], (hour_index + 1) * HOUR)
+               - np.maximum(start[interval], hour_index * HOUR))
+
+    day = hour_index // 24
+    weekday = (day + EPOCH_WEEKDAY) % 7
+
+    return {
+        'interval': index[interval],
+        'week_start': day - weekday,
+        'weekday': weekday,
+        'hour': hour_index % 24,
+        'seconds': seconds,
+    }
+
+
+def sum_buckets(groups, buckets):
+    """
+    Total seconds per (group, week, weekday, hour), where groups gives a
+    group number for every input interval (e.g. which weekly doc it feeds).
+    Returns (group, week_start, weekday, hour, seconds) rows.
+    """
+    group = np.asarray(groups, dtype=np.int64)[buckets['interval']]
+    # Pack the key into one integer so np.unique can group in one pass
+    key = ((group * DAY_SPAN + buckets['week_start'] + DAY_OFFSET) * 7 + buckets['weekday']) * 24 + buckets['hour']
+    unique_keys, inverse = np.unique(key, return_inverse=True)
+    totals = np.bincount(inverse, weights=buckets['seconds']).astype(np.int64)
+
+    hour = unique_keys % 24
+    weekday = unique_keys // 24 % 7
+    week_start = unique_keys // (24 * 7) % DAY_SPAN - DAY_OFFSET
+    group = unique_keys // (24 * 7 * DAY_SPAN)
+    return list(zip(group.tolist(), week_start.tolist(), weekday.tolist(), hour.tolist(), totals.tolist()))
@@ -0,0 +1,98 @@
+"""
+The logged-in user for the current request, loaded at most once per request.
+
+Their subjects' name -> id map is also kept in the (server-side) session
+for a few minutes, so routes that take a subject by name or id don't look
+it up every time. A name or id missing from the cached map reloads it once
+before giving up, so a subject added from another device still resolves.
+A subject deleted from another device can linger in the map, so routes
+that write against a subject use owned_subject_ids instead.
+"""
+import time
+
+from bson import ObjectId
+from flask import g, session
+
+SUBJECT_MAP_TTL = 300
+
+
+def cached_subject_ids(session):
+    """The session's subject map if it's still fresh, else None."""
+    cached = session.get('subjects')
+    if cached and time.time() - cached['loaded_at'] < SUBJECT_MAP_TTL:
+        return {name: ObjectId(i) for name, i in cached['ids'].items()}
+    return None
+
+
+class UserContext:
+    def __init__(self, db, user_id):
+        self.db = db
+        self.user_id = user_id
+        self.object_id = ObjectId(user_id)
+        self._user = None
+        self._subjects = None
+        self._fresh = False
+
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = self.db.users.find_one({'_id': self.object_id}, {'password': 0})
+        return self._user
+
+    def _load_subjects(self):
+        subjects = {s['subject']: s['_id'] for s in self.db.subjects.find({'owner_id': self.user_id}, {'subject': 1})}
+        session['subjects'] = {'loaded_at': time.time(), 'ids': {name: str(i) for name, i in subjects.items()}}
+        self._subjects = subjects
+        self._fresh = True
+        return subjects
+
+    def subject_ids(self):
+        """{subject name: ObjectId} for everything the user owns."""
+        if self._subjects is not None:
+            return self._subjects
+        cached = cached_subject_ids(session)
+        if cached is not None:
+            self._subjects = cached
+            return self._subjects
+        return self._load_subjects()
+
+    def subject_id(self, name):
+        subject_id = self.subject_ids().get(name)
+        if subject_id is None and not self._fresh:
+            subject_id = self._load_subjects().get(name)
+        return subject_id
+
+    def owned_subject_ids(self, names):
+        """{name: ObjectId} for those of names the user owns, read from the database, not the cached map."""
+        names = list(set(names))
+        if not names:
+            return {}
+        query = {'owner_id': self.user_id, 'subject': names[0] if len(names) == 1 else {'$in': names}}
+        return {s['subject']: s['_id'] for s in self.db.subjects.find(query, {'subject': 1})}
+
+    def subject_name(self, subject_id):
+        """Name of one of the user's subjects by id, None if it isn't theirs."""
+        subject_id = ObjectId(subject_id)
+        for _ in range(2):
+            for name, i in self.subject_ids().items():
+                if i == subject_id:
+                    return name
+            if self._fresh:
+                return None
+            self._load_subjects()
+
+    def forget_subjects(self):
+        """Call after adding, renaming or deleting a subject."""
+        session.pop('subjects', None)
+        self._subjects = None
+        self._fresh = False
+
+
+def current_user(db):
+    """The request's UserContext, or None when nobody is logged in."""
+    if 'user_id' not in session:
+        return None
+    context = g.get('current_user')
+    if context is None or context.user_id != session['user_id']:
+        context = g.current_user = UserContext(db, session['user_id'])
+    return context